@@ -0,0 +1,299 @@
+import os
+import time
+import uuid
+import asyncio
+
+from collections import OrderedDict
+from typing import Dict, List, Union
+
+from stream import StepStream, Subscription
+from src.utils.api_client import QUEUED, RUNNING, PAUSED, DONE, CANCELLED, FAILED, FINISHED
+from src.utils.aux import CONFIG_PATH, RUNS_PATH
+from src.utils.config_parser import ConfigParser
+from src.utils.parser_factory import ParserFactory
+from src.utils.results import ResultsFrame
+from src.utils.results_store import STORE_FILE, record_run
+from src.utils.sim_worker import SimulationWorker
+
+"""
+Job queue of the simulation service.
+
+Every job is a simulation described by a scene, a rules file and
+configuration fields keyed by 'Section.Field'. Jobs wait in submission order
+for one of the slots of the pool, and each running job has a
+`SimulationWorker` process of its own, so the service loop only moves results
+around and never runs a step. The output counts of every job are kept in a
+`ResultsFrame` as its worker logs them, so they can be read while it runs,
+and published to the `StepStream` of the job for the clients watching it.
+Jobs with ``Runtime.Store`` are recorded in the results store of the runs
+directory once they finish.
+"""
+
+# Seconds a job task waits for the steps of its worker
+POLL_INTERVAL_S = 0.2
+# Characters not allowed in scene and rules names, which must stay in their directories
+PATH_CHARACTERS = ('/', '\\', '..')
+
+
+class JobError(ValueError):
+    """Invalid job submission or operation.
+
+    Attributes:
+        status (int): HTTP status to answer with.
+    """
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """Simulation job of the service.
+
+    Attributes:
+        id (str): Job id.
+        config (ConfigParser): Configuration of the simulation.
+        status (str): QUEUED, RUNNING, PAUSED, DONE, CANCELLED or FAILED.
+        results (Union[ResultsFrame, None]): Output counts, once the job starts.
+        error (Union[str, None]): Error of a failed job.
+        stream (StepStream): Output counts of every step, as they are logged.
+    """
+
+    def __init__(self, config: ConfigParser):
+        self.id = uuid.uuid4().hex[:12]
+        self.config = config
+        self.status = QUEUED
+        self.results = None
+        self.error = None
+        self.stream = StepStream()
+        self.run_id = None
+        self.output_file = None
+        self.replay_file = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.worker = None
+        self.cancelled = False
+
+    def describe(self) -> Dict:
+        """Status of the job, as answered by the service."""
+        progress = self.worker.progress() if self.worker is not None else dict()
+        return {
+            'id': self.id,
+            'status': self.status,
+            'scene': self.config.scene,
+            'rules': self.config.rules,
+            'seed': self.config.seed,
+            'max_steps': self.config.max_steps,
+            'step': self.results.last_step if self.results else None,
+            'steps_per_s': progress.get('steps_per_s'),
+            'eta_s': progress.get('eta_s'),
+            'run': self.run_id,
+            'output': self.output_file,
+            'replay': self.replay_file,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """Runs jobs on a bounded number of worker processes.
+
+    Attributes:
+        workers (int): Jobs run at the same time.
+        max_queued (int): Jobs waiting for a slot accepted at most.
+    """
+
+    def __init__(self, workers: int, max_queued: int = 100, keep: int = 1000,
+                 config_path: str = CONFIG_PATH, runs_path: str = RUNS_PATH):
+        """Initialize the queue. It must be created inside the service loop.
+
+        Args:
+            workers (int): Jobs run at the same time.
+            max_queued (int, optional): Jobs waiting for a slot accepted at most.
+            keep (int, optional): Finished jobs remembered, the oldest are forgotten.
+            config_path (str, optional): Configuration file the job fields override.
+            runs_path (str, optional): Directory of the run outputs.
+        """
+        if workers <= 0:
+            raise ValueError(f'Number of workers must be positive, got {workers}')
+        self.workers = workers
+        self.max_queued = max_queued
+        self._keep = keep
+        self._config_path = config_path
+        self._runs_path = runs_path
+        self._slots = asyncio.Semaphore(workers)
+        self._jobs: Dict[str, Job] = OrderedDict()
+        self._tasks = set()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in every status."""
+        counts = dict()
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def jobs(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def get(self, job_id: str) -> Job:
+        """Job with an id.
+
+        Raises:
+            JobError: With status 404 if there is no such job.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise JobError(f'Job {job_id} not found', status=404)
+        return job
+
+    def submit(self, spec: Dict) -> Job:
+        """Queue a job.
+
+        Args:
+            spec (Dict): ``scene`` and ``rules`` names and optional ``config``
+                fields keyed by 'Section.Field'.
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            JobError: If the submission is not valid, or with status 503 if the
+                queue is full.
+        """
+        if not isinstance(spec, dict):
+            raise JobError('The job must be a JSON object')
+        fields = spec.get('config', dict())
+        if not isinstance(fields, dict):
+            raise JobError('The "config" of a job must be an object of Section.Field values')
+        overrides = dict(fields)
+        for name, field in (('scene', 'Input.Scene'), ('rules', 'Input.Rules')):
+            if name in spec:
+                overrides[field] = spec[name]
+        try:
+            config = ConfigParser(self._config_path, overrides)
+        except ValueError as error:
+            raise JobError(str(error))
+        for name in (config.scene, config.rules):
+            if not name or any(character in str(name) for character in PATH_CHARACTERS):
+                raise JobError(f'Scene and rules must be names of the scenes and rules directories, got "{name}"')
+        if self.counts().get(QUEUED, 0) >= self.max_queued:
+            raise JobError(f'The queue is full ({self.max_queued} jobs waiting)', status=503)
+
+        job = Job(config)
+        self._jobs[job.id] = job
+        self.__forget()
+        task = asyncio.get_running_loop().create_task(self.__run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def subscribe(self, job_id: str) -> Subscription:
+        """Subscribe to the steps of a job, starting with its last logged one."""
+        return self.get(job_id).stream.subscribe()
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued job, or stop a running one after its current step."""
+        job = self.get(job_id)
+        if job.status in FINISHED:
+            raise JobError(f'Job {job_id} is already {job.status}', status=409)
+        job.cancelled = True
+        if job.worker is not None:
+            job.worker.cancel()
+        return job
+
+    def pause(self, job_id: str) -> Job:
+        job = self.__running(job_id)
+        job.worker.pause()
+        job.status = PAUSED
+        return job
+
+    def resume(self, job_id: str) -> Job:
+        job = self.__running(job_id)
+        job.worker.resume()
+        job.status = RUNNING
+        return job
+
+    async def close(self):
+        """Cancel every job and wait for their workers to stop."""
+        for job in self._jobs.values():
+            job.cancelled = True
+            if job.worker is not None:
+                job.worker.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def __running(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job.worker is None or job.status not in (RUNNING, PAUSED):
+            raise JobError(f'Job {job_id} is not running', status=409)
+        return job
+
+    def __forget(self):
+        finished = [job.id for job in self._jobs.values() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self._keep, 0)]:
+            del self._jobs[job_id]
+
+    def __start_worker(self, config: ConfigParser) -> SimulationWorker:
+        """Parse the model of a job and start its worker process."""
+        parser = ParserFactory(config)
+        alphabet, rules, output = parser.load_rules()
+        model = alphabet, rules, output, parser.load_scene()
+        worker = SimulationWorker(model, config.inference, seed=config.seed, keyframes=config.keyframes,
+                                  runs_path=self._runs_path, selection=config.selection, workers=config.workers,
+                                  shards=config.shards, shard_processes=config.shard_processes,
+                                  trace=config.trace, timings=config.timings, wide_output=config.wide_output,
+                                  rule_stats=config.rule_stats, memory=config.memory,
+                                  structure=config.structure)
+        try:
+            worker.start()
+        except Exception:
+            worker.close()
+            raise
+        return worker
+
+    async def __run(self, job: Job):
+        try:
+            await self.__execute(job)
+        finally:
+            job.stream.close({'status': job.status, 'step': job.results.last_step if job.results else None,
+                              'error': job.error})
+
+    async def __execute(self, job: Job):
+        async with self._slots:
+            if job.cancelled:
+                job.status = CANCELLED
+                job.finished = time.time()
+                return
+            job.status = RUNNING
+            job.started = time.time()
+            worker = None
+            try:
+                worker = await asyncio.to_thread(self.__start_worker, job.config)
+                job.worker = worker
+                job.run_id = worker.run_id
+                job.output_file = worker.output_file
+                job.replay_file = worker.replay_file
+                job.results = ResultsFrame(worker.objects)
+                worker.run(job.config.max_steps)
+                if job.cancelled:
+                    worker.cancel()
+                while worker.busy:
+                    for step, counts in await asyncio.to_thread(worker.poll, POLL_INTERVAL_S):
+                        job.results.append(step, counts)
+                        job.stream.publish(step, counts)
+                job.status = {DONE: DONE, CANCELLED: CANCELLED}.get(worker.state, FAILED)
+                job.error = worker.error
+                if job.config.store and job.status != FAILED and len(job.results):
+                    await asyncio.to_thread(record_run, job.config, job.run_id, job.results,
+                                            seconds=time.time() - job.started,
+                                            path=os.path.join(self._runs_path, STORE_FILE))
+            except Exception as error:
+                job.status = FAILED
+                job.error = f'{type(error).__name__}: {error}'
+            finally:
+                job.finished = time.time()
+                if worker is not None:
+                    await asyncio.to_thread(worker.close)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+import os
+import re
+import sys
+import socket
+import json
+import asyncio
+import argparse
+
+from typing import Dict, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+"""
+Local HTTP simulation service.
+
+Exposes the engine as an asynchronous HTTP service that queues simulation
+jobs and runs them on a bounded pool of worker processes (see `JobQueue`), so
+the front and the batch scripts submit simulations instead of running them
+in their own interpreter:
+
+    python services/api/server.py --port 8765 --workers 4
+
+Endpoints, answering JSON but for the stream:
+    GET    /health                 Service status and number of jobs by status.
+    POST   /jobs                   Submit a job: {"scene", "rules", "config"}.
+    GET    /jobs                   Every job.
+    GET    /jobs/<id>              Job status and progress.
+    GET    /jobs/<id>/result       Output counts as columns, ?since=<step> for
+                                   the steps after a given one.
+    GET    /jobs/<id>/stream       Server-sent events with the counts of every
+                                   step as it runs, then an "end" event.
+    POST   /jobs/<id>/pause        Pause a running job between two steps.
+    POST   /jobs/<id>/resume       Resume a paused job.
+    DELETE /jobs/<id>              Cancel a job.
+
+The server only needs the standard library and the engine. It binds to the
+loopback interface by default: it runs scenes from the local directories and
+has no authentication.
+"""
+
+API_PATH = os.path.dirname(os.path.abspath(__file__))
+ENGINE_PATH = os.path.join(os.path.dirname(API_PATH), 'engine')
+if ENGINE_PATH not in sys.path:
+    sys.path.insert(0, ENGINE_PATH)
+
+from jobs import JobError, JobQueue  # noqa: E402
+from stream import Subscription, encode_event  # noqa: E402
+from src.utils.aux import RUNS_PATH  # noqa: E402
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1 << 20
+# Seconds without steps before a stream sends a comment, to detect closed clients
+HEARTBEAT_S = 15.0
+# Send buffer of the streams, small so slow clients are conflated instead of buffered
+STREAM_SEND_BUFFER = 16 * 1024
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+ROUTES = (
+    ('GET', re.compile(r'/health'), 'health'),
+    ('POST', re.compile(r'/jobs'), 'submit'),
+    ('GET', re.compile(r'/jobs'), 'list_jobs'),
+    ('GET', re.compile(r'/jobs/(?P<job_id>\w+)'), 'job'),
+    ('DELETE', re.compile(r'/jobs/(?P<job_id>\w+)'), 'cancel'),
+    ('GET', re.compile(r'/jobs/(?P<job_id>\w+)/result'), 'result'),
+    ('GET', re.compile(r'/jobs/(?P<job_id>\w+)/stream'), 'stream'),
+    ('POST', re.compile(r'/jobs/(?P<job_id>\w+)/pause'), 'pause'),
+    ('POST', re.compile(r'/jobs/(?P<job_id>\w+)/resume'), 'resume'),
+)
+
+
+class Request:
+    """Parsed HTTP request.
+
+    Attributes:
+        method (str): HTTP method.
+        path (str): Path, without the query.
+        query (Dict[str, str]): Last value of every query parameter.
+        headers (Dict[str, str]): Headers, with lowercase names.
+        body (bytes): Body of the request.
+    """
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path.rstrip('/') or '/'
+        self.query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body or b'{}')
+        except ValueError:
+            raise JobError('The body must be JSON')
+
+
+async def read_request(reader: asyncio.StreamReader) -> Union[Request, None]:
+    """Read a request from a connection, None if it was closed before one.
+
+    Raises:
+        JobError: If the request is malformed or too large.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise JobError('Malformed request line')
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise JobError('Request body too large', status=413)
+    body = await reader.readexactly(length) if length else b''
+    return Request(method.upper(), target, headers, body)
+
+
+def encode_response(status: int, payload: Dict) -> bytes:
+    body = json.dumps(payload).encode('utf-8')
+    head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            'Connection: close\r\n\r\n')
+    return head.encode('latin-1') + body
+
+
+class SimulationService:
+    """Routes the HTTP requests of the service to its job queue."""
+
+    def __init__(self, queue: JobQueue):
+        self.queue = queue
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer one request and close the connection."""
+        try:
+            request = await read_request(reader)
+            if request is None:
+                writer.close()
+                return
+            answer = self.dispatch(request)
+        except JobError as error:
+            answer = error.status, {'error': str(error)}
+        except Exception as error:
+            answer = 500, {'error': f'{type(error).__name__}: {error}'}
+        try:
+            if isinstance(answer, Subscription):
+                await self.__stream(writer, answer)
+            else:
+                writer.write(encode_response(*answer))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def __stream(self, writer: asyncio.StreamWriter, subscription: Subscription):
+        """Send the events of a subscription until its job ends.
+
+        Every event is written once the previous ones are drained to the
+        client, so a slow client accumulates pending steps in its subscription,
+        where they are conflated, and never slows down the job.
+        """
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, STREAM_SEND_BUFFER)
+        writer.transport.set_write_buffer_limits(high=STREAM_SEND_BUFFER)
+        writer.write(b'HTTP/1.1 200 OK\r\n'
+                     b'Content-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\n'
+                     b'Connection: close\r\n\r\n')
+        try:
+            await writer.drain()
+            while True:
+                try:
+                    kind, event = await asyncio.wait_for(subscription.get(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    writer.write(b': heartbeat\n\n')
+                    await writer.drain()
+                    continue
+                if kind == 'closed':
+                    break
+                writer.write(encode_event(kind, event, event.get('step') if kind == 'step' else None))
+                await writer.drain()
+        finally:
+            subscription.release()
+
+    def dispatch(self, request: Request) -> Union[Tuple[int, Dict], Subscription]:
+        """Call the handler of the route of a request.
+
+        Returns:
+            Union[Tuple[int, Dict], Subscription]: Status and JSON payload of
+                the answer, or the subscription of a stream.
+        """
+        allowed = False
+        for method, pattern, name in ROUTES:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            if method == request.method:
+                return getattr(self, name)(request, **match.groupdict())
+            allowed = True
+        if allowed:
+            raise JobError(f'Method {request.method} not allowed on {request.path}', status=405)
+        raise JobError(f'No endpoint {request.path}', status=404)
+
+    def health(self, request: Request) -> Tuple[int, Dict]:
+        return 200, {'status': 'ok', 'workers': self.queue.workers, 'jobs': self.queue.counts()}
+
+    def submit(self, request: Request) -> Tuple[int, Dict]:
+        return 202, self.queue.submit(request.json()).describe()
+
+    def list_jobs(self, request: Request) -> Tuple[int, Dict]:
+        return 200, {'jobs': [job.describe() for job in self.queue.jobs()]}
+
+    def job(self, request: Request, job_id: str) -> Tuple[int, Dict]:
+        return 200, self.queue.get(job_id).describe()
+
+    def cancel(self, request: Request, job_id: str) -> Tuple[int, Dict]:
+        return 202, self.queue.cancel(job_id).describe()
+
+    def pause(self, request: Request, job_id: str) -> Tuple[int, Dict]:
+        return 200, self.queue.pause(job_id).describe()
+
+    def resume(self, request: Request, job_id: str) -> Tuple[int, Dict]:
+        return 200, self.queue.resume(job_id).describe()
+
+    def stream(self, request: Request, job_id: str) -> Subscription:
+        return self.queue.subscribe(job_id)
+
+    def result(self, request: Request, job_id: str) -> Tuple[int, Dict]:
+        job = self.queue.get(job_id)
+        payload = {'id': job.id, 'status': job.status, 'objects': [], 'steps': [], 'columns': dict()}
+        if job.results is None:
+            return 200, payload
+        results = job.results
+        rows = slice(None)
+        if 'since' in request.query:
+            try:
+                since = int(request.query['since'])
+            except ValueError:
+                raise JobError('"since" must be a step number')
+            rows = results.window(since + 1, results.last_step) if len(results) else rows
+        payload['objects'] = results.objects
+        payload['steps'] = results.steps[rows].tolist()
+        payload['columns'] = {obj: column[rows].tolist() for obj, column in results.columns().items()}
+        return 200, payload
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: Union[int, None] = None,
+                max_queued: int = 100, ready=None, runs_path: str = RUNS_PATH):
+    """Run the service until it is cancelled.
+
+    Args:
+        host (str, optional): Address to bind.
+        port (int, optional): Port to bind, 0 for any free port.
+        workers (Union[int, None], optional): Jobs run at the same time.
+            Defaults to the number of CPUs.
+        max_queued (int, optional): Jobs waiting for a slot accepted at most.
+        ready (Callable[[Tuple], None], optional): Called with the bound address
+            once the service accepts connections.
+        runs_path (str, optional): Directory of the run outputs.
+    """
+    queue = JobQueue(workers or os.cpu_count() or 1, max_queued=max_queued, runs_path=runs_path)
+    service = SimulationService(queue)
+    server = await asyncio.start_server(service.handle, host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await queue.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='P-System simulation service.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Address to bind (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to bind (default: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=None, help='Jobs run at the same time (default: CPUs)')
+    parser.add_argument('--max-queued', type=int, default=100, help='Jobs waiting for a worker accepted at most')
+    args = parser.parse_args(argv)
+    # The project paths are relative to the engine directory
+    os.chdir(ENGINE_PATH)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_queued,
+                          ready=lambda address: print(f'Serving on http://{address[0]}:{address[1]}')))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
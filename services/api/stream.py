@@ -0,0 +1,141 @@
+import json
+import asyncio
+
+from collections import deque
+from typing import Dict, List, Tuple, Union
+
+"""
+Per-step streams of the output counts of the jobs.
+
+A job publishes the counts of every logged step to its `StepStream`, and every
+client watching it has a `Subscription` with a bounded buffer of pending
+steps. Publishing never waits for the clients: when a client is slower than
+the simulation and its buffer fills, the pending steps are conflated into the
+newest one. The counts of a step are the full state of the output objects, so
+a conflated client skips intermediate steps but always sees the latest counts.
+"""
+
+# Pending steps of a subscription before they are conflated
+STREAM_BUFFER = 64
+
+
+def encode_event(event: str, data: Dict, event_id: Union[int, None] = None) -> bytes:
+    """Server-sent event with a JSON payload."""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class Subscription:
+    """Steps of a stream pending to be sent to one client.
+
+    Attributes:
+        buffer (int): Pending steps kept before conflating them.
+        conflated (int): Steps skipped so far because the client was slow.
+    """
+
+    def __init__(self, buffer: int = STREAM_BUFFER, stream: Union['StepStream', None] = None):
+        if buffer <= 0:
+            raise ValueError(f'Stream buffer must be positive, got {buffer}')
+        self._stream = stream
+        self.buffer = buffer
+        self.conflated = 0
+        self._events = deque()
+        self._end = None
+        self._sent_end = False
+        self._ready = asyncio.Event()
+
+    @property
+    def pending(self) -> int:
+        return len(self._events)
+
+    def push(self, event: Dict):
+        """Queue a step event, conflating the pending ones if the buffer is full.
+
+        Args:
+            event (Dict): ``step``, ``counts`` and ``skipped``, the steps
+                conflated into it.
+        """
+        if len(self._events) >= self.buffer:
+            skipped = sum(pending['skipped'] + 1 for pending in self._events)
+            self.conflated += len(self._events)
+            self._events.clear()
+            event = {**event, 'skipped': event['skipped'] + skipped}
+        self._events.append(event)
+        self._ready.set()
+
+    def close(self, end: Dict):
+        """End the stream after the pending steps with a final event."""
+        self._end = end
+        self._ready.set()
+
+    def release(self):
+        """Stop receiving steps, once the client is gone."""
+        if self._stream is not None:
+            self._stream.unsubscribe(self)
+
+    async def get(self) -> Tuple[str, Union[Dict, None]]:
+        """Wait for the next event.
+
+        Returns:
+            Tuple[str, Union[Dict, None]]: ``('step', event)``, ``('end', end)``
+                once the pending steps are sent, or ``('closed', None)`` after it.
+        """
+        while not self._events and self._end is None:
+            self._ready.clear()
+            await self._ready.wait()
+        if self._events:
+            return 'step', self._events.popleft()
+        if self._sent_end:
+            return 'closed', None
+        self._sent_end = True
+        return 'end', self._end
+
+
+class StepStream:
+    """Broadcasts the steps of a job to its subscriptions.
+
+    Attributes:
+        last (Union[Dict, None]): Last published step event.
+        end (Union[Dict, None]): Final event, once the job is finished.
+    """
+
+    def __init__(self, buffer: int = STREAM_BUFFER):
+        self._buffer = buffer
+        self._subscriptions: List[Subscription] = []
+        self.last = None
+        self.end = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self) -> Subscription:
+        """New subscription, starting with the last published step."""
+        subscription = Subscription(self._buffer, self)
+        if self.last is not None:
+            subscription.push(self.last)
+        if self.end is not None:
+            subscription.close(self.end)
+        else:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, step: int, counts: List[Tuple[str, int]]):
+        """Send the counts of a step to every subscription, without waiting."""
+        self.last = {'step': step, 'counts': dict(counts), 'skipped': 0}
+        for subscription in self._subscriptions:
+            subscription.push(self.last)
+
+    def close(self, end: Dict):
+        """Finish the stream: subscriptions get ``end`` after their pending steps."""
+        self.end = end
+        for subscription in self._subscriptions:
+            subscription.close(end)
+        self._subscriptions.clear()
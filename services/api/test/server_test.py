@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import pytest
+from server import ENGINE_PATH, serve
+from src.utils.api_client import ApiClient, ApiError, CANCELLED, DONE, QUEUED
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(ENGINE_PATH)
+    loop = asyncio.new_event_loop()
+    bound = threading.Event()
+    address = []
+
+    def ready(sockname):
+        address.append(sockname)
+        bound.set()
+
+    task = loop.create_task(serve('127.0.0.1', 0, workers=1, ready=ready, runs_path=f'{tmp_path}/'))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert bound.wait(10)
+    yield ApiClient(f'http://127.0.0.1:{address[0][1]}')
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(10)
+
+
+class TestSimulationService:
+
+    def test_job_runs_to_completion(self, client):
+        job = client.submit('scene_00', 'rules_00', {'Runtime.MaxSteps': 20, 'Runtime.Seed': 7,
+                                                     'Runtime.Inference': 'maxpar'})
+        job = client.wait(job['id'], interval=0.1, timeout=60)
+        assert job['status'] == DONE and job['step'] == 20
+        result = client.result(job['id'])
+        assert result['steps'][0] == 0 and result['steps'][-1] == 20
+        assert set(result['columns']) == set(result['objects'])
+        assert client.result(job['id'], since=18)['steps'] == [19, 20]
+
+    def test_bounded_pool_and_cancel(self, client):
+        """Con un único worker el segundo trabajo espera en la cola y se puede cancelar"""
+        config = {'Runtime.MaxSteps': 10 ** 7, 'Runtime.Inference': 'minpar'}
+        first = client.submit('scene_00', 'rules_00', config)
+        second = client.submit('scene_00', 'rules_00', config)
+        assert client.job(second['id'])['status'] == QUEUED
+        assert client.cancel(second['id'])['id'] == second['id']
+        client.cancel(first['id'])
+        assert client.wait(first['id'], interval=0.1, timeout=60)['status'] == CANCELLED
+        assert client.wait(second['id'], interval=0.1, timeout=60)['status'] == CANCELLED
+        assert client.health()['jobs'] == {CANCELLED: 2}
+
+    def test_stream_follows_the_job(self, client):
+        job = client.submit('scene_00', 'rules_00', {'Runtime.MaxSteps': 50, 'Runtime.Seed': 7,
+                                                     'Runtime.Inference': 'maxpar'})
+        events = list(client.stream(job['id']))
+        kinds = [kind for kind, _ in events]
+        assert kinds[-1] == 'end' and set(kinds[:-1]) == {'step'}
+        assert events[-1][1]['status'] == DONE and events[-1][1]['step'] == 50
+        steps = [data['step'] for _, data in events[:-1]]
+        assert steps == sorted(steps) and steps[-1] == 50
+        result = client.result(job['id'])
+        last = {obj: column[-1] for obj, column in result['columns'].items()}
+        assert events[-2][1]['counts'] == last
+        # A finished job streams its last step and the end
+        assert [kind for kind, _ in client.stream(job['id'])] == ['step', 'end']
+
+    def test_invalid_requests(self, client):
+        with pytest.raises(ApiError) as error:
+            client.submit('../scene_00', 'rules_00')
+        assert error.value.status == 400
+        with pytest.raises(ApiError) as error:
+            client.job('missing')
+        assert error.value.status == 404
+        with pytest.raises(ApiError) as error:
+            list(client.stream('missing'))
+        assert error.value.status == 404
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from stream import StepStream, Subscription, encode_event
+
+
+def drain(subscription: Subscription):
+    async def collect():
+        events = []
+        while True:
+            kind, event = await subscription.get()
+            if kind == 'closed':
+                return events
+            events.append((kind, event))
+    return asyncio.run(collect())
+
+
+class TestStepStream:
+
+    def test_slow_subscriber_is_conflated(self):
+        """Un cliente lento recibe los pasos pendientes fusionados en el último"""
+        stream = StepStream(buffer=4)
+        subscription = stream.subscribe()
+        for step in range(10):
+            stream.publish(step, [('a', step)])
+        stream.close({'status': 'done', 'step': 9, 'error': None})
+        events = drain(subscription)
+        assert [event['step'] for _, event in events[:-1]] == [8, 9]
+        assert [event['skipped'] for _, event in events[:-1]] == [8, 0]
+        assert events[-2][1]['counts'] == {'a': 9}
+        assert events[-1] == ('end', {'status': 'done', 'step': 9, 'error': None})
+        assert subscription.conflated == 8 and stream.subscribers == 0
+
+    def test_late_subscriber_starts_with_last_step(self):
+        stream = StepStream()
+        stream.publish(0, [('a', 1)])
+        stream.publish(1, [('a', 2)])
+        subscription = stream.subscribe()
+        stream.publish(2, [('a', 3)])
+        subscription.release()
+        stream.publish(3, [('a', 4)])
+        assert subscription.pending == 2 and stream.subscribers == 0
+
+    def test_invalid_buffer(self):
+        with pytest.raises(ValueError):
+            Subscription(buffer=0)
+
+    def test_encode_event(self):
+        assert encode_event('step', {'step': 3}, 3) == b'event: step\nid: 3\ndata: {"step": 3}\n\n'
@@ -1,5 +1,7 @@
 from src.utils.config_parser import ConfigParser
 from src.utils.parser_factory import ParserFactory
+from src.utils.results import ResultsFrame
+from src.utils.results_store import record_run
 
 
 """
@@ -21,8 +23,9 @@ if __name__ == '__main__':
     5. Runs the simulation for the specified number of steps
     6. Displays final membrane structure
     
-    The simulation progress and rule applications are logged to trace files
-    and plots are generated during execution.
+    The simulation progress is logged to the run output file and, when the
+    Trace option is enabled, rule applications are recorded to a binary trace
+    that can be formatted with `TraceViewer`.
     """
     config = ConfigParser()
     parser = ParserFactory(config)
@@ -30,6 +33,18 @@ if __name__ == '__main__':
 
     # Control randomness
     system.seed(config.seed)
+    system.set_trace_level(config.trace)
+    system.set_replay(config.keyframes)
+    system.set_timings(config.timings)
+    system.set_wide_output(config.wide_output)
+    system.set_rule_stats(config.rule_stats)
+    system.set_memory_profile(config.memory)
+    system.set_structure_snapshots(config.structure)
+    system.set_selection(config.selection, config.workers)
+    system.set_shards(config.shards, config.shard_processes)
+    if config.store:
+        frame = ResultsFrame(system.output_objects)
+        system.set_step_listener(frame.append)
     
     print('\n========================== RULES ===========================')
     system.print_rules()
@@ -37,7 +52,12 @@ if __name__ == '__main__':
     print('\n================ STARTING MEMBRANE STRUCTURE ================')
     system.print_membranes()
 
-    system.run(config.max_steps)
+    try:
+        system.run(config.max_steps)
+    finally:
+        system.close()
+    if config.store:
+        record_run(config, system.run_id, frame, steps=system.step)
 
     print('\n================== FINAL MEMBRANE STRUCTURE ==================')
     system.print_membranes()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+
+"""
+Command-line driver for the P-System membrane computing simulator.
+
+Subcommands:
+    run       Run the configured simulation once.
+    ensemble  Run every scene/rules/seed combination of a manifest in one process.
+    submit    Submit every run of a manifest to the simulation service and wait
+              for them.
+    bench     Time repeated runs of the configured simulation, run the scaling
+              benchmark suite with --suite, or compare the standard workloads
+              with the committed baseline with --compare.
+
+Any field of the configuration file can be overridden with
+``--set Section.Field=value``, and the most common ones have their own flags
+(``--scene``, ``--rules``, ``--steps``, ``--seed``...). Paths given in the
+command line are relative to the current directory, so the driver can be
+launched from anywhere:
+
+    python services/engine/psys.py run --scene scene_01 --steps 50 --seed 7 -q
+    python services/engine/psys.py ensemble config/manifest.json --summary ensemble.csv
+    python services/engine/psys.py submit config/manifest.json --url http://127.0.0.1:8765
+
+Simulation modules are imported by the subcommands, so parsing the command line
+or printing the help does not load the engine.
+"""
+
+ENGINE_PATH = os.path.dirname(os.path.abspath(__file__))
+if ENGINE_PATH not in sys.path:
+    sys.path.insert(0, ENGINE_PATH)
+
+# Flags that are shortcuts of configuration fields
+SHORTCUTS = {
+    'format': 'Input.Format',
+    'scene': 'Input.Scene',
+    'rules': 'Input.Rules',
+    'inference': 'Runtime.Inference',
+    'steps': 'Runtime.MaxSteps',
+    'seed': 'Runtime.Seed',
+    'trace': 'Runtime.Trace',
+    'keyframes': 'Runtime.Keyframes',
+    'rule_stats': 'Runtime.RuleStats',
+    'memory': 'Runtime.Memory',
+    'structure': 'Runtime.Structure',
+    'selection': 'Runtime.Selection',
+    'workers': 'Runtime.Workers',
+    'shards': 'Runtime.Shards',
+}
+SUMMARY_FIELDS = ('scene', 'rules', 'seed', 'steps', 'seconds', 'output')
+
+
+def parse_assignment(text: str):
+    """Split a 'Section.Field=value' override."""
+    name, sep, value = text.partition('=')
+    if not sep or '.' not in name:
+        raise argparse.ArgumentTypeError(f'"{text}" is not in the Section.Field=value form')
+    return name.strip(), value.strip()
+
+
+def cli_overrides(args) -> dict:
+    """Collect the configuration overrides given in the command line."""
+    overrides = dict(args.set)
+    for flag, field in SHORTCUTS.items():
+        value = getattr(args, flag)
+        if value is not None:
+            overrides[field] = value
+    if args.no_cache:
+        overrides['Input.Cache'] = False
+    if args.timings:
+        overrides['Runtime.Timings'] = True
+    if args.wide:
+        overrides['Runtime.WideOutput'] = True
+    if args.store:
+        overrides['Runtime.Store'] = True
+    if args.inline_shards:
+        overrides['Runtime.ShardProcesses'] = False
+    return overrides
+
+
+def load_config(args, overrides: dict | None = None):
+    """Read the configuration file with the manifest and command-line overrides.
+
+    Command-line overrides take precedence over the given ones.
+    """
+    from src.utils.config_parser import ConfigParser
+    return ConfigParser(args.config, {**(overrides or dict()), **cli_overrides(args)})
+
+
+def simulate(config, quiet: bool = True) -> dict:
+    """Build and run the system described by a configuration.
+
+    Args:
+        config (ConfigParser): Configuration of the run.
+        quiet (bool, optional): Skip printing the rules and the membrane
+            structure. Defaults to True.
+
+    Returns:
+        dict: Summary of the run, with the fields in SUMMARY_FIELDS.
+    """
+    from src.utils.parser_factory import ParserFactory
+    from src.utils.results import ResultsFrame
+
+    system = ParserFactory(config).parse()
+    system.seed(config.seed)
+    system.set_trace_level(config.trace)
+    system.set_replay(config.keyframes)
+    system.set_timings(config.timings)
+    system.set_wide_output(config.wide_output)
+    system.set_rule_stats(config.rule_stats)
+    system.set_memory_profile(config.memory)
+    system.set_structure_snapshots(config.structure)
+    system.set_selection(config.selection, config.workers)
+    system.set_shards(config.shards, config.shard_processes)
+    frame = None
+    if config.store:
+        frame = ResultsFrame(system.output_objects)
+        system.set_step_listener(frame.append)
+    if not quiet:
+        print('\n========================== RULES ===========================')
+        system.print_rules()
+        print('\n================ STARTING MEMBRANE STRUCTURE ================')
+        system.print_membranes()
+
+    start = time.perf_counter()
+    try:
+        system.run(config.max_steps)
+    finally:
+        system.close()
+    seconds = time.perf_counter() - start
+    if frame is not None:
+        from src.utils.results_store import record_run
+        record_run(config, system.run_id, frame, steps=system.step, seconds=seconds)
+
+    if not quiet:
+        print('\n================== FINAL MEMBRANE STRUCTURE ==================')
+        system.print_membranes()
+    return {'scene': config.scene, 'rules': config.rules, 'seed': config.seed,
+            'steps': system.step, 'seconds': round(seconds, 6), 'output': system.output_file}
+
+
+def format_summary(summary: dict) -> str:
+    return ' '.join(f'{field}={summary[field]}' for field in SUMMARY_FIELDS)
+
+
+def write_summary(path: str, summaries: list):
+    import csv
+    with open(path, 'w+', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+
+
+def expand_manifest(manifest) -> list:
+    """Expand a manifest into the overrides of every run.
+
+    A manifest is a list of runs, or an object with optional "defaults" and a
+    list of "runs". Every run maps 'Section.Field' names to values; list values
+    are expanded, so a run with two rules files and three seeds becomes six runs:
+
+        {"defaults": {"Runtime.MaxSteps": 100},
+         "runs": [{"Input.Scene": "scene_00",
+                   "Input.Rules": ["rules_00", "rules_01"],
+                   "Runtime.Seed": [1, 2, 3]}]}
+
+    Raises:
+        ValueError: If the manifest does not follow this format.
+    """
+    if isinstance(manifest, list):
+        manifest = {'runs': manifest}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('runs'), list):
+        raise ValueError('The manifest must be a list of runs or an object with a list of "runs"')
+    defaults = manifest.get('defaults', dict())
+    expanded = []
+    for run in manifest['runs']:
+        if not isinstance(run, dict):
+            raise ValueError(f'Every run of the manifest must be an object, got {run!r}')
+        fields = {**defaults, **run}
+        names = list(fields)
+        values = [value if isinstance(value, list) else [value] for value in fields.values()]
+        expanded.extend(dict(zip(names, combination)) for combination in itertools.product(*values))
+    return expanded
+
+
+def cmd_run(args):
+    config = load_config(args)
+    summary = simulate(config, quiet=args.quiet)
+    print(format_summary(summary))
+
+
+def cmd_ensemble(args):
+    with open(args.manifest, 'r', encoding='utf-8') as f:
+        runs = expand_manifest(json.load(f))
+
+    summaries = []
+    for i, overrides in enumerate(runs):
+        summary = simulate(load_config(args, overrides))
+        summaries.append(summary)
+        print(f'[{i + 1}/{len(runs)}] {format_summary(summary)}')
+
+    if args.summary is not None:
+        write_summary(args.summary, summaries)
+
+
+def cmd_submit(args):
+    from src.utils.api_client import ApiClient, DONE
+
+    with open(args.manifest, 'r', encoding='utf-8') as f:
+        runs = expand_manifest(json.load(f))
+
+    # The service reads its own configuration file: only the fields of the
+    # manifest and the command line are sent
+    client = ApiClient(args.url)
+    jobs = []
+    for overrides in runs:
+        fields = {**overrides, **cli_overrides(args)}
+        jobs.append(client.submit(fields.pop('Input.Scene', None), fields.pop('Input.Rules', None), fields))
+    print(f'Submitted {len(jobs)} jobs to {client.url}')
+
+    summaries, failed = [], 0
+    for i, job in enumerate(jobs):
+        job = client.wait(job['id'])
+        summary = {'scene': job['scene'], 'rules': job['rules'], 'seed': job['seed'], 'steps': job['step'],
+                   'seconds': round(job['finished'] - job['started'], 6) if job['started'] else 0.0,
+                   'output': job['output']}
+        summaries.append(summary)
+        status = '' if job['status'] == DONE else f' status={job["status"]}'
+        print(f'[{i + 1}/{len(jobs)}] {format_summary(summary)}{status}')
+        if job['error']:
+            print(f'    {job["error"]}')
+        failed += job['status'] != DONE
+
+    if args.summary is not None:
+        write_summary(args.summary, summaries)
+    if failed:
+        sys.exit(1)
+
+
+def cmd_bench(args):
+    if args.suite:
+        from src.bench import suite
+        suite.main(args)
+        return
+    if args.compare or args.update_baseline:
+        from src.bench import gate
+        if args.repeat is None:
+            args.repeat = gate.DEFAULT_REPEAT
+        sys.exit(gate.main(args))
+
+    import statistics
+
+    if args.repeat is None:
+        args.repeat = 3
+    times, steps = [], None
+    for _ in range(args.repeat):
+        summary = simulate(load_config(args))
+        times.append(summary['seconds'])
+        steps = summary['steps']
+    median = statistics.median(times)
+    print(f'repeats={args.repeat} steps={steps} median={median:.6f}s min={min(times):.6f}s '
+          f'steps/s={steps / median if median > 0 else float("inf"):.1f}')
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    from src.bench.scenes import add_suite_arguments, add_gate_arguments
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=None, help='Configuration file (default: config/config.ini)')
+    common.add_argument('--set', action='append', default=[], type=parse_assignment, metavar='SECTION.FIELD=VALUE',
+                        help='Override a configuration field (repeatable)')
+    common.add_argument('--format', choices=['xml', 'json'], help='Input format')
+    common.add_argument('--scene', help='Scene name')
+    common.add_argument('--rules', help='Rules name')
+    common.add_argument('--inference', choices=['minpar', 'maxpar'], help='Inference mode')
+    common.add_argument('--steps', type=int, help='Maximum number of steps')
+    common.add_argument('--seed', type=int, help='Random seed')
+    common.add_argument('--trace', choices=['off', 'counts', 'full'], help='Rule application trace level')
+    common.add_argument('--keyframes', type=int, help='Record replay deltas with a keyframe every N steps')
+    common.add_argument('--no-cache', action='store_true', help='Parse the model files without the model cache')
+    common.add_argument('--timings', action='store_true', help='Write the duration of the step phases to a CSV')
+    common.add_argument('--wide', action='store_true', help='Also write the output as a table with a column per object')
+    common.add_argument('--store', action='store_true', help='Record the run in the results store')
+    common.add_argument('--rule-stats', choices=['off', 'summary', 'steps'],
+                        help='Count the checks, draws and applications of every rule')
+    common.add_argument('--memory', type=int, metavar='N', help='Sample the memory of the system every N steps')
+    common.add_argument('--structure', type=int, metavar='N', help='Export the membrane structure every N steps')
+    common.add_argument('--selection', choices=['serial', 'blocks', 'thread', 'process'], help='Selection phase backend')
+    common.add_argument('--workers', type=int, help='Workers of the parallel selection')
+    common.add_argument('--shards', type=int, metavar='N', help='Split the skin children into N parallel shards')
+    common.add_argument('--inline-shards', action='store_true', help='Run the shards in this process')
+
+    parser = argparse.ArgumentParser(prog='psys', description='P-System membrane computing simulator.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', parents=[common], help='Run the configured simulation')
+    run.add_argument('-q', '--quiet', action='store_true', help='Do not print the rules and membrane structures')
+    run.set_defaults(handler=cmd_run)
+
+    ensemble = commands.add_parser('ensemble', parents=[common], help='Run every combination of a manifest')
+    ensemble.add_argument('manifest', help='JSON manifest of runs')
+    ensemble.add_argument('--summary', default=None, help='CSV file to write the summary of the runs to')
+    ensemble.set_defaults(handler=cmd_ensemble)
+
+    submit = commands.add_parser('submit', parents=[common], help='Run every combination of a manifest on the '
+                                                                  'simulation service')
+    submit.add_argument('manifest', help='JSON manifest of runs')
+    submit.add_argument('--url', default=os.environ.get('PSYS_API_URL', 'http://127.0.0.1:8765'),
+                        help='URL of the simulation service (default: $PSYS_API_URL or http://127.0.0.1:8765)')
+    submit.add_argument('--summary', default=None, help='CSV file to write the summary of the runs to')
+    submit.set_defaults(handler=cmd_submit)
+
+    bench = commands.add_parser('bench', parents=[common], help='Time repeated runs of the configured simulation')
+    bench.add_argument('--repeat', type=int, default=None, help='Number of runs (default: 3, 5 with --compare)')
+    bench.add_argument('--suite', action='store_true', help='Run the scaling benchmark suite on synthetic scenes')
+    bench.add_argument('--compare', action='store_true',
+                       help='Compare the standard workloads with the baseline, exit 1 on regressions')
+    add_suite_arguments(bench.add_argument_group('suite'))
+    add_gate_arguments(bench.add_argument_group('gate'))
+    bench.set_defaults(handler=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    # Resolve the user paths before moving to the engine directory, which the
+    # project paths are relative to
+    for name in ('config', 'manifest', 'summary', 'output', 'baseline'):
+        if getattr(args, name, None) is not None:
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    os.chdir(ENGINE_PATH)
+    if args.config is None:
+        from src.utils.aux import CONFIG_PATH
+        args.config = CONFIG_PATH
+    elif not os.path.isfile(args.config):
+        raise SystemExit(f'psys: configuration file {args.config} not found')
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
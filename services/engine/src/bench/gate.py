@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import itertools
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from src.bench.scenes import (DEFAULT_MODES, DEFAULT_REPEAT, DEFAULT_SEED, DEFAULT_STEPS, DEFAULT_TOLERANCE,
+                              GATE_SIZES, SCENARIOS, add_gate_arguments)
+from src.bench.suite import run_case
+
+"""
+Performance regression gate for the P-System engine.
+
+Runs the standard workloads, every combination of the benchmark scenarios, the
+GATE_SIZES populations and both inference modes, several times each, and
+compares the median run time of every workload with the committed baseline:
+
+    python -m src.bench.gate                    # compare, exit 1 on regressions
+    python -m src.bench.gate --update-baseline  # record a new baseline
+
+A workload regresses when its median exceeds the baseline median by more than
+the relative tolerance, by more than NOISE_FACTOR times the scaled median
+absolute deviation of the noisier of the two measurements, and by more than
+MIN_SLOWDOWN_S, so a noisy machine or a workload of a few milliseconds widens
+the threshold instead of failing the gate. Everything runs locally,
+the workloads are generated on the fly and nothing is downloaded.
+"""
+
+NOISE_FACTOR = 3.0
+# Slowdowns below this are scheduler and timer noise
+MIN_SLOWDOWN_S = 0.005
+# Scale of the MAD to estimate the standard deviation of normal noise
+MAD_SCALE = 1.4826
+
+
+def median_mad(values: List[float]) -> Tuple[float, float]:
+    """Median and median absolute deviation of a sample."""
+    median = statistics.median(values)
+    return median, statistics.median(abs(value - median) for value in values)
+
+
+def workload_name(workload: Dict) -> str:
+    return f'{workload["scenario"]}/{workload["membranes"]}/{workload["inference"]}'
+
+
+def measure(scenario: str, size: int, inference: str, steps: int, seed: int, repeat: int) -> Dict:
+    """Run a workload ``repeat`` times in the current process.
+
+    Returns:
+        Dict: Workload with the run time of every repetition, their median and
+            MAD, and the number of rule applications of a run.
+    """
+    results = [run_case(scenario, size, inference, steps, seed) for _ in range(repeat)]
+    times = [result['run_s'] for result in results]
+    median, mad = median_mad(times)
+    return {
+        'scenario': scenario,
+        'membranes': size,
+        'inference': inference,
+        'steps': results[0]['steps'],
+        'applications': results[0]['applications'],
+        'median_s': round(median, 6),
+        'mad_s': round(mad, 6),
+        'runs_s': times,
+    }
+
+
+def run_workloads(repeat: int = DEFAULT_REPEAT, steps: int = DEFAULT_STEPS, seed: int = DEFAULT_SEED,
+                  progress=None) -> Dict:
+    """Measure every standard workload, each one in a new process.
+
+    Args:
+        repeat (int, optional): Runs of every workload.
+        steps (int, optional): Steps of every run.
+        seed (int, optional): Seed of the runs.
+        progress (Callable[[Dict], None], optional): Called with every measured workload.
+
+    Returns:
+        Dict: Environment of the measurements and the measured workloads, in
+            the format of the baseline file.
+    """
+    from src.utils.model_cache import engine_version
+
+    workloads = []
+    context = multiprocessing.get_context('spawn')
+    for scenario, size, inference in itertools.product(SCENARIOS, GATE_SIZES, DEFAULT_MODES):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            workload = executor.submit(measure, scenario, size, inference, steps, seed, repeat).result()
+        workloads.append(workload)
+        if progress is not None:
+            progress(workload)
+    return {
+        'engine_version': engine_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'steps': steps,
+        'seed': seed,
+        'repeat': repeat,
+        'workloads': workloads,
+    }
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = DEFAULT_TOLERANCE,
+            noise_factor: float = NOISE_FACTOR) -> List[Dict]:
+    """Compare the workloads of a measurement with the ones of the baseline.
+
+    Args:
+        baseline (Dict): Baseline measurement.
+        current (Dict): New measurement.
+        tolerance (float, optional): Allowed relative slowdown of the median.
+        noise_factor (float, optional): Allowed slowdown in scaled MADs.
+
+    Returns:
+        List[Dict]: One comparison per workload of the new measurement, with its
+            ``status``: ``ok``, ``faster``, ``regression`` or ``new`` when the
+            baseline does not have it. ``changed`` is True when the seeded run
+            applied a different number of rules than in the baseline.
+    """
+    reference = {workload_name(workload): workload for workload in baseline['workloads']}
+    comparisons = []
+    for workload in current['workloads']:
+        name = workload_name(workload)
+        base = reference.get(name)
+        row = {'workload': name, 'current_s': workload['median_s'], 'current_mad_s': workload['mad_s']}
+        if base is None:
+            comparisons.append({**row, 'status': 'new', 'changed': False})
+            continue
+        noise = noise_factor * MAD_SCALE * max(base['mad_s'], workload['mad_s'])
+        margin = max(tolerance * base['median_s'], noise, MIN_SLOWDOWN_S)
+        limit = base['median_s'] + margin
+        change = workload['median_s'] / base['median_s'] - 1 if base['median_s'] > 0 else 0.0
+        if workload['median_s'] > limit:
+            status = 'regression'
+        elif workload['median_s'] < base['median_s'] - margin:
+            status = 'faster'
+        else:
+            status = 'ok'
+        comparisons.append({**row, 'baseline_s': base['median_s'], 'baseline_mad_s': base['mad_s'],
+                            'limit_s': limit, 'change': change, 'status': status,
+                            'changed': base['applications'] != workload['applications']})
+    return comparisons
+
+
+def format_report(comparisons: List[Dict]) -> str:
+    """Table with a line per compared workload."""
+    lines = [f'{"workload":<24} {"baseline":>20} {"current":>20} {"change":>8} {"limit":>10}  status']
+    for row in comparisons:
+        current = f'{row["current_s"]:.4f}s ±{row["current_mad_s"]:.4f}'
+        if row['status'] == 'new':
+            lines.append(f'{row["workload"]:<24} {"-":>20} {current:>20} {"-":>8} {"-":>10}  new')
+            continue
+        baseline = f'{row["baseline_s"]:.4f}s ±{row["baseline_mad_s"]:.4f}'
+        status = row['status'] + (' (applications changed)' if row['changed'] else '')
+        lines.append(f'{row["workload"]:<24} {baseline:>20} {current:>20} {row["change"]:>+8.1%} '
+                     f'{row["limit_s"]:>9.4f}s  {status}')
+    return '\n'.join(lines)
+
+
+def main(args) -> int:
+    """Measure the workloads and compare them with the baseline, or update it.
+
+    Returns:
+        int: Exit status, 1 when a workload regressed or the baseline is missing.
+    """
+    def progress(workload):
+        print(f'{workload_name(workload):<24} median={workload["median_s"]:.4f}s mad={workload["mad_s"]:.4f}s',
+              file=sys.stderr)
+
+    steps = DEFAULT_STEPS if args.steps is None else args.steps
+    seed = DEFAULT_SEED if args.seed is None else args.seed
+    if not args.update_baseline and not os.path.isfile(args.baseline):
+        print(f'Baseline {args.baseline} not found, record it with --update-baseline', file=sys.stderr)
+        return 1
+    current = run_workloads(args.repeat, steps, seed, progress=progress)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w+', encoding='utf-8') as f:
+            f.write(json.dumps(current, indent=2) + '\n')
+        print(f'Baseline written to {args.baseline}')
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if (baseline['steps'], baseline['seed']) != (steps, seed):
+        print(f'Baseline measured with steps={baseline["steps"]} seed={baseline["seed"]}, '
+              f'got steps={steps} seed={seed}', file=sys.stderr)
+        return 1
+    comparisons = compare(baseline, current, tolerance=args.tolerance)
+    print(format_report(comparisons))
+    regressions = [row['workload'] for row in comparisons if row['status'] == 'regression']
+    if regressions:
+        print(f'\n{len(regressions)} workload(s) regressed: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='P-System performance regression gate.')
+    add_gate_arguments(arg_parser)
+    arg_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    arg_parser.add_argument('--steps', type=int, default=DEFAULT_STEPS)
+    arg_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    sys.exit(main(arg_parser.parse_args()))
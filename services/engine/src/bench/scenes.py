@@ -0,0 +1,130 @@
+import os
+import argparse
+
+from src.enums.constants import SceneObject
+
+"""
+Synthetic scene generation module for benchmarks.
+
+This module writes scenes of any population size for the rulesets used by the
+benchmark suite. Populations are written as replicated membranes (see
+`src.utils.replication`), so a scene with 100k membranes is a few lines long
+and the generation cost is not part of the measurements.
+
+It also holds the defaults and command line arguments of the suite and the
+gate, so the psys command line is built without importing them.
+"""
+
+# Scenario name -> rules file used with its scenes
+SCENARIOS = {
+    'epidemic': 'rules_00',
+    'toy': 'toy_rules_00',
+}
+
+# Cases of the suite
+DEFAULT_SIZES = (10, 1000, 100000)
+DEFAULT_MODES = ('minpar', 'maxpar')
+DEFAULT_STEPS = 10
+DEFAULT_SEED = 1
+
+# Workloads and thresholds of the gate
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+GATE_SIZES = (10, 1000)
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.10
+
+
+def add_suite_arguments(parser: argparse.ArgumentParser):
+    """Add the selection of cases and the output file of the suite to a parser."""
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument('--modes', nargs='+', choices=list(DEFAULT_MODES), default=list(DEFAULT_MODES))
+    parser.add_argument('--output', default=None, help='JSON file for the results (default: stdout)')
+
+
+def add_gate_arguments(parser: argparse.ArgumentParser):
+    """Add the baseline file and the thresholds of the gate to a parser."""
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON (default: src/bench/baseline.json)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed relative slowdown of the median (default: {DEFAULT_TOLERANCE})')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the measurements as the new baseline')
+
+
+def epidemic_scene(population: int, homes: int = 5, infected: float = 0.01, seed: int = 0) -> str:
+    """Scene for the rules_00 epidemic ruleset.
+
+    People (``h1`` membranes) are spread over ``homes`` homes and move to a
+    common zone and back. Each person starts infected with probability
+    ``infected``.
+
+    Args:
+        population (int): Number of ``h1`` membranes.
+        homes (int, optional): Number of homes, at most 5. Defaults to 5.
+        infected (float, optional): Probability of a person starting infected.
+        seed (int, optional): Seed of the initial infections. Defaults to 0.
+
+    Returns:
+        str: XML scene.
+    """
+    homes = max(1, min(homes, 5, population))
+    membranes = []
+    for i in range(homes):
+        count = population // homes + (1 if i < population % homes else 0)
+        membranes.append(
+            f'<{SceneObject.MEMBRANE} id="home{i + 1}" m="1" capacity="{10 * count + 10}">'
+            f'<{SceneObject.MEMBRANE} id="h1" m="1" capacity="1000" count="{count}" seed="{seed + i}">'
+            f'<{SceneObject.OBJECT} v="home{i + 1}" m="1"/>'
+            f'<{SceneObject.OBJECT} v="move" m="1"/>'
+            f'<{SceneObject.OBJECT} v="v1" m="1" pb="{infected}"/>'
+            f'</{SceneObject.MEMBRANE}></{SceneObject.MEMBRANE}>')
+    membranes.append(f'<{SceneObject.MEMBRANE} id="zone1" m="1" capacity="{10 * population + 10}"/>')
+    return ('<model><config>'
+            f'<{SceneObject.MEMBRANE} id="eco" m="1" capacity="1000000000">{"".join(membranes)}</{SceneObject.MEMBRANE}>'
+            '</config></model>')
+
+
+def toy_scene(population: int) -> str:
+    """Scene for the toy DISS_KEEP ruleset.
+
+    The skin membrane ``1`` holds ``population`` copies of the ``2 > 3``
+    structure of toy_scene_00, which dissolve during the first steps.
+
+    Args:
+        population (int): Number of ``2`` membranes.
+
+    Returns:
+        str: XML scene.
+    """
+    return ('<model><config>'
+            f'<{SceneObject.MEMBRANE} id="1" m="1" capacity="1000000000">'
+            f'<{SceneObject.MEMBRANE} id="2" m="1" capacity="100" count="{population}">'
+            f'<{SceneObject.MEMBRANE} id="3" m="1" capacity="100">'
+            f'<{SceneObject.OBJECT} v="a" m="1"/><{SceneObject.OBJECT} v="f" m="1"/>'
+            f'</{SceneObject.MEMBRANE}></{SceneObject.MEMBRANE}></{SceneObject.MEMBRANE}>'
+            '</config></model>')
+
+
+def write_scene(scenario: str, population: int, path: str) -> str:
+    """Write the scene of a scenario to a file.
+
+    Args:
+        scenario (str): Scenario name, a key of SCENARIOS.
+        population (int): Number of replicated membranes.
+        path (str): Destination file.
+
+    Returns:
+        str: The destination file.
+
+    Raises:
+        ValueError: If the scenario is unknown.
+    """
+    match scenario:
+        case 'epidemic':
+            scene = epidemic_scene(population)
+        case 'toy':
+            scene = toy_scene(population)
+        case _:
+            raise ValueError(f'Unknown benchmark scenario "{scenario}"')
+    with open(path, 'w+', encoding='utf-8') as f:
+        f.write(scene)
+    return path
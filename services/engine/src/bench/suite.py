@@ -0,0 +1,167 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import contextlib
+import tempfile
+import itertools
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Dict, Iterable, List
+
+from src.bench.scenes import (DEFAULT_MODES, DEFAULT_SEED, DEFAULT_SIZES, DEFAULT_STEPS, SCENARIOS,
+                              add_suite_arguments, write_scene)
+
+"""
+Scaling benchmark suite for the P-System engine.
+
+Every case runs a synthetic scene of a given population with one of the
+benchmark rulesets and inference modes for a fixed number of steps, and
+reports build time, steps per second, rule applications per second and peak
+RSS. Cases run in fresh processes, so the peak RSS of one case does not
+include the memory of the previous ones. Run outputs go to a temporary
+directory.
+
+Usage (from services/engine):
+    python -m src.bench.suite --output bench.json
+    python -m src.bench.suite --sizes 10 1000 --scenarios toy --steps 20
+"""
+
+def peak_rss_kb() -> int | None:
+    """Peak resident set size of this process in KiB, None where it cannot be measured."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_case(scenario: str, size: int, inference: str, steps: int, seed: int = DEFAULT_SEED) -> Dict:
+    """Run one benchmark case in the current process.
+
+    Args:
+        scenario (str): Scenario name, a key of SCENARIOS.
+        size (int): Number of replicated membranes of the scene.
+        inference (str): Inference mode.
+        steps (int): Maximum number of steps.
+        seed (int, optional): Seed of the simulation.
+
+    Returns:
+        Dict: Measurements of the case.
+    """
+    from src.classes.p_system import PSystem
+    from src.utils.xml_parser import XMLInputParser
+    from src.enums.constants import Replication
+
+    rules = SCENARIOS[scenario]
+    with tempfile.TemporaryDirectory(prefix='psys-bench-') as directory:
+        scene_path = write_scene(scenario, size, os.path.join(directory, 'scene.xml'))
+
+        start = time.perf_counter()
+        parser = XMLInputParser(SimpleNamespace(scene=None, rules=rules, inference=inference,
+                                                replication=Replication.EXPAND))
+        alphabet, rules_mapping, output = parser.load_rules()
+        root = parser.iterate_scene_file(scene_path)
+        system = PSystem(alpha=alphabet, membranes=root, rules=rules_mapping, out=output,
+                         inference=inference, runs_path=directory + os.sep)
+        build_seconds = time.perf_counter() - start
+
+        system.seed(seed)
+        # The engine reports the inference mode on stdout, where the results may go
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            system.run(steps)
+            run_seconds = time.perf_counter() - start
+
+    return {
+        'scenario': scenario,
+        'rules': rules,
+        'membranes': size,
+        'inference': inference,
+        'steps': system.step,
+        'build_s': round(build_seconds, 6),
+        'run_s': round(run_seconds, 6),
+        'steps_per_s': round(system.step / run_seconds, 3) if run_seconds > 0 else None,
+        'applications': system.applications,
+        'applications_per_s': round(system.applications / run_seconds, 3) if run_seconds > 0 else None,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def run_isolated(*case) -> Dict:
+    """Run a case in a new process and return its measurements."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_case, *case).result()
+
+
+def run_suite(scenarios: Iterable[str] = tuple(SCENARIOS),
+              sizes: Iterable[int] = DEFAULT_SIZES,
+              modes: Iterable[str] = DEFAULT_MODES,
+              steps: int = DEFAULT_STEPS,
+              seed: int = DEFAULT_SEED,
+              isolated: bool = True,
+              progress=None) -> Dict:
+    """Run every combination of scenario, size and inference mode.
+
+    Args:
+        scenarios (Iterable[str], optional): Scenario names. Defaults to all of them.
+        sizes (Iterable[int], optional): Populations. Defaults to DEFAULT_SIZES.
+        modes (Iterable[str], optional): Inference modes. Defaults to both.
+        steps (int, optional): Maximum number of steps of every case.
+        seed (int, optional): Seed of the simulations.
+        isolated (bool, optional): Run every case in a new process. Defaults to True.
+        progress (Callable[[Dict], None], optional): Called with the result of every case.
+
+    Returns:
+        Dict: Environment of the suite and the results of the cases.
+    """
+    from src.utils.model_cache import engine_version
+
+    cases: List[Dict] = []
+    for scenario, size, inference in itertools.product(scenarios, sizes, modes):
+        case = (scenario, size, inference, steps, seed)
+        result = run_isolated(*case) if isolated else run_case(*case)
+        cases.append(result)
+        if progress is not None:
+            progress(result)
+    return {
+        'engine_version': engine_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'steps': steps,
+        'seed': seed,
+        'cases': cases,
+    }
+
+
+def main(args):
+    """Run the suite selected by the parsed arguments and write its results."""
+    def progress(result):
+        print(f'{result["scenario"]:>8} {result["membranes"]:>7} {result["inference"]} '
+              f'steps/s={result["steps_per_s"]} apps/s={result["applications_per_s"]} '
+              f'rss={result["peak_rss_kb"]}KiB', file=sys.stderr)
+
+    steps = DEFAULT_STEPS if args.steps is None else args.steps
+    seed = DEFAULT_SEED if args.seed is None else args.seed
+    results = run_suite(args.scenarios, args.sizes, args.modes, steps, seed, progress=progress)
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w+', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='P-System scaling benchmark suite.')
+    add_suite_arguments(arg_parser)
+    arg_parser.add_argument('--steps', type=int, default=DEFAULT_STEPS)
+    arg_parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    main(arg_parser.parse_args())
@@ -1,9 +1,11 @@
+import os
 import numpy as np
 
-from typing import List, Union, Self
+from typing import Callable, List, Union, Self
 from src.classes.rule import Rule
 from src.classes.objects_multiset import ObjectsMultiset
 from src.enums.constants import MoveCode
+from src.utils.aux import PLOTS_PATH
 
 
 class Membrane:
@@ -26,6 +28,8 @@ class Membrane:
             None if it is the skin membrane.
         children (List[Membrane]): A list of child membranes contained within this one.
         objects (ObjectsMultiset): The multiset of objects present in the membrane's region.
+        handle (Optional[int]): Integer assigned by the system to identify this
+            membrane instance in traces. None until the system indexes it.
     """
 
     def __init__(self, idx: str, multiplicity : int, capacity: int, parent: 'Membrane' = None):
@@ -44,6 +48,7 @@ class Membrane:
         self._parent = parent
         self._children = []
         self._objects = ObjectsMultiset()
+        self._handle = None
 
         self._alive = True
         self._step = 0
@@ -67,6 +72,16 @@ class Membrane:
         """Gets the membrane's maximum object capacity."""
         return self._cap
     
+    @property
+    def handle(self) -> Union[int, None]:
+        """Gets the integer handle assigned by the system to this membrane."""
+        return self._handle
+
+    @handle.setter
+    def handle(self, value: int):
+        """Sets the integer handle of this membrane."""
+        self._handle = value
+
     @property
     def parent(self) -> Union[Self, None]:
         """Gets the parent of this membrane."""
@@ -121,6 +136,31 @@ class Membrane:
             raise TypeError(f'Expected ObjectsMultiset, got {type(new_value).__name__}')
         self._objects = new_value
     
+    def copy(self, multiplicity: Union[int, None] = None) -> Self:
+        """Creates a deep copy of this membrane and its descendants.
+
+        The copy has no parent and no handle.
+
+        Args:
+            multiplicity (Optional[int], optional): Multiplicity of the copy.
+                Defaults to the multiplicity of this membrane.
+
+        Returns:
+            Self: The root of the copied subtree.
+        """
+        m = self._m if multiplicity is None else multiplicity
+        root = Membrane(idx=self._id, multiplicity=m, capacity=self._cap)
+        root._objects = self._objects.copy()
+        pending = [(self, root)]
+        while pending:
+            original, copy = pending.pop()
+            for child in original._children:
+                child_copy = Membrane(idx=child._id, multiplicity=child._m, capacity=child._cap, parent=copy)
+                child_copy._objects = child._objects.copy()
+                copy._children.append(child_copy)
+                pending.append((child, child_copy))
+        return root
+
     def add_children(self, value: List[Self] | Self):
         """
         Function to add children to the Membrane
@@ -239,7 +279,7 @@ class Membrane:
         self.parent.children.remove(self)
         del self
 
-    def apply_dmem_rule(self, rule: Rule, multiplicity: int):
+    def apply_dmem_rule(self, rule: Rule, multiplicity: int, random: Callable[[], float] = np.random.random):
         """Applies a division/differentiation rule (DMEM).
 
         This rule type consumes reactants from the current membrane and can
@@ -249,6 +289,8 @@ class Membrane:
         Args:
             rule (Rule): The DMEM rule to apply.
             multiplicity (int): The number of times the rule is applied.
+            random (Callable[[], float], optional): Source of the uniform draws
+                of the rule probability. Defaults to the global NumPy state.
 
         Raises:
             ValueError: If the rule contains an unhandled move code.
@@ -270,63 +312,65 @@ class Membrane:
                         targets = [child for child in parent.children if child is not self and child.id == idx]
                         # aplicar la probabilidad de la regla por cada target posible
                         for target in targets:
-                            if np.random.random() < rule.probability:
+                            if random() < rule.probability:
                                 target.objects.add_object(obj=obj, multiplicity=m * multiplicity)
                 case _:
                     raise ValueError(f'Case not handled for move="{move}" in rule with DMEM movement')
 
-    def print_structure(self, level=0):
-        """Prints the membrane structure recursively to the console.
+    def structure_lines(self, level=0):
+        """Generates the lines describing the membrane structure recursively.
 
         Args:
             level (int, optional): The current depth in the hierarchy for indentation.
                 Defaults to 0.
+
+        Yields:
+            str: One line per membrane and per object.
         """
-        print(f'{"   " * level}{str(self)}')
+        yield f'{"   " * level}{str(self)}'
         for key, value in self.objects.items():
-            print(f'{"   " * level}  BO - (v={key}, mul={value})')
+            yield f'{"   " * level}  BO - (v={key}, mul={value})'
 
         for child in self.children:
-            child.print_structure(level + 1)
+            yield from child.structure_lines(level + 1)
 
-    def generate_html(self, level=0):
-        html_output = f'<div class="rectangulo level-{level}">\n'
-        html_output += f'  <div class="contenido">\n'
-        html_output += f'    <h2>{str(self)}</h2>\n'
-        html_output += f'<p>{str(self.objects)}'
-        html_output += f'  </div>\n'
+    def print_structure(self, level=0):
+        """Prints the membrane structure recursively to the console.
 
+        Args:
+            level (int, optional): The current depth in the hierarchy for indentation.
+                Defaults to 0.
+        """
+        for line in self.structure_lines(level):
+            print(line)
+
+    def generate_html(self, level=0):
+        parts = []
+        self.__html_parts(level, parts)
+        return ''.join(parts)
+
+    def __html_parts(self, level: int, parts: List[str]):
+        """Append the HTML of the structure to a list, joined once by `generate_html`."""
+        parts.append(f'<div class="rectangulo level-{level}">\n')
+        parts.append(f'  <div class="contenido">\n')
+        parts.append(f'    <h2>{str(self)}</h2>\n')
+        parts.append(f'<p>{str(self.objects)}')
+        parts.append(f'  </div>\n')
         for child in self.children:
-            html_output += child.generate_html(level + 1)
-        html_output += '</div>\n'
-        return html_output
-
-    def plot_structure(self, step: int):
-        css_styles = """
-        .rectangulo {
-            border: 2px solid black; /* Borde del rectángulo */
-            border-radius: 10px;     /* Esquinas redondeadas */
-            padding: 10px;           /* Espacio interior */
-            margin: 10px;            /* Espacio exterior */
-            background-color: #f9f9f9;
-        }
-        .contenido h2 { margin-top: 0; color: #005a9c; }
-        .contenido p { color: #c93756; font-family: monospace; }
+            child.__html_parts(level + 1, parts)
+        parts.append('</div>\n')
+
+    def plot_structure(self, step: int, plots_path: str = PLOTS_PATH):
+        """Write the structure below the membrane as an HTML page.
+
+        The page is the viewer of `structure_export`: identical sibling
+        membranes are collapsed and membranes are expanded on click.
+
+        Args:
+            step (int): Step of the structure, the name of the page.
+            plots_path (str, optional): Directory of the page. Defaults to
+                PLOTS_PATH; runs pass their own directory.
         """
-        body_content = self.generate_html()
-        html_final = f"""
-        <!DOCTYPE html>
-        <html lang="es">
-        <head>
-            <meta charset="UTF-8">
-            <title>PSystem Step {step}</title>
-            <style>{css_styles}</style>
-        </head>
-        <body>
-        {body_content}
-        </body>
-        </html>
-            """
-        path = f'../../plots/{step:04}.html'
-        with open(path, 'w+', encoding='utf-8') as f:
-            f.write(html_final)
+        from src.utils.structure_export import export_structure, write_viewer
+        write_viewer(os.path.join(plots_path, f'{step:04}.html'), [export_structure(self, step)],
+                     title=f'PSystem Step {step}')
@@ -2,6 +2,27 @@ from src.interfaces.multiset_interface import MultiSetInterface
 
 class ObjectsMultiset(MultiSetInterface):
 
+    @classmethod
+    def from_dict(cls, objects: dict):
+        """
+        Build a multiset in bulk from a mapping of objects to multiplicities.
+
+        Args:
+            objects (dict): Mapping of objects to non-negative integer multiplicities.
+                Objects with multiplicity 0 are skipped.
+
+        Returns:
+            ObjectsMultiset: new multiset with the given objects
+        """
+        for obj, multiplicity in objects.items():
+            if obj is None:
+                raise ValueError("ObjectsMultiset.from_dict -> object cannot be null")
+            if type(multiplicity) is not int or multiplicity < 0:
+                raise ValueError(f"ObjectsMultiset.from_dict -> multiplicity of '{obj}' must be a non-negative integer")
+        new_obj = cls()
+        new_obj.multiset = {obj: m for obj, m in objects.items() if m > 0}
+        return new_obj
+
     def copy(self):
         new_obj = ObjectsMultiset()
         new_obj.multiset = self.multiset.copy()
@@ -1,12 +1,28 @@
+import os
 import random
+import socket
 import numpy as np
 
-from typing import Dict, List, Tuple, Union
+from datetime import datetime
 
-from src.utils.aux import creation_time_str, create_log_file, RUNS_PATH, OUTPUT_FORMAT
+from typing import Callable, Dict, List, Tuple, Union
+
+from src.utils.aux import create_run_dir, write_json_atomic, RUNS_PATH, OUTPUT_FORMAT, MANIFEST_FILE
 from src.classes.rule import Rule
 from src.classes.membrane import Membrane
-from src.enums.constants import InferenceType, MoveCode, SceneObject
+from src.enums.constants import InferenceType, MoveCode, Replication, RuleStatsLevel, Selection, TraceLevel
+from src.utils.async_writer import AsyncWriter, note_error
+from src.utils.replay import ReplayRecorder
+from src.utils.trace import TraceRecorder, BINARY_FORMAT, LABELS_FORMAT
+from src.utils.timers import PhaseTimer, SELECTION, APPLICATION, OUTPUT, TRACE
+from src.utils.rule_stats import RuleStats, STEP_HEADER
+from src.utils.memory_profile import MemoryProfiler
+from src.utils.selection import LEGACY_RANDOM, applicable_rules, apply_random, select_maxpar, select_minpar, select_subtree
+from src.utils.selection_backends import BlockSelection, ProcessSelection, ThreadSelection
+from src.utils.sharding import ShardedRun
+from src.utils.sim_worker import RunControl
+from src.utils.results import wide_header, wide_row
+from src.utils.structure_export import export_structure, read_snapshots, snapshot_line, write_viewer
 
 """
 P-System implementation module for membrane computing.
@@ -29,10 +45,30 @@ class PSystem:
         rules (Dict[str, Rule]): Dictionary mapping membrane IDs to their rules.
         out (Union[Dict, None]): Output membrane identifier and output objects (optional).
         inference (str): Inference mode for rule application.
+        run_id (str): Directory of the run in the runs path, with its output,
+            trace, replay and manifest files.
         rules_to_apply (List): List of rules pending application.
+        applications (int): Number of rule applications, counting multiplicities.
+        trace (Union[TraceRecorder, None]): Recorder of rule applications, None when
+            the trace is off.
+        replay (Union[ReplayRecorder, None]): Recorder of per-step state deltas, None
+            when replay recording is off.
+        timings (Union[PhaseTimer, None]): Timer of the step phases, None when
+            timing is off.
+        rule_stats (Union[RuleStats, None]): Per-rule execution counters, None
+            when they are off.
+        memory_profile (Union[MemoryProfiler, None]): Sampler of the memory of the
+            system, None when memory profiling is off.
+        selection (Union[BlockSelection, None]): Backend of the selection phase,
+            None for the serial engine.
+        shards (int): Number of shards of a sharded run, 0 for a single-process run.
+        step_listener (Union[Callable, None]): Called with the output counts of
+            every logged step, None when there is no listener.
+        control (Union[RunControl, None]): Pause and cancel flags checked before
+            every step, None when the run cannot be paused.
     """
 
-    def __init__(self, alpha: Tuple, membranes: Membrane, rules: Dict[str, Rule], out: Union[Dict, None]=None, inference: str=InferenceType.MIN_PARALLEL):
+    def __init__(self, alpha: Tuple, membranes: Membrane, rules: Dict[str, Rule], out: Union[Dict, None]=None, inference: str=InferenceType.MIN_PARALLEL, runs_path: str=RUNS_PATH):
         """Initialize a P-System.
         
         Args:
@@ -42,6 +78,11 @@ class PSystem:
             out (Union[Dict, None]): Identifier of the output membrane and objects to be count.
                                      Defaults to None -> out = root membrane and output all objects.
             inference (str, optional): Inference mode to use. Defaults to MIN_PARALLEL.
+            runs_path (str, optional): Directory of the run outputs. Defaults to RUNS_PATH.
+
+        Raises:
+            ValueError: If a membrane has a multiplicity greater than 1, such as the
+                copies of a scene loaded with ``Replication.COMPRESS``.
         """
         self._alpha = alpha
         self._membranes = membranes
@@ -49,24 +90,439 @@ class PSystem:
         self._out = self.__configure_output(out)
         self._inference = inference
         self._rules_to_apply = []
-        self._creation_timestamp = creation_time_str()
+        # Pending rules of every block under the block selection backends
+        self._block_sizes = None
+        self._run_id = None
+        self._trace = None
+        self._replay = None
+        self._timer = None
+        self._stats = None
+        self._stats_steps = False
+        self._memory = None
+        self._structure = None
+        self._structure_step = None
+        self._selection = None
+        self._selection_mode = Selection.SERIAL
+        self._seed = None
+        self._shards = 0
+        self._shard_processes = True
+        self._listener = None
+        self._wide = False
+        self._control = None
+        self._writer = None
+        self._runs_path = runs_path
+        self._applications = 0
         self.step = 0
+
+        self._membrane_labels = self.__index_membranes()
         
-        create_log_file(self._creation_timestamp)
+        self._run_id = create_run_dir(runs_path)
+        self._created = datetime.now().isoformat(timespec='seconds')
+        with open(os.path.join(self._runs_path, self.output_file), 'x', encoding='utf-8') as f:
+            f.write('step,object,count\n')
+        self.write_manifest()
+
+
+    @property
+    def run_id(self) -> str:
+        """Gets the name of the run directory, unique among the runs of the runs path."""
+        return self._run_id
 
+    @property
+    def run_dir(self) -> str:
+        """Gets the path of the run directory."""
+        return os.path.join(self._runs_path, self._run_id, '')
+
+    def run_file(self, name: str) -> str:
+        """Path of a file of the run directory, relative to the runs path.
+
+        Args:
+            name (str): File name.
+
+        Returns:
+            str: ``<run_id>/<name>``.
+        """
+        return f'{self._run_id}/{name}'
 
     @property
     def output_file(self):
-        return f'{self._creation_timestamp}.csv'
+        return self.run_file(f'output{OUTPUT_FORMAT}')
+
+    @property
+    def manifest_file(self):
+        return self.run_file(MANIFEST_FILE)
+
+    @property
+    def trace_file(self):
+        return self.run_file('trace')
+
+    @property
+    def replay_file(self):
+        return self.run_file('replay.jsonl')
+
+    @property
+    def timings_file(self):
+        return self.run_file('timings.csv')
+
+    @property
+    def rule_stats_file(self):
+        return self.run_file('rule_stats.csv')
+
+    @property
+    def rule_steps_file(self):
+        return self.run_file('rule_steps.csv')
+
+    @property
+    def memory_file(self):
+        return self.run_file('memory.csv')
+
+    @property
+    def memory_sites_file(self):
+        return self.run_file('memory_sites.csv')
+
+    @property
+    def wide_output_file(self):
+        return self.run_file('wide.csv')
+
+    @property
+    def structure_file(self):
+        return self.run_file('structure.jsonl')
+
+    @property
+    def structure_viewer_file(self):
+        return self.run_file('structure.html')
+
+    @property
+    def applications(self) -> int:
+        """Gets the number of rule applications, counting multiplicities, since the system was created."""
+        return self._applications
+
+    @property
+    def trace(self) -> Union[TraceRecorder, None]:
+        return self._trace
+
+    @property
+    def replay(self) -> Union[ReplayRecorder, None]:
+        return self._replay
+
+    @property
+    def timings(self) -> Union[PhaseTimer, None]:
+        return self._timer
+
+    @property
+    def rule_stats(self) -> Union[RuleStats, None]:
+        return self._stats
+
+    @property
+    def memory_profile(self) -> Union[MemoryProfiler, None]:
+        return self._memory
+
+    @property
+    def selection(self) -> Union[BlockSelection, None]:
+        return self._selection
+
+    def set_selection(self, mode: str = Selection.SERIAL, workers: Union[int, None] = None):
+        """Select the backend of the selection phase of every step.
+
+        The serial engine selects every membrane in preorder drawing from the
+        global random state. The other backends split the membranes into the
+        skin and the subtree of each of its children, and select every block
+        with a random stream seeded with the seed of the system, the step and
+        the block. They also apply the rules as the shards of `set_shards` do:
+        the DMEM rules of a block draw their probabilities from a second stream
+        of the block, and the membranes moved by MEMwOB rules join their
+        destination at the end of the step. A seeded system gives the same
+        results with any of them, any number of workers and any number of
+        shards, though not the same as the serial engine.
+
+        The workers of a backend are started on its first step and kept between
+        runs, so stepping the system does not start them again on every call to
+        `run`. They are stopped when the mode changes or the system is closed.
+
+        Args:
+            mode (str): One of the Selection values.
+            workers (Union[int, None], optional): Number of workers of the parallel
+                backends. Defaults to the number of CPUs.
+
+        Raises:
+            ValueError: If the mode is not a Selection value.
+        """
+        if self._selection is not None:
+            self._selection.close()
+        match mode:
+            case Selection.SERIAL | None:
+                self._selection = None
+            case Selection.BLOCKS:
+                self._selection = BlockSelection(self._inference, self._rules, self._seed, workers)
+            case Selection.THREAD:
+                self._selection = ThreadSelection(self._inference, self._rules, self._seed, workers)
+            case Selection.PROCESS:
+                self._selection = ProcessSelection(self._inference, self._rules, self._seed, workers)
+            case _:
+                raise ValueError(f'Selection mode "{mode}" not valid')
+        self._selection_mode = mode or Selection.SERIAL
+
+    def close(self):
+        """Stop the workers and free the shared memory of the selection backend.
+
+        A closed system can still run, its backend starts the workers again on
+        the next step.
+        """
+        if self._selection is not None:
+            self._selection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def step_listener(self) -> Union[Callable[[int, List[Tuple[str, int]]], None], None]:
+        return self._listener
+
+    def set_step_listener(self, listener: Union[Callable[[int, List[Tuple[str, int]]], None], None] = None):
+        """Set the function called with the output of every logged step.
+
+        The listener receives the step and its ``(object, count)`` pairs, the same
+        rows written to the output CSV, as soon as the step is logged, so a
+        caller can keep the results in memory instead of reading the CSV back.
+
+        Args:
+            listener (Union[Callable[[int, List[Tuple[str, int]]], None], None]):
+                Function to call. None removes the listener.
+        """
+        self._listener = listener
+
+    @property
+    def output_objects(self) -> List[str]:
+        """Gets the output objects, in the order of the output rows."""
+        return list(self._out['objects'])
+
+    @property
+    def wide_output(self) -> bool:
+        return self._wide
+
+    def set_wide_output(self, enabled: bool = False):
+        """Enable or disable the wide output CSV of the run.
+
+        Besides the long output CSV, every logged step is written as one row of
+        a ``step,<object>,...`` table with a column per output object, which
+        `ResultsFrame.read_csv` loads into typed columns without pivoting.
+
+        Args:
+            enabled (bool): Whether to write the wide output.
+        """
+        if enabled and not self._wide:
+            with open(os.path.join(self._runs_path, self.wide_output_file), 'wb') as f:
+                f.write(wide_header(self._out['objects']))
+        self._wide = enabled
+
+    @property
+    def control(self) -> Union[RunControl, None]:
+        return self._control
+
+    def set_control(self, control: Union[RunControl, None] = None):
+        """Set the flags that pause, resume and cancel the runs of the system.
+
+        The step loop checks them before every step: while the run is paused it
+        waits between two steps, and once it is cancelled it stops as if
+        ``max_steps`` were reached, logging every step already run.
+
+        Args:
+            control (Union[RunControl, None]): Flags to check. None runs
+                without checks.
+        """
+        self._control = control
+
+    @property
+    def shards(self) -> int:
+        return self._shards
+
+    def set_shards(self, shards: Union[int, None] = None, processes: bool = True):
+        """Split the children of the skin membrane into shards that run in parallel.
+
+        Every shard selects and applies the rules of its skin children in its own
+        worker process, and the objects and membranes that cross a shard
+        boundary are exchanged at the end of every step (see `ShardedRun`). The
+        skin children use the random streams of the block selection backends,
+        so a seeded system gives the same results with any number of shards,
+        though not the same as the serial engine. Traces, replays, timings,
+        rule statistics and memory profiles are not recorded by sharded runs.
+
+        Args:
+            shards (Union[int, None]): Number of shards. None or 0 runs the
+                system in a single process.
+            processes (bool, optional): Run every shard in a worker process.
+                Defaults to True; False runs the shards one after the other in
+                this process, with the same results.
+
+        Raises:
+            ValueError: If the number of shards is negative.
+        """
+        if shards is not None and shards < 0:
+            raise ValueError(f'Number of shards must not be negative, got {shards}')
+        self._shards = shards or 0
+        self._shard_processes = processes
+
+    @property
+    def structure_interval(self) -> Union[int, None]:
+        return self._structure
+
+    def set_structure_snapshots(self, interval: Union[int, None] = None):
+        """Enable or disable the snapshots of the membrane structure.
+
+        Every ``interval`` steps, before the first one and after the last one,
+        the membrane structure is exported with identical siblings collapsed
+        (see `export_structure`) to the structure file of the run. When the run
+        ends, the snapshots are written to a viewer page in the run directory.
+        Sharded runs record no snapshots.
+
+        Args:
+            interval (Union[int, None]): Number of steps between two snapshots.
+                None or 0 disables them.
+        """
+        self._structure = interval or None
+
+    def set_memory_profile(self, interval: Union[int, None] = None):
+        """Enable or disable the memory profiling of the run.
+
+        Every ``interval`` steps, and before the first one, the bytes held by the
+        membranes, their object multisets and the rules are written to the memory
+        CSV of the run, together with the memory traced by `tracemalloc` and the
+        multisets allocated by the maximal parallelism selection since the
+        previous sample. The memory still allocated by every engine module is
+        written to the memory sites CSV.
+
+        Args:
+            interval (Union[int, None]): Number of steps between two samples.
+                None or 0 disables the profiling.
+        """
+        if not interval:
+            self._memory = None
+        elif self._memory is None or self._memory.interval != interval:
+            self._memory = MemoryProfiler(interval)
+            with open(os.path.join(self._runs_path, self.memory_file), 'wb') as f:
+                f.write(MemoryProfiler.header())
+            with open(os.path.join(self._runs_path, self.memory_sites_file), 'wb') as f:
+                f.write(MemoryProfiler.sites_header())
+
+    def set_timings(self, enabled: bool = False):
+        """Enable or disable the timing of the step phases.
+
+        When enabled, the duration of the selection, application, output and trace
+        phases of every step is written to the timings CSV of the run.
+
+        Args:
+            enabled (bool): Whether to time the phases. When disabled the step
+                loop only checks that the timer is off.
+        """
+        if not enabled:
+            self._timer = None
+        elif self._timer is None:
+            self._timer = PhaseTimer()
+            with open(os.path.join(self._runs_path, self.timings_file), 'wb') as f:
+                f.write(PhaseTimer.header())
+
+    def set_rule_stats(self, level: str = RuleStatsLevel.OFF):
+        """Select whether the per-rule execution counters are collected.
+
+        Every rule counts how many times it is checked, found applicable,
+        rejected by its probability draw and applied. The totals are printed and
+        written to the rule stats CSV of the run when it ends; with
+        ``RuleStatsLevel.STEPS`` the increments of every step are also written.
+        Counting does not draw random numbers, so a seeded run selects the same
+        rules with the counters on or off.
+
+        Args:
+            level (str): One of the RuleStatsLevel values.
+
+        Raises:
+            ValueError: If the level is not a RuleStatsLevel value.
+        """
+        match level:
+            case RuleStatsLevel.OFF | None:
+                self._stats = None
+                self._stats_steps = False
+            case RuleStatsLevel.SUMMARY | RuleStatsLevel.STEPS:
+                if self._stats is None:
+                    rule_table = [(mem_id, rule) for (mem_id, _), rules in self._rules.items() for rule in rules]
+                    self._stats = RuleStats(rule_table)
+                if level == RuleStatsLevel.STEPS and not self._stats_steps:
+                    with open(os.path.join(self._runs_path, self.rule_steps_file), 'wb') as f:
+                        f.write(STEP_HEADER.encode('utf-8'))
+                self._stats_steps = level == RuleStatsLevel.STEPS
+            case _:
+                raise ValueError(f'Rule stats level "{level}" not valid')
+
+    def set_replay(self, keyframe_interval: Union[int, None] = None):
+        """Enable or disable the recording of per-step state deltas.
+
+        The recorded file can be opened with `Replay` to rebuild the membrane
+        structure at any step without running the simulation again.
+
+        Args:
+            keyframe_interval (Union[int, None]): Number of steps between two full
+                keyframes. None or 0 disables the recording.
+        """
+        if not keyframe_interval:
+            self._replay = None
+        else:
+            self._replay = ReplayRecorder(keyframe_interval=keyframe_interval)
+
+    def set_trace_level(self, level: str = TraceLevel.OFF):
+        """Select how much of the rule applications is recorded.
+
+        Args:
+            level (str): One of the TraceLevel values. With ``TraceLevel.OFF`` the
+                step loop does no trace work at all.
+
+        Raises:
+            ValueError: If the level is not a TraceLevel value.
+        """
+        match level:
+            case TraceLevel.OFF | None:
+                self._trace = None
+            case TraceLevel.COUNTS | TraceLevel.FULL:
+                rule_table = [(mem_id, rule) for (mem_id, _), rules in self._rules.items() for rule in rules]
+                self._trace = TraceRecorder(level=level, rules=rule_table, membranes=self._membrane_labels)
+            case _:
+                raise ValueError(f'Trace level "{level}" not valid')
+
+    def __index_membranes(self) -> List[str]:
+        """Assign an integer handle to every membrane in preorder.
+
+        Returns:
+            List[str]: Membrane id of every handle.
+
+        Raises:
+            ValueError: If a membrane has a multiplicity greater than 1.
+        """
+        labels = []
+        pending = [self._membranes]
+        while pending:
+            membrane = pending.pop()
+            # Counting and selection treat every membrane as a single one
+            if membrane.multiplicity > 1:
+                raise ValueError(f'Membrane "{membrane.id}" has multiplicity {membrane.multiplicity}, but the engine '
+                                 f'simulates every membrane once. Load the scene with Replication={Replication.EXPAND}.')
+            membrane.handle = len(labels)
+            labels.append(membrane.id)
+            pending.extend(reversed(membrane.children))
+        return labels
 
     def seed(self, seed: Union[int, None]= None):
         if seed is not None:
             random.seed(seed)
             np.random.seed(seed=seed)
+            self._seed = seed
+            if self._selection is not None:
+                self._selection.seed = seed
 
     def __configure_output(self, output: Union[Dict, None]):
         if not output:
-            return {'out': self._membranes, 'obj': None}
+            return {'membrane': self._membranes, 'objects': list(self._alpha)}
         
         idx = output['id']
         objects = output['values']
@@ -86,13 +542,48 @@ class PSystem:
         return {'membrane': membrane, 'objects': objects}
     
     def __log_output(self, step: int):
-        path = f'{RUNS_PATH}{self._creation_timestamp}{OUTPUT_FORMAT}'
+        """Hand the output rows of a step to the writer.
+
+        Args:
+            step (int): Step whose output is logged.
+        """
+        path = os.path.join(self._runs_path, self.output_file)
         membrane = self._out['membrane']
-        objects = self._out['objects']
-        with open(path, 'a+', encoding='utf-8') as f:
-            for obj in objects:
-                count = self.__count_object(obj=obj, membrane=membrane)
-                f.write(f'{step},{obj},{count}\n')
+        counts = [(obj, self.__count_object(obj=obj, membrane=membrane)) for obj in self._out['objects']]
+        rows = ''.join(f'{step},{obj},{count}\n' for obj, count in counts)
+        self._writer.write(path, rows.encode('utf-8'))
+        if self._wide:
+            self._writer.write(os.path.join(self._runs_path, self.wide_output_file), wide_row(step, counts))
+        if self._listener is not None:
+            self._listener(step, counts)
+
+    def __log_replay(self):
+        """Hand the state delta of the current step to the writer."""
+        path = os.path.join(self._runs_path, self.replay_file)
+        self._writer.write(path, self._replay.record(self.step, self._membranes))
+
+    def __log_structure(self):
+        """Hand a snapshot of the membrane structure to the writer."""
+        self._writer.write(os.path.join(self._runs_path, self.structure_file),
+                           snapshot_line(export_structure(self._membranes, self.step)))
+        self._structure_step = self.step
+
+    def __log_memory(self):
+        """Hand a memory sample and the allocations of every module to the writer."""
+        self._writer.write(os.path.join(self._runs_path, self.memory_file),
+                           self._memory.sample(self.step, self._membranes, self._rules, self._rules_to_apply))
+        self._writer.write(os.path.join(self._runs_path, self.memory_sites_file), self._memory.sites(self.step))
+
+    def __log_trace(self, labels: bool = False):
+        """Hand the trace events recorded since the last call to the writer.
+
+        Args:
+            labels (bool): Whether to also rewrite the labels of the trace.
+        """
+        path = os.path.join(self._runs_path, self.trace_file)
+        self._writer.write(path + BINARY_FORMAT, self._trace.take())
+        if labels:
+            self._writer.replace(path + LABELS_FORMAT, self._trace.serialized_labels())
 
     def __count_object(self, obj: str, membrane: Membrane):
         count = membrane.objects.count(obj)
@@ -102,139 +593,6 @@ class PSystem:
         return count
 
 
-    def __add_rule_to_apply(self, membrane:Membrane, rule_data: Tuple, multiplicity : int = 1):
-        """Add a rule to the list of rules to be applied.
-        
-        Args:
-            membrane (Membrane): The membrane where the rule will be applied.
-            rule_data (Tuple): Data of the rule to be applied.
-            multiplicity (int): How many times the rules will be applied.
-        """
-        self._rules_to_apply.append((membrane, rule_data, multiplicity))
-
-    def __generate_maximal_group(self, membrane: Membrane, rules: List[Rule]):
-        """Generates a single, non-deterministically chosen, maximal multiset of rules.
-
-        This function implements an efficient, iterative ("greedy") algorithm to
-        determine one valid multiset of rules to be applied in a single computation
-        step, following the "maximally parallel" derivation mode. Instead of
-        calculating all possible maximal sets (which is computationally expensive),
-        it randomly selects rules one by one until no more rules can be applied to
-        the remaining objects.
-
-        The process is non-deterministic due to the random selection of rules at
-        each iteration and the probabilistic application of each rule. The final
-        multiset of rules is guaranteed to be "maximal" because the loop only
-        terminates when the set cannot be extended further.
-
-        The function categorizes the selected rules into three groups: those that
-        affect objects ('obj'), those that affect the membrane itself ('mem',
-        such as dissolution rules), and those that handle the movement of child
-        membranes ('move').
-
-        Pseudo-código del algoritmo:
-        1.  Inicializar un 'grupo' de reglas vacío con tres categorías: 'obj',
-            'mem' y 'move'.
-        2.  Crear una copia de los objetos de la membrana para poder modificarlos.
-        3.  Iniciar un bucle que se ejecuta mientras la lista de reglas a
-            considerar no esté vacía.
-        4.  Dentro del bucle:
-            a.  Elegir una regla al azar de la lista de reglas disponibles.
-            b.  Verificar el tipo de regla:
-                i.  Si es una regla de movimiento de membrana ('move'):
-                    - Añadirla al grupo 'move'.
-                    - Eliminarla de la lista para que no se considere más en
-                      este paso.
-                    - Continuar con la siguiente iteración del bucle.
-                ii. Si es una regla de evolución de objetos o disolución:
-                    - Comprobar si es aplicable con los objetos restantes.
-                    - Si NO es aplicable:
-                        - Eliminar la regla de la lista y continuar.
-                    - Si ES aplicable:
-                        1. Evaluar la probabilidad de la regla. Si la
-                           comprobación probabilística falla, no se aplica la
-                           regla, pero el bucle continúa para dar oportunidad
-                           a otras reglas.
-                        2. Si la regla se aplica, añadirla al 'grupo'
-                           correspondiente ('obj' o 'mem'), incrementando su
-                           contador.
-                        3. Restar los objetos consumidos por la regla de la
-                           copia de objetos.
-        5.  El bucle termina cuando la lista de reglas a considerar se vacía, lo
-            que implica que no se pueden aplicar más reglas a los objetos
-            restantes.
-        6.  Devolver el 'grupo' de reglas final.
-    
-        Args:
-            membrane (Membrane): El objeto de la membrana que contiene el
-                multiconjunto actual de objetos sobre los que operar.
-            rules (List): Una lista de todas las reglas potencialmente
-                aplicables en esta membrana. Esta lista se modifica durante la
-                ejecución de la función (las reglas no aplicables se eliminan).
-    
-        Returns:
-            Dict: Un diccionario que contiene el multiconjunto de reglas
-                seleccionado, categorizado por su tipo de efecto. La estructura es:
-                {
-                    'obj': {rule_idx: {'count': N, 'data': rule_data},...},
-                    'mem': {rule_idx: {'count': M, 'data': rule_data},...},
-                    'move': {child_idx: {'count': 1, 'data': rule_data},...}
-                }
-        """
-
-        group = { 'obj': dict(), 'mem': dict(), 'move': dict() }
-        if len(rules) > 0:
-            original_objects = membrane.objects.copy()
-
-            def select_rule():
-                nonlocal original_objects
-                if len(rules) == 0:
-                    return False
-                
-                index = random.choice(range(len(rules)))
-                rule_data = rules[index]
-                rule = rule_data[-1]
-
-                # Condición para movimiento de objetos y disolución de membranas
-                if rule.move not in (MoveCode.MEMwOB.name,):
-                    # Determine if the rule remains applicable
-                    count = original_objects.count_subsets(rule.left)
-
-                    if count > 0:
-                        prob = rule.probability
-                        if prob != 1.0:
-                            probs = np.array([prob, 1-prob])
-                            indexes = [1, -1]
-                            rule_idx = np.random.choice(indexes, p=probs)
-                            if rule_idx == -1:
-                                return True
-                        branch = 'obj' if rule.move not in (MoveCode.DISS_KEEP.name, MoveCode.DISS.name) else 'mem'
-                        is_applied = group[branch].get(rule.idx, False)
-                        if is_applied:
-                            group[branch][rule.idx]['count'] = group[branch][rule.idx]['count'] + 1
-                        else:
-                            group[branch][rule.idx] = dict()
-                            group[branch][rule.idx]['count'] = 1
-                            group[branch][rule.idx]['data'] = rule_data
-                        original_objects = original_objects - rule.left                      
-                    else:
-                        # Remove the rule if not applicable
-                        del rules[index]
-                    return True
-                # Condición para movimiento de membranas
-                else:
-                    child_idx = rule_data[2]
-                    group['move'][child_idx] = dict()
-                    group['move'][child_idx]['count'] = 1
-                    group['move'][child_idx]['data'] = rule_data
-                    del rules[index]
-                    return True
-            
-            while select_rule():
-                # Avoiding recursion to prevent stack overflow due to excessive calls
-                pass
-        return group
-    
     def print_membranes(self):
         """Print the membrane structure of the system.
         
@@ -266,36 +624,13 @@ class PSystem:
             membrane (Membrane): The membrane to check for applicable rules.
             
         Returns:
-            Tuple[List, List]: A tuple containing:
-                - List of applicable object rules
-                - List of applicable membrane rules (in reversed order)
+            List[Tuple]: Applicable object rules followed by the applicable
+                membrane rules (in reversed order).
         """
-        membrane_obj_rules = self._rules.get((membrane.id, SceneObject.OBJECT_RULE), [])
-        membrane_mem_rules = self._rules.get((membrane.id, SceneObject.MEMBRANE_RULE), [])
-
-        app_obj_rules = []              # Rules with defined priorities
-        app_mem_rules = []              # Rules that move an entire membrane
-        app_rules_idxs = []             # List of IDs of the applicable rules
-
-        for rule in membrane_obj_rules:
-            left = rule.left
-            if all(membrane.objects.count(obj) >= m for obj, m in left.items()):
-                if rule.priority is not None:
-                    if not (set(app_rules_idxs) & set(rule.priority)):
-                        app_obj_rules.append((membrane.id, 0, 0, rule))
-                        app_rules_idxs.append(rule.idx)
-                else:
-                    app_obj_rules.append((membrane.id, 0, 0, rule))
-                    app_rules_idxs.append(rule.idx)
-
-        for i, child in enumerate(membrane.children):
-            for rule in membrane_mem_rules:
-                mem_idx = rule.mem_idx
-                if child.id == mem_idx and all(child.objects.count(obj) >= m for obj, m in rule.left.items()):
-                    app_mem_rules.append((membrane.id, child.id, i, rule))
-        return app_obj_rules + list(reversed(app_mem_rules))
+        return applicable_rules(membrane, self._rules, self._stats)
     
-    def apply_rule(self, membrane: Membrane, data, multiplicity: int = 1):
+    def apply_rule(self, membrane: Membrane, data, multiplicity: int = 1,
+                   random: Callable[[], float] = np.random.random):
         """Apply a specific rule to a membrane.
         
         Executes a rule based on its movement code, handling different types
@@ -305,132 +640,164 @@ class PSystem:
             membrane (Membrane): The membrane where the rule is applied.
             data: Tuple containing (mem_id, child_id, child_index, rule).
             multiplicity (int): How many times the rules will be applied.
-        Returns:
-            str: Trace message describing the rule application.
+            random (Callable[[], float], optional): Source of the uniform draws
+                of DMEM rules. Defaults to the global NumPy state.
         """
         mem_id, child_id, child_index, rule = data
         move = rule.move
         match move:
             case MoveCode.OUT.name:
-                trace = f' - Applying OUT {membrane.id:>8} -> {multiplicity} x {rule}'
                 membrane.apply_out_rule(rule=rule, multiplicity=multiplicity)
             case MoveCode.HERE.name:
-                trace = f' - Applying HERE {membrane.id:>7} -> {multiplicity} x {rule}'
                 membrane.apply_here_rule(rule=rule, multiplicity=multiplicity)
             case MoveCode.IN.name:
                 dest_idx = rule.destination
                 # For simplicity in this state of the development. In the given scenario IN rules are applied from parent to children
                 dest = next((child for child in membrane.children if child.id == dest_idx))
-                trace = f' - Applying IN {membrane.id:>9} -> {multiplicity} x {rule}'
                 membrane.apply_in_rule(rule=rule, destination=dest, multiplicity=multiplicity)
             case MoveCode.MEMwOB.name:
                 dest_idx = rule.destination
                 dest = next((child for child in self._membranes.children if child.id == dest_idx))
-                trace = f' - Applying MEMwOB {membrane.id:>5} -> {rule}, Child Nº {child_index} from {mem_id} to {dest.id}'
                 membrane.apply_move_mem_rule(rule=rule, destination=dest, child_idx=child_index)
             case MoveCode.DISS_KEEP.name:
-                trace = f' - Applying DISS_KEEP {membrane.id:>2} -> {rule}'
                 membrane.apply_dissolve_to_parent_rule(rule=rule)
             case MoveCode.DMEM.name:
-                trace = f' - Applying DMEM {membrane.id:>7} -> {rule}'
-                membrane.apply_dmem_rule(rule=rule, multiplicity=multiplicity)
-            case _:
-                trace = f' - NOT Applied {membrane.id:>5} -> {multiplicity} x {rule}'
-        return trace
+                membrane.apply_dmem_rule(rule=rule, multiplicity=multiplicity, random=random)
 
-    def apply_rules(self, trace_file = None):
+    def apply_rules(self):
         """Apply all pending rules in the system.
         
         Executes all rules that have been scheduled for application and
-        clears the pending rules list.
-        
-        Args:
-            trace_file (file, optional): File object to write trace information.
-                Defaults to None.
+        clears the pending rules list. When a trace is enabled, every
+        application is handed to the recorder as a binary event.
                 
         Returns:
             bool: True if at least one rule was applied, False otherwise.
         """
         n_rules = len(self._rules_to_apply)
-        for membrane, data, multiplicity in self._rules_to_apply:
-            trace = self.apply_rule(membrane=membrane, data=data, multiplicity=multiplicity)
-            print(trace, file=trace_file)
+        applications = 0
+        if self._block_sizes is not None:
+            applications = self.__apply_blocks()
+        elif self._trace is None:
+            for membrane, data, multiplicity in self._rules_to_apply:
+                self.apply_rule(membrane=membrane, data=data, multiplicity=multiplicity)
+                applications += multiplicity
+        else:
+            record = self._trace.record
+            for membrane, data, multiplicity in self._rules_to_apply:
+                # The handle is read before applying, dissolution removes the membrane
+                record(self.step, membrane.handle, data[-1], multiplicity)
+                self.apply_rule(membrane=membrane, data=data, multiplicity=multiplicity)
+                applications += multiplicity
+            self._trace.end_step(self.step)
+        if self._stats is not None:
+            self._stats.count_applications(self._rules_to_apply)
+        self._applications += applications
         self._rules_to_apply.clear()
         return n_rules > 0
 
-    def min_par_step(self, membrane: Membrane, trace_file=None):
+    def __apply_blocks(self) -> int:
+        """Apply the pending rules of every block as the shards of `set_shards` do.
+
+        The DMEM probabilities of a block are drawn from its apply stream, and the
+        membranes moved by MEMwOB rules join their destination once every block
+        is applied, so the DMEM rules of a step do not reach the membranes that
+        arrive during it.
+        """
+        record = None if self._trace is None else self._trace.record
+        seed = self._selection.seed
+        moved = []
+        applications = 0
+        start = 0
+        for block, size in enumerate(self._block_sizes):
+            if size == 0:
+                continue
+            draws = apply_random(seed, self.step, block)
+            for membrane, data, multiplicity in self._rules_to_apply[start:start + size]:
+                rule = data[-1]
+                if record is not None:
+                    record(self.step, membrane.handle, rule, multiplicity)
+                if rule.move == MoveCode.MEMwOB.name:
+                    dest = next((child for child in self._membranes.children if child.id == rule.destination))
+                    child = membrane.remove_child(data[2])
+                    child.apply_here_rule(rule, multiplicity=1)
+                    moved.append((dest, child))
+                else:
+                    self.apply_rule(membrane=membrane, data=data, multiplicity=multiplicity, random=draws.random)
+                applications += multiplicity
+            start += size
+        for dest, child in moved:
+            dest.add_child(child)
+            child.parent = dest
+        if record is not None:
+            self._trace.end_step(self.step)
+        self._block_sizes = None
+        return applications
+
+    def min_par_step(self, membrane: Membrane):
         """Execute one step of minimally parallel inference.
         
         Finds applicable rules for a membrane and probabilistically selects
-        one for application. Recursively processes all child membranes.
+        one for application. Processes all descendant membranes in preorder.
         
         Args:
             membrane (Membrane): The membrane to process.
-            trace_file (file, optional): File object to write trace information.
-                Defaults to None.
         """
-        rules = self.applicable_rules(membrane)
-
-        if len(rules) > 0:
-            probs = np.array([rule.probability for _,_,_,rule in rules])
-            total_prob = probs.sum()
-            indexes = list(range(len(rules)))
-
-            if total_prob > 1.0:
-                # Normalize if prob is greater than 1.0
-                probs /= total_prob
-            elif total_prob < 1.0:
-                probs = np.append(probs, 1 - total_prob)
-                indexes += [-1]
-            rule_idx = np.random.choice(indexes, p=probs)
-            if rule_idx != -1:
-                to_apply = rules[rule_idx]
-                self.__add_rule_to_apply(membrane, to_apply)
-
-        for child in membrane.children:
-            self.min_par_step(child, trace_file=trace_file)
+        select_subtree(select_minpar, membrane, self._rules, LEGACY_RANDOM, self._rules_to_apply,
+                       self._stats, self._memory)
 
-    def max_par_step(self, membrane: Membrane, trace_file=None):
+    def max_par_step(self, membrane: Membrane):
         """Execute one step of maximally parallel inference.
         
         Finds applicable rules for a membrane, computes a random
-        non-extendable set of rules, and applies it. Recursively
-        processes all child membranes.
+        non-extendable set of rules, and applies it. Processes all
+        descendant membranes in preorder.
         
         Args:
             membrane (Membrane): The membrane to process.
-            trace_file (file, optional): File object to write trace information.
-                Defaults to None.
         """
-        rules = self.applicable_rules(membrane)
-        group = self.__generate_maximal_group(membrane=membrane, rules=rules)
-
-        for type in ['obj', 'mem']:
-            for _, item in group[type].items():
-                rule_data = item['data']
-                count = item['count']
-                self.__add_rule_to_apply(membrane=membrane, rule_data=rule_data, multiplicity=count)
-
-        child_indices = list(group['move'].keys())
-        child_indices.sort(reverse=True)
-        
-        for i in child_indices:
-            child_rule = group['move'][i]
-            rule_data = child_rule['data']
-            count = child_rule['count']
-            rule = rule_data[-1]
-            prob = rule.probability
-            if np.random.random() < prob:
-                self.__add_rule_to_apply(membrane=membrane, rule_data=rule_data, multiplicity=count)
-
-        for child in membrane.children:
-            self.max_par_step(child, trace_file=trace_file)
+        select_subtree(select_maxpar, membrane, self._rules, LEGACY_RANDOM, self._rules_to_apply,
+                       self._stats, self._memory)
+
+    def manifest(self) -> Dict:
+        """Description of the run: where and when it was created, its settings,
+        the steps run so far and the files of its directory."""
+        return {
+            'run': self._run_id,
+            'created': self._created,
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'inference': self._inference,
+            'seed': self._seed,
+            'steps': self.step,
+            'applications': self._applications,
+            'output': {'membrane': self._out['membrane'].id, 'objects': self.output_objects},
+            'settings': {
+                'selection': self._selection_mode,
+                'shards': self._shards,
+                'trace': self._trace.level if self._trace is not None else TraceLevel.OFF,
+                'keyframes': self._replay.keyframe_interval if self._replay is not None else None,
+                'timings': self._timer is not None,
+                'wide_output': self._wide,
+                'rule_stats': (RuleStatsLevel.OFF if self._stats is None else
+                               RuleStatsLevel.STEPS if self._stats_steps else RuleStatsLevel.SUMMARY),
+                'memory': self._memory.interval if self._memory is not None else None,
+                'structure': self._structure,
+            },
+            'files': sorted(name for name in os.listdir(self.run_dir) if name != MANIFEST_FILE and
+                            not name.endswith('.tmp')),
+        }
+
+    def write_manifest(self):
+        """Write the manifest of the run to its directory, replacing the previous one."""
+        write_json_atomic(os.path.join(self._runs_path, self.manifest_file), self.manifest())
 
     def run(self, max_steps=None):
         """Run the P-System simulation.
         
         Executes the P-System according to the specified inference mode
         for a maximum number of steps or until no more rules can be applied.
+        The manifest of the run is updated when it ends.
         
         Args:
             max_steps (int, optional): Maximum number of steps to execute.
@@ -439,13 +806,51 @@ class PSystem:
         Raises:
             NotImplementedError: If the specified inference type is not implemented.
         """
-        match self._inference:
-            case InferenceType.MIN_PARALLEL:
-                self.__minpar(max_steps=max_steps)
-            case InferenceType.MAX_PARALLEL:
-                self.__maxpar(max_steps=max_steps)
-            case _:
-                raise NotImplementedError(f'Inference type "{self._inference}" not Implemented')
+        try:
+            if self._shards:
+                self.__run_sharded(max_steps=max_steps)
+                return
+            match self._inference:
+                case InferenceType.MIN_PARALLEL:
+                    self.__minpar(max_steps=max_steps)
+                case InferenceType.MAX_PARALLEL:
+                    self.__maxpar(max_steps=max_steps)
+                case _:
+                    raise NotImplementedError(f'Inference type "{self._inference}" not Implemented')
+            if self._stats is not None:
+                self.print_rule_stats()
+        finally:
+            self.write_manifest()
+
+    def print_rule_stats(self):
+        """Print the per-rule execution counters, rules sorted by times checked."""
+        if self._stats is None:
+            return
+        print('\n======================== RULE STATS ========================')
+        for line in self._stats.summary_lines():
+            print(line)
+
+    def __run_sharded(self, max_steps=None):
+        """Run the system split into `shards` worker processes.
+
+        Args:
+            max_steps (int, optional): Maximum number of steps to execute.
+                If None, runs until no more rules are applicable.
+        """
+        print(f'Running {self._inference} in {self._shards} shards')
+        seed = int(np.random.SeedSequence().entropy) if self._seed is None else self._seed
+        sharded = ShardedRun(self._membranes, self._rules, self._inference, seed, self._out,
+                             shards=self._shards, processes=self._shard_processes)
+        sharded.step = self.step
+        try:
+            sharded.run(os.path.join(self._runs_path, self.output_file), max_steps=max_steps,
+                        listener=self._listener, control=self._control,
+                        wide_path=os.path.join(self._runs_path, self.wide_output_file) if self._wide else None)
+        finally:
+            sharded.close()
+            self._applications += sharded.applications
+            self.step = sharded.step
+            self._membrane_labels = self.__index_membranes()
 
     def __minpar(self, max_steps=None):
         """Execute minimally parallel inference mode.
@@ -458,25 +863,7 @@ class PSystem:
                 If None, runs until no more rules are applicable.
         """
         print("Running Min. Parallel")
-        try:
-            out = open('../../plots/run_trace.txt', 'w+', encoding='utf-8')
-            has_applied = True
-            if max_steps is not None:
-                max_steps = max_steps + self.step
-
-            if self.step == 0:
-                self.__log_output(self.step)
-            # self._membranes.plot_structure(self.step)
-            while has_applied and (max_steps is None or self.step < max_steps):
-                self.step += 1
-                print(f'{"="*15} STEP {self.step} {"="*15}', file=out)
-                self.min_par_step(self._membranes, out)
-                has_applied = self.apply_rules(out)
-                # self._membranes.plot_structure(self.step)
-                if has_applied:
-                    self.__log_output(self.step)
-        finally:
-            out.close()
+        self.__execute(step_fn=self.min_par_step, max_steps=max_steps)
 
     def __maxpar(self, max_steps=None):
         """Execute maximally parallel inference mode.
@@ -489,23 +876,115 @@ class PSystem:
                 If None, runs until no more rules are applicable.
         """
         print("Running Max. Parallel")
+        self.__execute(step_fn=self.max_par_step, max_steps=max_steps)
+
+    def __close_writer(self, error: Union[BaseException, None] = None):
+        """Hand the last outputs of a run to the writer and close it.
+
+        Args:
+            error (Union[BaseException, None], optional): Error the step loop
+                ended with. A writer error is added to it as a note instead of
+                being raised.
+        """
+        try:
+            try:
+                if self._structure is not None and self._structure_step != self.step:
+                    self.__log_structure()
+                if self._trace is not None:
+                    self.__log_trace(labels=True)
+                if self._stats is not None:
+                    self._writer.replace(os.path.join(self._runs_path, self.rule_stats_file), self._stats.summary_csv())
+            finally:
+                self._writer.close(error)
+            if self._structure is not None:
+                write_viewer(os.path.join(self._runs_path, self.structure_viewer_file),
+                             read_snapshots(os.path.join(self._runs_path, self.structure_file)), title=self._run_id)
+        except Exception as e:
+            if error is None:
+                raise
+            note_error(error, e)
+
+    def __execute(self, step_fn, max_steps=None):
+        """Step loop shared by the inference modes.
+
+        Each step selects the rules to apply walking the membrane structure with
+        `step_fn`, applies them and logs the output. Outputs, trace events and
+        structure snapshots are serialized in the loop but written by an
+        `AsyncWriter` thread, which is flushed when the loop ends, even if it
+        ends with an exception or a `KeyboardInterrupt`. An error of the writer
+        never replaces the error the loop ended with.
+
+        Args:
+            step_fn (Callable[[Membrane], None]): Selection function of the
+                inference mode, called with the root membrane.
+            max_steps (int, optional): Maximum number of steps to execute.
+                If None, runs until no more rules are applicable.
+        """
+        self._writer = AsyncWriter()
+        memory = self._memory
+        selection = self._selection
+        if memory is not None:
+            memory.start()
+        error = None
         try:
-            out = open('../../plots/run_trace.txt', 'w+', encoding='utf-8')
             has_applied = True
             if max_steps is not None:
                 max_steps = max_steps + self.step
+
             if self.step == 0:
                 self.__log_output(self.step)
-            # self._membranes.plot_structure(self.step)
+            if self._replay is not None and self._replay.last_step != self.step:
+                self.__log_replay()
+            if memory is not None:
+                self.__log_memory()
+            structure = self._structure
+            if structure is not None and self._structure_step != self.step:
+                self.__log_structure()
+            timer = self._timer
+            control = self._control
             while has_applied and (max_steps is None or self.step < max_steps):
+                if control is not None and not control.proceed():
+                    break
                 self.step += 1
-                print(f'{"="*15} STEP {self.step} {"="*15}', file=out)
-                self.max_par_step(self._membranes, out)
-                has_applied = self.apply_rules(out)
-                # print(f'{"="*15} STEP {self.step} {"="*15}')
-                # self.print_membranes()
+                if timer is not None:
+                    t = timer.now()
+                if selection is None:
+                    step_fn(self._membranes)
+                else:
+                    blocks = selection.select(self._membranes, self.step, self._stats, memory)
+                    for pending in blocks:
+                        self._rules_to_apply.extend(pending)
+                    self._block_sizes = [len(pending) for pending in blocks]
+                if timer is not None:
+                    t = timer.lap(SELECTION, t)
+                has_applied = self.apply_rules()
+                if timer is not None:
+                    t = timer.lap(APPLICATION, t)
                 if has_applied:
                     self.__log_output(self.step)
-                # self._membranes.plot_structure(self.step)
+                    if self._replay is not None:
+                        self.__log_replay()
+                    if structure is not None and self.step % structure == 0:
+                        self.__log_structure()
+                if timer is not None:
+                    t = timer.lap(OUTPUT, t)
+                if self._trace is not None:
+                    self.__log_trace()
+                if self._stats_steps:
+                    self._writer.write(os.path.join(self._runs_path, self.rule_steps_file),
+                                       self._stats.step_rows(self.step))
+                if timer is not None:
+                    timer.lap(TRACE, t)
+                    self._writer.write(os.path.join(self._runs_path, self.timings_file), timer.end_step(self.step))
+                if memory is not None and self.step % memory.interval == 0:
+                    self.__log_memory()
+        except BaseException as e:
+            error = e
+            raise
         finally:
-            out.close()
+            try:
+                self.__close_writer(error)
+            finally:
+                self._writer = None
+                if memory is not None:
+                    memory.stop()
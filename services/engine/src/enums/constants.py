@@ -77,4 +77,71 @@ class InferenceType():
         SEQUENTIAL (str): Sequential inference mode.
     """
     MIN_PARALLEL = 'minpar'
-    MAX_PARALLEL = 'maxpar'
\ No newline at end of file
+    MAX_PARALLEL = 'maxpar'
+
+
+class TraceLevel():
+    """Constants for the rule application trace levels.
+
+    Attributes:
+        OFF (str): No trace is recorded.
+        COUNTS (str): Number of applications of every rule on each step.
+        FULL (str): Every rule application with its membrane and multiplicity.
+    """
+    OFF = 'off'
+    COUNTS = 'counts'
+    FULL = 'full'
+
+
+class Replication():
+    """Constants for the expansion of replicated membranes in scenes.
+
+    Attributes:
+        EXPAND (str): Every copy is built as a separate membrane.
+        COMPRESS (str): Identical copies are kept as a single membrane whose
+            multiplicity is the number of copies. `PSystem` rejects these
+            membranes: it is meant for exports and population-aware engines.
+    """
+    EXPAND = 'expand'
+    COMPRESS = 'compress'
+
+
+class RuleStatsLevel():
+    """Constants for the per-rule execution statistics.
+
+    Attributes:
+        OFF (str): No statistics are collected.
+        SUMMARY (str): Totals of every rule, printed and written at the end of the run.
+        STEPS (str): Totals plus the counters of every step.
+    """
+    OFF = 'off'
+    SUMMARY = 'summary'
+    STEPS = 'steps'
+
+
+class Selection():
+    """Constants for the selection backends.
+
+    Attributes:
+        SERIAL (str): Every membrane is selected in preorder from the global
+            random state, the classic engine.
+        BLOCKS (str): The subtree of every child of the skin is selected with its
+            own random stream, one after the other.
+        THREAD (str): The blocks are selected by a pool of threads.
+        PROCESS (str): The blocks are selected by a pool of processes.
+    """
+    SERIAL = 'serial'
+    BLOCKS = 'blocks'
+    THREAD = 'thread'
+    PROCESS = 'process'
+
+
+class Downsampling():
+    """Constants for the downsampling methods of result trajectories.
+
+    Attributes:
+        LTTB (str): Largest-Triangle-Three-Buckets, one point per bucket.
+        MINMAX (str): Minimum and maximum of every bucket.
+    """
+    LTTB = 'lttb'
+    MINMAX = 'minmax'
@@ -0,0 +1,177 @@
+import json
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from typing import Dict, Iterator, List, Tuple, Union
+
+"""
+Client module of the simulation service.
+
+The simulation service (``services/api``) runs jobs on a bounded pool of
+worker processes. This module is its HTTP client, used by the front and by
+the ``psys submit`` batch command, and only needs the standard library:
+
+    client = ApiClient('http://127.0.0.1:8765')
+    job = client.submit('scene_00', 'rules_00', {'Runtime.MaxSteps': 100, 'Runtime.Seed': 7})
+    for event, data in client.stream(job['id']):
+        print(event, data)
+    results = client.result(job['id'])
+"""
+
+DEFAULT_API_URL = 'http://127.0.0.1:8765'
+# Job states of the service
+QUEUED = 'queued'
+RUNNING = 'running'
+PAUSED = 'paused'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+FINISHED = (DONE, CANCELLED, FAILED)
+
+
+class ApiError(RuntimeError):
+    """Error answered by the simulation service.
+
+    Attributes:
+        status (int): HTTP status of the answer.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+
+
+class ApiClient:
+    """HTTP client of the simulation service.
+
+    Attributes:
+        url (str): Base URL of the service.
+        timeout (float): Seconds to wait for every request.
+    """
+
+    def __init__(self, url: str = DEFAULT_API_URL, timeout: float = 30.0):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, payload: Union[Dict, None] = None, **query) -> Dict:
+        """Send a request and decode its JSON answer.
+
+        Raises:
+            ApiError: If the service answers with an error status.
+        """
+        query = {name: value for name, value in query.items() if value is not None}
+        url = f'{self.url}{path}' + (f'?{urllib.parse.urlencode(query)}' if query else '')
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(url, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as error:
+            raise self.__error(error) from None
+
+    @staticmethod
+    def __error(error: urllib.error.HTTPError) -> ApiError:
+        try:
+            message = json.loads(error.read()).get('error', error.reason)
+        except ValueError:
+            message = error.reason
+        return ApiError(error.code, message)
+
+    def health(self) -> Dict:
+        return self.request('GET', '/health')
+
+    def submit(self, scene: Union[str, None] = None, rules: Union[str, None] = None,
+               config: Union[Dict, None] = None) -> Dict:
+        """Submit a simulation job.
+
+        Args:
+            scene (Union[str, None], optional): Scene name, None for the one of
+                the service configuration.
+            rules (Union[str, None], optional): Rules name, None for the one of
+                the service configuration.
+            config (Union[Dict, None], optional): Configuration fields keyed by
+                'Section.Field', as in a manifest.
+
+        Returns:
+            Dict: The job, with its ``id`` and ``status``.
+        """
+        payload = {'config': config or dict()}
+        if scene is not None:
+            payload['scene'] = scene
+        if rules is not None:
+            payload['rules'] = rules
+        return self.request('POST', '/jobs', payload)
+
+    def job(self, job_id: str) -> Dict:
+        return self.request('GET', f'/jobs/{job_id}')
+
+    def jobs(self) -> List[Dict]:
+        return self.request('GET', '/jobs')['jobs']
+
+    def result(self, job_id: str, since: Union[int, None] = None) -> Dict:
+        """Output counts of a job, also while it runs.
+
+        Args:
+            job_id (str): Job id.
+            since (Union[int, None], optional): Only return the steps after this one.
+
+        Returns:
+            Dict: ``status``, ``objects``, ``steps`` and ``columns``, with the
+                counts of every object at every step.
+        """
+        return self.request('GET', f'/jobs/{job_id}/result', since=since)
+
+    def stream(self, job_id: str) -> Iterator[Tuple[str, Dict]]:
+        """Follow a job as it runs, through its server-sent events.
+
+        Yields:
+            Tuple[str, Dict]: ``('step', {'step', 'counts', 'skipped'})`` for the
+                last logged step and every later one, ``skipped`` counting the
+                steps conflated into it when the client was slow, and finally
+                ``('end', {'status', 'step', 'error'})``.
+        """
+        request = urllib.request.Request(f'{self.url}/jobs/{job_id}/stream', headers={'Accept': 'text/event-stream'})
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as error:
+            raise self.__error(error) from None
+        with response:
+            event, data = 'message', []
+            for line in response:
+                line = line.decode('utf-8').rstrip('\r\n')
+                if line.startswith('event:'):
+                    event = line[len('event:'):].strip()
+                elif line.startswith('data:'):
+                    data.append(line[len('data:'):].strip())
+                elif not line and data:
+                    yield event, json.loads('\n'.join(data))
+                    if event == 'end':
+                        return
+                    event, data = 'message', []
+
+    def pause(self, job_id: str) -> Dict:
+        return self.request('POST', f'/jobs/{job_id}/pause')
+
+    def resume(self, job_id: str) -> Dict:
+        return self.request('POST', f'/jobs/{job_id}/resume')
+
+    def cancel(self, job_id: str) -> Dict:
+        return self.request('DELETE', f'/jobs/{job_id}')
+
+    def wait(self, job_id: str, interval: float = 0.5, timeout: Union[float, None] = None) -> Dict:
+        """Poll a job until it finishes.
+
+        Raises:
+            TimeoutError: If the job does not finish within ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.job(job_id)
+            if job['status'] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f'Job {job_id} did not finish in {timeout}s')
+            time.sleep(interval)
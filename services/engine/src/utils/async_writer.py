@@ -0,0 +1,164 @@
+import queue
+import threading
+
+from typing import Dict, Union
+
+"""
+Asynchronous writer module for simulation outputs.
+
+This module moves disk writes out of the simulation step loop. The step loop
+hands pre-serialized buffers to a bounded queue that is drained by a
+dedicated thread, so the latency of the disk (or of a network-mounted run
+directory) is not added to the step time.
+"""
+
+APPEND = 'ab'
+REPLACE = 'wb'
+
+
+def note_error(error: BaseException, writer_error: BaseException):
+    """Add a writer error as a note of the error that ended the producer."""
+    error.add_note(f'Writing the outputs also failed: {type(writer_error).__name__}: {writer_error}')
+
+
+class AsyncWriter:
+    """Writes byte buffers to files from a background thread.
+
+    Buffers are queued in order and written in the same order. The queue is
+    bounded: when the disk cannot keep up, `write` blocks until there is room,
+    which applies backpressure to the producer instead of growing memory.
+
+    Errors raised by the writer thread are kept and raised again in the producer
+    on the next call to `write` or on `close`. A producer that is already failing
+    passes its error to `close`, so a writer error does not replace it.
+
+    The writer can be used as a context manager; leaving the context, even with
+    an exception or a `KeyboardInterrupt`, writes every pending buffer and closes
+    the files.
+
+    Attributes:
+        max_pending (int): Maximum number of buffers waiting to be written.
+    """
+
+    def __init__(self, max_pending: int = 64):
+        """Initialize the writer and start its thread.
+
+        Args:
+            max_pending (int, optional): Maximum number of buffers waiting to be
+                written before `write` blocks. Defaults to 64.
+        """
+        self._max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._files: Dict[str, object] = dict()
+        self._error: Union[BaseException, None] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self.__drain, name='psys-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(exc_value)
+        return False
+
+    @property
+    def max_pending(self) -> int:
+        """Gets the maximum number of buffers waiting to be written."""
+        return self._max_pending
+
+    def write(self, path: str, data: bytes):
+        """Queue a buffer to be appended to a file.
+
+        Args:
+            path (str): Destination file. It is opened on its first write.
+            data (bytes): Pre-serialized content to append.
+
+        Raises:
+            RuntimeError: If the writer is already closed.
+        """
+        self.__put((path, data, APPEND))
+
+    def replace(self, path: str, data: bytes):
+        """Queue a buffer that replaces the whole content of a file.
+
+        Args:
+            path (str): Destination file.
+            data (bytes): Pre-serialized content of the file.
+
+        Raises:
+            RuntimeError: If the writer is already closed.
+        """
+        self.__put((path, data, REPLACE))
+
+    def flush(self):
+        """Block until every queued buffer has been written."""
+        self._queue.join()
+        self.__raise_error()
+
+    def close(self, error: Union[BaseException, None] = None):
+        """Write every pending buffer, close the files and stop the thread.
+
+        Args:
+            error (Union[BaseException, None], optional): Error the producer is
+                failing with. A writer error is added to it as a note instead
+                of being raised, so the error of the producer propagates.
+
+        Raises:
+            Exception: The first error found by the writer thread, if any and
+                ``error`` is not given.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        if error is None:
+            self.__raise_error()
+        elif self._error is not None:
+            note_error(error, self._error)
+            self._error = None
+
+    def __put(self, item):
+        if self._closed:
+            raise RuntimeError('The writer is closed')
+        self.__raise_error()
+        self._queue.put(item)
+
+    def __raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __drain(self):
+        """Writer thread loop. Runs until the close sentinel is received."""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                if self._error is None:
+                    self.__write_item(*item)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+        for f in self._files.values():
+            try:
+                f.close()
+            except OSError as e:
+                self._error = self._error or e
+        self._files.clear()
+
+    def __write_item(self, path: str, data: bytes, mode: str):
+        if mode == REPLACE:
+            handle = self._files.pop(path, None)
+            if handle is not None:
+                handle.close()
+            with open(path, REPLACE) as f:
+                f.write(data)
+            return
+        handle = self._files.get(path, None)
+        if handle is None:
+            handle = open(path, APPEND)
+            self._files[path] = handle
+        handle.write(data)
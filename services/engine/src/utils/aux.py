@@ -1,8 +1,21 @@
 import os
+import json
+import secrets
 from datetime import datetime
 
+# Project paths, relative to services/engine
 RUNS_PATH = '../../runs/'
+CACHE_PATH = '../../cache/'
+SCENES_PATH = '../../scenes/'
+RULES_PATH = '../../rules/'
+PLOTS_PATH = '../../plots/'
+CONFIG_PATH = '../../config/config.ini'
+ENV_PATH = '../../config/.env'
 OUTPUT_FORMAT = '.csv'
+# Manifest of every run directory
+MANIFEST_FILE = 'manifest.json'
+# Random bytes of the suffix of the run directories
+RUN_SUFFIX_BYTES = 3
 
 def creation_time_str():
     """Generate a timestamp string for the current date and time.
@@ -24,32 +37,50 @@ def creation_time_str():
     dt = datetime.now()
     return f'{dt.year}{dt.month:02}{dt.day:02}_{dt.hour:02}{dt.minute:02}{dt.second:02}'
 
-def create_log_file(datetime_str):
-    """Create a new CSV log file with timestamp-based filename.
-    
-    Creates a new log file in the specified runs directory with a filename
-    based on the provided datetime string. The file is initialized with
-    a CSV header containing 'step,object,count' columns.
-    
+def create_run_dir(runs_path=RUNS_PATH):
+    """Create the directory of a new run.
+
+    Every run writes its output, trace, replay and manifest files to a
+    directory of its own, named after the creation time and a random suffix.
+    The directory is created with a single `os.mkdir`, which fails if it
+    already exists, so runs created at the same time by any number of
+    processes, on the same filesystem, never share a directory: on a clash
+    another suffix is drawn.
+
     Args:
-        datetime_str (str): A timestamp string used as the base filename,
-            typically in the format 'YYYYMMDD_HHMMSS' as generated by
-            creation_time_str().
-    
+        runs_path (str, optional): Directory of the runs. Defaults to RUNS_PATH.
+
     Returns:
-        None: This function creates a file but doesn't return any value.
-    
-    Note:
-        The function relies on global constants RUNS_PATH and OUTPUT_FORMAT
-        to determine the full file path. The file is created with UTF-8
-        encoding and opened in write mode, overwriting any existing file
-        with the same name.
-    
+        str: Name of the created directory, in the format
+            'YYYYMMDD_HHMMSS_<suffix>'.
+
     Example:
-        >>> timestamp = creation_time_str()
-        >>> create_log_file(timestamp)
-        # Creates a file like: /path/to/runs/20241215_143045.csv
+        >>> create_run_dir()
+        '20241215_143045_3fa2c1'
+        # Creates a directory like: /path/to/runs/20241215_143045_3fa2c1/
+    """
+    os.makedirs(runs_path, exist_ok=True)
+    datetime_str = creation_time_str()
+    while True:
+        name = f'{datetime_str}_{secrets.token_hex(RUN_SUFFIX_BYTES)}'
+        try:
+            os.mkdir(os.path.join(runs_path, name))
+            return name
+        except FileExistsError:
+            continue
+
+
+def write_json_atomic(path, data):
+    """Write a JSON file so that readers see the old or the new contents, never a part.
+
+    The contents are written to a temporary file of the same directory, which
+    then replaces the file in one `os.replace`.
+
+    Args:
+        path (str): Path of the file.
+        data: JSON-serializable contents.
     """
-    path = os.path.join(RUNS_PATH, datetime_str + OUTPUT_FORMAT)
-    with open(path, 'w+', encoding='utf-8') as f:
-        f.write(f'step,object,count\n')
\ No newline at end of file
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temporary, path)
@@ -1,11 +1,30 @@
 import configparser
-from src.enums.constants import InferenceType
+from typing import Dict, Union
+from src.enums.constants import InferenceType, Replication, RuleStatsLevel, Selection, TraceLevel
+from src.utils.aux import CONFIG_PATH
 
 
 class ConfigParser:
-    def __init__(self, path: str = '../../config/config.ini'):
+    def __init__(self, path: str = CONFIG_PATH, overrides: Union[Dict[str, object], None] = None):
+        """Read the configuration file.
+
+        Args:
+            path (str, optional): Path of the configuration file.
+            overrides (Union[Dict[str, object], None], optional): Values that replace
+                the ones of the file, keyed by 'Section.Field' (e.g. 'Runtime.Seed').
+
+        Raises:
+            ValueError: If an override key is not in the 'Section.Field' form.
+        """
         self.parser = configparser.ConfigParser()
         self.parser.read(path)
+        for name, value in (overrides or dict()).items():
+            section, _, field = name.partition('.')
+            if not section or not field:
+                raise ValueError(f'Configuration override "{name}" is not in the Section.Field form')
+            if not self.parser.has_section(section):
+                self.parser.add_section(section)
+            self.parser.set(section, field, str(value))
         self.type_map = {
             None: self.parser.get,
             bool: self.parser.getboolean,
@@ -15,9 +34,23 @@ class ConfigParser:
         self._format = self.__read_field(tag='Input', field='Format', default='xml')
         self._scene  = self.__read_field(tag='Input', field='Scene', default='')
         self._rules  = self.__read_field(tag='Input', field='Rules', default='')
+        self._cache  = self.__read_field(tag='Input', field='Cache', default=True, dtype=bool)
+        self._replic = self.__read_field(tag='Input', field='Replication', default=Replication.EXPAND)
         self._infer  = self.__read_field(tag='Runtime', field='Inference', default=InferenceType.MIN_PARALLEL)
         self._msteps = self.__read_field(tag='Runtime', field='MaxSteps', default=None, dtype=int)
         self._seed   = self.__read_field(tag='Runtime', field='Seed', default=None, dtype=int)
+        self._trace  = self.__read_field(tag='Runtime', field='Trace', default=TraceLevel.OFF)
+        self._kframe = self.__read_field(tag='Runtime', field='Keyframes', default=None, dtype=int)
+        self._timing = self.__read_field(tag='Runtime', field='Timings', default=False, dtype=bool)
+        self._wide   = self.__read_field(tag='Runtime', field='WideOutput', default=False, dtype=bool)
+        self._store  = self.__read_field(tag='Runtime', field='Store', default=False, dtype=bool)
+        self._rstats = self.__read_field(tag='Runtime', field='RuleStats', default=RuleStatsLevel.OFF)
+        self._memory = self.__read_field(tag='Runtime', field='Memory', default=None, dtype=int)
+        self._struct = self.__read_field(tag='Runtime', field='Structure', default=None, dtype=int)
+        self._select = self.__read_field(tag='Runtime', field='Selection', default=Selection.SERIAL)
+        self._worker = self.__read_field(tag='Runtime', field='Workers', default=None, dtype=int)
+        self._shards = self.__read_field(tag='Runtime', field='Shards', default=None, dtype=int)
+        self._sprocs = self.__read_field(tag='Runtime', field='ShardProcesses', default=True, dtype=bool)
 
     def __read_field(self, tag: str, field: str, default, dtype: type = None):
         try:
@@ -37,6 +70,14 @@ class ConfigParser:
     def rules(self):
         return self._rules
     
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def replication(self):
+        return self._replic
+
     @property
     def inference(self):
         return self._infer
@@ -48,3 +89,51 @@ class ConfigParser:
     @property
     def seed(self):
         return self._seed
+
+    @property
+    def trace(self):
+        return self._trace
+
+    @property
+    def keyframes(self):
+        return self._kframe
+
+    @property
+    def timings(self):
+        return self._timing
+
+    @property
+    def wide_output(self):
+        return self._wide
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def rule_stats(self):
+        return self._rstats
+
+    @property
+    def memory(self):
+        return self._memory
+
+    @property
+    def structure(self):
+        return self._struct
+
+    @property
+    def selection(self):
+        return self._select
+
+    @property
+    def workers(self):
+        return self._worker
+
+    @property
+    def shards(self):
+        return self._shards
+
+    @property
+    def shard_processes(self):
+        return self._sprocs
@@ -0,0 +1,111 @@
+import numpy as np
+
+from src.enums.constants import Downsampling
+
+"""
+Trajectory downsampling module for simulation results.
+
+Long runs produce one point per step and object, more than a chart can show
+and far more than a browser can draw smoothly. This module picks, for every
+trajectory, a subset of at most a given number of points that keeps its
+visual shape:
+
+- ``lttb``: Largest-Triangle-Three-Buckets. One point per bucket, the one
+  forming the largest triangle with the point kept in the previous bucket and
+  the average of the next one. Keeps the overall shape with smooth lines.
+- ``minmax``: The minimum and the maximum of every bucket. Keeps every spike,
+  so no peak of an epidemic curve is lost.
+
+Both return the indices of the kept points, always including the first and
+the last one, so several columns of a table can be sampled at the same rows.
+"""
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    Args:
+        x (np.ndarray): Increasing x coordinates.
+        y (np.ndarray): Y coordinates.
+        threshold (int): Maximum number of points to keep.
+
+    Returns:
+        np.ndarray: Increasing indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n) if threshold >= n else np.unique([0, n - 1])[:max(threshold, 0)]
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Buckets of the points between the first and the last one
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < threshold - 1:
+            next_start, next_end = end, edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def minmax(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the minimum and maximum of every bucket.
+
+    Args:
+        x (np.ndarray): Increasing x coordinates.
+        y (np.ndarray): Y coordinates.
+        threshold (int): Maximum number of points to keep.
+
+    Returns:
+        np.ndarray: Increasing indices of the kept points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 4:
+        return np.arange(n) if threshold >= n else np.unique([0, n - 1])[:max(threshold, 0)]
+    y = np.asarray(y)[1:n - 1]
+    # Contiguous buckets of the points between the first and the last one
+    starts = np.linspace(0, n - 2, (threshold - 2) // 2 + 1).astype(np.int64)[:-1]
+    counts = np.diff(np.r_[starts, n - 2])
+    kept = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extremes = np.repeat(reduce.reduceat(y, starts), counts)
+        # First point of every bucket equal to its extreme
+        hits = np.flatnonzero(y == extremes)
+        _, first = np.unique(np.searchsorted(starts, hits, side='right'), return_index=True)
+        kept.append(hits[first] + 1)
+    return np.unique(np.concatenate(kept))
+
+
+METHODS = {
+    Downsampling.LTTB: lttb,
+    Downsampling.MINMAX: minmax,
+}
+
+
+def downsample(x: np.ndarray, y: np.ndarray, threshold: int, method: str = Downsampling.LTTB) -> np.ndarray:
+    """Indices of the points of a trajectory to plot.
+
+    Args:
+        x (np.ndarray): Increasing x coordinates.
+        y (np.ndarray): Y coordinates.
+        threshold (int): Maximum number of points to keep.
+        method (str, optional): One of the Downsampling values.
+
+    Returns:
+        np.ndarray: Increasing indices of the kept points.
+
+    Raises:
+        ValueError: If the method is not a Downsampling value.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Downsampling method "{method}" not valid')
+    return METHODS[method](x, y, threshold)
@@ -0,0 +1,68 @@
+import json
+import argparse
+
+from types import SimpleNamespace
+
+from src.enums.constants import Replication
+from src.utils.aux import SCENES_PATH, RULES_PATH
+from src.utils.xml_parser import XMLInputParser
+from src.utils.json_parser import dump_scene, dump_rules
+
+"""
+Format conversion module for P-system input files.
+
+This module converts scenes and rules from the XML format to the equivalent
+JSON format read by `JSONInputParser`. Files are converted through the model:
+they are parsed with `XMLInputParser` and the resulting membranes and rules
+are written back as JSON, so both files describe exactly the same system.
+Replicated membranes are written expanded.
+
+Usage (from services/engine):
+    python -m src.utils.format_converter --scene scene_00 --rules rules_00
+"""
+
+
+def convert_scene(name: str) -> str:
+    """Convert '../../scenes/<name>.xml' to '../../scenes/<name>.json'.
+
+    Args:
+        name (str): Scene name, without extension.
+
+    Returns:
+        str: Path of the written JSON file.
+    """
+    parser = XMLInputParser(SimpleNamespace(scene=name, rules=None, inference=None, replication=Replication.EXPAND))
+    scene = dump_scene(parser.load_scene())
+    path = f'{SCENES_PATH}{name}.json'
+    with open(path, 'w+', encoding='utf-8') as f:
+        json.dump(scene, f, separators=(',', ':'))
+    return path
+
+
+def convert_rules(name: str) -> str:
+    """Convert '../../rules/<name>.xml' to '../../rules/<name>.json'.
+
+    Args:
+        name (str): Rules name, without extension.
+
+    Returns:
+        str: Path of the written JSON file.
+    """
+    parser = XMLInputParser(SimpleNamespace(scene=None, rules=name, inference=None))
+    rules = dump_rules(*parser.load_rules())
+    path = f'{RULES_PATH}{name}.json'
+    with open(path, 'w+', encoding='utf-8') as f:
+        json.dump(rules, f, indent=2)
+    return path
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Convert XML scenes and rules to JSON.')
+    arg_parser.add_argument('--scene', action='append', default=[], help='Scene name to convert (repeatable)')
+    arg_parser.add_argument('--rules', action='append', default=[], help='Rules name to convert (repeatable)')
+    args = arg_parser.parse_args()
+
+    for scene in args.scene:
+        print(convert_scene(scene))
+    for rules in args.rules:
+        print(convert_rules(rules))
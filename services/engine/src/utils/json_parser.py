@@ -0,0 +1,390 @@
+import json
+
+from typing import Dict, Tuple
+
+from src.classes.rule import Rule
+from src.classes.rule_dmem import RuleDMEM
+from src.classes.objects_multiset import ObjectsMultiset
+from src.classes.membrane import Membrane
+from src.classes.p_system import PSystem
+from src.enums.constants import SceneObject, MoveCode
+from src.utils.replication import Replicator, variation
+from src.utils.aux import SCENES_PATH, RULES_PATH
+
+"""
+JSON input module for membrane computing systems.
+
+This module reads scenes and rules written in JSON, which map one to one onto
+the XML format. A scene is a nested membrane object:
+
+    {"membrane": {"id": "eco", "m": 1, "capacity": 1000,
+                  "objects": {"a": 1},
+                  "children": [...]}}
+
+and a rules file holds the alphabet, the rules of every membrane and the
+output configuration:
+
+    {"alphabet": ["a", "b"],
+     "membranes": {"h1": {"rBO": [{"id": "r1", "pb": 0.9, "pr": ["r0"],
+                                   "lh": {"a": 1},
+                                   "rh": {"move": "HERE", "objects": {"b": 1}}}],
+                          "rMM": [...]}},
+     "output": {"id": "eco", "values": ["a"]}}
+
+Rules with several right-hand sides (DMEM) use a list of right-hand sides.
+Membrane rules add the id of the moved membrane as "mem" in their right-hand
+side. Membranes can be replicated with "count", "seed" and "variation", the
+counterparts of the XML replication attributes. The module also provides the
+inverse functions, used to convert XML files to JSON.
+"""
+
+OBJECTS = 'objects'
+CHILDREN = 'children'
+COUNT = 'count'
+VARIATION = 'variation'
+
+
+def _check(condition: bool, path: str, message: str):
+    """Raise a ValueError pointing to the offending JSON element."""
+    if not condition:
+        raise ValueError(f'Invalid JSON model at "{path}": {message}')
+
+
+def _multiset(objects, path: str) -> ObjectsMultiset:
+    """Validate a JSON object of multiplicities and build its multiset in bulk."""
+    _check(isinstance(objects, dict), path, 'expected an object of multiplicities')
+    try:
+        return ObjectsMultiset.from_dict(objects)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON model at "{path}": {e}') from e
+
+
+class JSONInputParser:
+    """Parser for JSON files defining P-system scenes and rules.
+
+    This class is the JSON counterpart of `XMLInputParser`. Files are decoded in a
+    single call and the resulting structure is validated while the membranes and
+    rules are built, in one pass.
+    """
+
+    def __init__(self, config):
+        """Initialize the JSONInputParser with configuration settings.
+
+        Args:
+            config: Configuration object containing scene and rules file names,
+                along with other system parameters like inference settings.
+
+        Note:
+            Files are read when the system is built in `parse`, or separately with
+            `load_scene` and `load_rules`. Scene and rules files are expected to be
+            located in '../../scenes/' and '../../rules/' directories respectively.
+        """
+        self._config = config
+        self._scene_path = f'{SCENES_PATH}{config.scene}.json'
+        self._rules_path = f'{RULES_PATH}{config.rules}.json'
+
+    @property
+    def config(self):
+        """Gets the configuration the files are parsed with."""
+        return self._config
+
+    @property
+    def scene_path(self) -> str:
+        """Gets the path of the scene file."""
+        return self._scene_path
+
+    @property
+    def rules_path(self) -> str:
+        """Gets the path of the rules file."""
+        return self._rules_path
+
+    def load_scene(self) -> Membrane:
+        """Build the membrane structure described in the scene file."""
+        with open(self._scene_path, 'r', encoding='utf-8') as f:
+            return self.iterate_scene_node(json.load(f))
+
+    def load_rules(self) -> Tuple[Tuple[str], Dict, Dict | None]:
+        """Build the alphabet, rules and output described in the rules file."""
+        with open(self._rules_path, 'r', encoding='utf-8') as f:
+            return self.iterate_rules_node(json.load(f))
+
+    def iterate_scene_node(self, node: Dict) -> Membrane:
+        """Build the membrane structure of a decoded scene.
+
+        Membranes with a "count" are templates whose copies are added to the parent
+        in bulk by a `Replicator`. Their "variation" object describes the objects
+        that vary between copies, e.g. ``{"v1": {"m": 1, "pb": 0.01}}`` (see
+        `src.utils.replication`).
+
+        Args:
+            node (Dict): Decoded scene, with the root membrane under "membrane".
+
+        Returns:
+            Membrane: The root membrane of the constructed hierarchy.
+
+        Raises:
+            ValueError: If the scene does not follow the JSON scene format.
+        """
+        _check(isinstance(node, dict) and SceneObject.MEMBRANE in node, '$', 'expected a root "membrane"')
+        data, path = node[SceneObject.MEMBRANE], f'$.{SceneObject.MEMBRANE}'
+        _check(isinstance(data, dict) and COUNT not in data, path, 'expected a membrane object that is not replicated')
+        return self.__build_membranes(data, path, Replicator(self._config.replication))
+
+    def __build_membranes(self, data: Dict, path: str, replicator: Replicator) -> Membrane:
+        """Build a membrane and its descendants, expanding the replicated ones."""
+        root = None
+        pending = [(data, None, path)]
+        while pending:
+            data, parent, path = pending.pop()
+            _check(isinstance(data, dict), path, 'expected a membrane object')
+            if parent is not None and COUNT in data:
+                copies = self.__replicate(data, path, replicator)
+                parent.add_children(copies)
+                for copy in copies:
+                    copy.parent = parent
+                continue
+            _check(parent is None or VARIATION not in data, f'{path}.{VARIATION}', 'only replicated membranes can vary')
+            try:
+                membrane = Membrane(idx=str(data['id']), multiplicity=int(data.get('m', 1)), capacity=int(data['capacity']))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'Invalid JSON model at "{path}": missing or invalid membrane field {e}') from e
+            membrane.objects = _multiset(data.get(OBJECTS, dict()), f'{path}.{OBJECTS}')
+            if parent is None:
+                root = membrane
+            else:
+                parent.add_child(membrane)
+                membrane.parent = parent
+
+            children = data.get(CHILDREN, [])
+            _check(isinstance(children, list), f'{path}.{CHILDREN}', 'expected a list of membranes')
+            # Reversed so the children are popped, and added, in file order
+            for i in reversed(range(len(children))):
+                pending.append((children[i], membrane, f'{path}.{CHILDREN}[{i}]'))
+        return root
+
+    def __replicate(self, data: Dict, path: str, replicator: Replicator):
+        """Build the template of a replicated membrane and its copies."""
+        count, seed = data[COUNT], data.get('seed', None)
+        _check(type(count) is int, f'{path}.{COUNT}', 'expected an integer')
+        _check(seed is None or type(seed) is int, f'{path}.seed', 'expected an integer')
+        variations = data.get(VARIATION, dict())
+        _check(isinstance(variations, dict), f'{path}.{VARIATION}', 'expected an object keyed by object')
+        try:
+            variations = [variation(obj, spec.get('m', 1), spec.get('mmax', None), spec.get('pb', None))
+                          for obj, spec in variations.items()]
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid JSON model at "{path}.{VARIATION}": {e}') from e
+        template = self.__build_membranes(data, path, replicator)
+        return replicator.replicate(template, count, variations, seed)
+
+    def iterate_rules_node(self, node: Dict) -> Tuple[Tuple[str], Dict, Dict | None]:
+        """Build the alphabet, rules and output configuration of a decoded rules file.
+
+        Args:
+            node (Dict): Decoded rules file.
+
+        Returns:
+            Tuple containing:
+                - Tuple[str]: Alphabet of objects used in the system.
+                - Dict: Mapping of (membrane_id, rule_type) to lists of Rule objects.
+                - Dict | None: Output configuration specifying which objects to collect.
+
+        Raises:
+            ValueError: If the rules do not follow the JSON rules format.
+        """
+        _check(isinstance(node, dict), '$', 'expected an object')
+        alphabet = node.get('alphabet', [])
+        _check(isinstance(alphabet, list) and all(isinstance(v, str) for v in alphabet), '$.alphabet', 'expected a list of strings')
+        membranes = node.get('membranes', dict())
+        _check(isinstance(membranes, dict), '$.membranes', 'expected an object keyed by membrane id')
+
+        rules_mapping = dict()
+        for idx, membrane in membranes.items():
+            path = f'$.membranes.{idx}'
+            _check(isinstance(membrane, dict), path, 'expected an object with rule lists')
+            membrane_obj_rules = []
+            membrane_mem_rules = []
+            for i, rule in enumerate(membrane.get(SceneObject.OBJECT_RULE, [])):
+                built_rule = self.__build_obj_rule(rule, f'{path}.{SceneObject.OBJECT_RULE}[{i}]')
+                if not built_rule.idx:
+                    built_rule.idx = len(membrane_obj_rules)
+                membrane_obj_rules.append(built_rule)
+
+            for i, rule in enumerate(membrane.get(SceneObject.MEMBRANE_RULE, [])):
+                built_rule = self.__build_mem_rule(rule, f'{path}.{SceneObject.MEMBRANE_RULE}[{i}]')
+                if not built_rule.idx:
+                    built_rule.idx = len(membrane_obj_rules) + len(membrane_mem_rules)
+                membrane_mem_rules.append(built_rule)
+            rules_mapping[idx, SceneObject.OBJECT_RULE] = membrane_obj_rules
+            rules_mapping[idx, SceneObject.MEMBRANE_RULE] = membrane_mem_rules
+
+        output = node.get('output', None)
+        if output is not None:
+            _check(isinstance(output, dict) and 'id' in output, '$.output', 'expected an object with the membrane "id"')
+            values = output.get('values', [])
+            _check(isinstance(values, list), '$.output.values', 'expected a list of objects')
+            output = {'id': output['id'], 'values': list(values)}
+        return tuple(alphabet), rules_mapping, output
+
+    def __rule_header(self, rule: Dict, path: str) -> Tuple:
+        """Validate and extract the id, probability and priority of a rule."""
+        _check(isinstance(rule, dict), path, 'expected a rule object')
+        idx = rule.get('id', '')
+        try:
+            probability = float(rule.get('pb', 1.0))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid JSON model at "{path}.pb": expected a number')
+        priority = rule.get('pr', None)
+        if isinstance(priority, str):
+            priority = [prior.strip() for prior in priority.split(',')]
+        _check(priority is None or isinstance(priority, list), f'{path}.pr', 'expected a list of rule ids')
+        if priority and (idx == '' or idx is None):
+            raise ValueError(f'Invalid JSON model at "{path}": a rule with a priority ("pr"={priority}) '
+                             f'must also have a non-empty "id".')
+        _check(SceneObject.RULE_LH in rule and SceneObject.RULE_RH in rule, path, 'a rule needs "lh" and "rh"')
+        return idx, probability, priority or None
+
+    def __build_obj_rule(self, rule: Dict, path: str) -> Rule:
+        """Build an object evolution rule from its JSON object."""
+        idx, probability, priority = self.__rule_header(rule, path)
+        left = _multiset(rule[SceneObject.RULE_LH], f'{path}.{SceneObject.RULE_LH}')
+        right = rule[SceneObject.RULE_RH]
+        rh_path = f'{path}.{SceneObject.RULE_RH}'
+
+        if isinstance(right, list):
+            moves = []
+            out = dict()
+            for i, side in enumerate(right):
+                _check(isinstance(side, dict) and 'move' in side, f'{rh_path}[{i}]', 'expected an object with a "move"')
+                move = side['move']
+                dest = side.get('destination', None) or MoveCode.HERE.name
+                moves.append(move)
+                out.setdefault(move, list())
+                objects = _multiset(side.get(OBJECTS, dict()), f'{rh_path}[{i}].{OBJECTS}')
+                out[move].extend((value, mult, dest) for value, mult in objects.items())
+            if MoveCode.DMEM.name not in moves:
+                raise ValueError(f'Not handled rule extraction for moves {moves}.')
+            return RuleDMEM(idx=idx, left=left, right=out, prob=probability, prior=priority, move=MoveCode.DMEM.name)
+
+        _check(isinstance(right, dict) and 'move' in right, rh_path, 'expected an object with a "move"')
+        move = right['move']
+        _check(move in MoveCode.__members__, f'{rh_path}.move', f'"{move}" is not a valid MoveCode')
+        objects = _multiset(right.get(OBJECTS, dict()), f'{rh_path}.{OBJECTS}')
+        if move == MoveCode.DMEM.name:
+            return RuleDMEM(idx=idx, left=left, right=objects, prob=probability, prior=priority, move=move)
+        return Rule(idx=idx, left=left, right=objects, prob=probability, prior=priority,
+                    move=move, destination=right.get('destination', None))
+
+    def __build_mem_rule(self, rule: Dict, path: str) -> Rule:
+        """Build a membrane evolution rule from its JSON object."""
+        idx, probability, priority = self.__rule_header(rule, path)
+        left = _multiset(rule[SceneObject.RULE_LH], f'{path}.{SceneObject.RULE_LH}')
+        right = rule[SceneObject.RULE_RH]
+        rh_path = f'{path}.{SceneObject.RULE_RH}'
+        _check(isinstance(right, dict) and 'move' in right and 'mem' in right, rh_path,
+               'expected an object with a "move" and the moved membrane "mem"')
+        objects = _multiset(right.get(OBJECTS, dict()), f'{rh_path}.{OBJECTS}')
+        return Rule(idx=idx, left=left, right=objects, prob=probability, prior=priority,
+                    move=right['move'], destination=right.get('destination', None), mem_idx=right['mem'])
+
+    def parse(self) -> PSystem:
+        """Build a complete P-system from the JSON files.
+
+        Returns:
+            PSystem: object containing alphabet, rules, membrane structure,
+            output configuration, and inference settings.
+        """
+        alphabet, rules, output = self.load_rules()
+        membrane_root = self.load_scene()
+        system = PSystem(alpha=alphabet,
+                         rules=rules,
+                         membranes=membrane_root,
+                         out=output,
+                         inference=self._config.inference)
+        return system
+
+
+def dump_scene(root: Membrane) -> Dict:
+    """Describe a membrane structure in the JSON scene format.
+
+    Args:
+        root (Membrane): Root membrane of the structure.
+
+    Returns:
+        Dict: Scene ready to be encoded with `json.dump`.
+    """
+    def node(membrane: Membrane) -> Dict:
+        return {'id': membrane.id,
+                'm': membrane.multiplicity,
+                'capacity': membrane.capacity,
+                OBJECTS: dict(membrane.objects.multiset),
+                CHILDREN: []}
+
+    scene = node(root)
+    pending = [(root, scene)]
+    while pending:
+        membrane, data = pending.pop()
+        for child in membrane.children:
+            child_data = node(child)
+            data[CHILDREN].append(child_data)
+            pending.append((child, child_data))
+    return {SceneObject.MEMBRANE: scene}
+
+
+def dump_rule(rule: Rule) -> Dict:
+    """Describe a rule in the JSON rules format.
+
+    Rule ids assigned automatically by the parsers (integers) are not written.
+
+    Args:
+        rule (Rule): Object or membrane rule.
+
+    Returns:
+        Dict: Rule ready to be encoded with `json.dump`.
+    """
+    data = dict()
+    if isinstance(rule.idx, str) and rule.idx:
+        data['id'] = rule.idx
+    data['pb'] = rule.probability
+    if rule.priority:
+        data['pr'] = list(rule.priority)
+    data[SceneObject.RULE_LH] = dict(rule.left.multiset)
+
+    if isinstance(rule.right, dict):
+        sides = dict()
+        for move, objects in rule.right.items():
+            for value, mult, dest in objects:
+                side = sides.setdefault((move, dest), {'move': move, OBJECTS: dict()})
+                if dest != MoveCode.HERE.name:
+                    side['destination'] = dest
+                side[OBJECTS][value] = mult
+        data[SceneObject.RULE_RH] = list(sides.values())
+        return data
+
+    right = {'move': rule.move, OBJECTS: dict(rule.right.multiset)}
+    if rule.destination is not None:
+        right['destination'] = rule.destination
+    if rule.mem_idx is not None:
+        right['mem'] = rule.mem_idx
+    data[SceneObject.RULE_RH] = right
+    return data
+
+
+def dump_rules(alphabet: Tuple[str], rules: Dict, output: Dict | None) -> Dict:
+    """Describe an alphabet, its rules and the output in the JSON rules format.
+
+    Args:
+        alphabet (Tuple[str]): Alphabet of objects used in the system.
+        rules (Dict): Mapping of (membrane_id, rule_type) to lists of Rule objects.
+        output (Dict | None): Output configuration.
+
+    Returns:
+        Dict: Rules file ready to be encoded with `json.dump`.
+    """
+    membranes = dict()
+    for (idx, kind), membrane_rules in rules.items():
+        membranes.setdefault(idx, dict())[kind] = [dump_rule(rule) for rule in membrane_rules]
+    data = {'alphabet': list(alphabet), 'membranes': membranes}
+    if output is not None:
+        data['output'] = {'id': output['id'], 'values': list(output['values'])}
+    return data
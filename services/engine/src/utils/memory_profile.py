@@ -0,0 +1,208 @@
+import os
+import sys
+import tracemalloc
+
+from typing import Dict, Iterable, List, Tuple
+
+"""
+Memory profiling module for membrane computing simulations.
+
+This module samples the memory of a running system every N steps. Each sample
+walks the membrane structure to measure the bytes held by membranes, object
+multisets and rule bookkeeping, and takes a `tracemalloc` snapshot to report
+the memory allocated by every engine module since profiling started. Samples
+are CSV rows, so the series of two engine versions can be diffed.
+"""
+
+SRC_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_FIELDS = ('step', 'membranes', 'membrane_bytes', 'multiset_bytes', 'rule_bytes', 'bytes_per_membrane',
+                 'traced_bytes', 'traced_peak_bytes', 'multiset_allocs', 'multiset_alloc_bytes')
+SITE_FIELDS = ('step', 'module', 'bytes', 'blocks')
+
+# Size of the attribute dictionary of the instances of every class
+_attribute_sizes: Dict[type, int] = dict()
+
+
+def instance_size(obj) -> int:
+    """Bytes held by an instance and its attributes.
+
+    Reading ``__dict__`` builds the attribute dictionary of an instance that did
+    not have one yet, so the profiler would grow the memory it measures. The
+    engine classes set all their attributes in ``__init__``, so the dictionary is
+    measured on the first instance of every class and reused for the rest.
+    """
+    cls = type(obj)
+    size = _attribute_sizes.get(cls)
+    if size is None:
+        size = _attribute_sizes[cls] = sys.getsizeof(obj.__dict__)
+    return sys.getsizeof(obj) + size
+
+
+def multiset_size(multiset) -> int:
+    """Bytes held by a multiset: the instance, its attributes and its mapping.
+
+    Plain mappings, used by some rule sides, are measured as they are.
+    """
+    if isinstance(multiset, dict):
+        return sys.getsizeof(multiset)
+    return instance_size(multiset) + sys.getsizeof(multiset.multiset)
+
+
+def membrane_sizes(root) -> Tuple[int, int, int]:
+    """Walk a membrane structure measuring its memory.
+
+    Args:
+        root (Membrane): Root of the structure.
+
+    Returns:
+        Tuple[int, int, int]: Number of membranes, bytes of the membranes (the
+            instances, their attributes and their lists of children) and bytes of
+            their object multisets.
+    """
+    count, membrane_bytes, multiset_bytes = 0, 0, 0
+    pending = [root]
+    while pending:
+        membrane = pending.pop()
+        count += 1
+        membrane_bytes += instance_size(membrane) + sys.getsizeof(membrane.children)
+        multiset_bytes += multiset_size(membrane.objects)
+        pending.extend(membrane.children)
+    return count, membrane_bytes, multiset_bytes
+
+
+def rule_sizes(rules: Dict, pending: List) -> int:
+    """Bytes held by the rules of a system and the rules pending application.
+
+    Args:
+        rules (Dict[Tuple, List[Rule]]): Rules of the system by membrane and kind.
+        pending (List[Tuple]): Rules selected and not applied yet.
+
+    Returns:
+        int: Bytes of the rule lists, the rules with their left and right
+            multisets, and the list of pending rules with its entries.
+    """
+    total = sys.getsizeof(rules) + sys.getsizeof(pending) + sum(sys.getsizeof(entry) for entry in pending)
+    for rule_list in rules.values():
+        total += sys.getsizeof(rule_list)
+        for rule in rule_list:
+            total += instance_size(rule)
+            total += multiset_size(rule.left) + multiset_size(rule.right)
+    return total
+
+
+class MemoryProfiler:
+    """Samples the memory of a system every ``interval`` steps.
+
+    `tracemalloc` is started by `start` and only traces the allocations made
+    after it, so ``traced_bytes`` measures the growth of the run; the structural
+    measurements cover the whole system, including what was built by the parser.
+
+    The multiset arithmetic counters are incremented by the maximal parallelism
+    selection, which copies the objects of every membrane and subtracts the left
+    side of every rule it selects, allocating a new multiset each time.
+
+    Attributes:
+        interval (int): Number of steps between two samples.
+    """
+
+    def __init__(self, interval: int):
+        """Initialize a profiler.
+
+        Args:
+            interval (int): Number of steps between two samples.
+
+        Raises:
+            ValueError: If the interval is not positive.
+        """
+        if interval <= 0:
+            raise ValueError(f'Memory profiling interval must be positive, got {interval}')
+        self.interval = interval
+        self._started = False
+        self._allocs = 0
+        self._alloc_bytes = 0
+
+    def start(self):
+        """Start tracing allocations, unless they are already traced."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+
+    def stop(self):
+        """Stop tracing allocations if `start` started it."""
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def count_multiset(self, multiset):
+        """Count a multiset allocated by the selection arithmetic."""
+        self._allocs += 1
+        self._alloc_bytes += multiset_size(multiset)
+
+    def block(self) -> 'MemoryProfiler':
+        """Zeroed multiset counters, for a block selected apart.
+
+        Returns:
+            MemoryProfiler: Profiler whose counters are added back with `merge`.
+        """
+        return MemoryProfiler(self.interval)
+
+    def counters(self) -> Tuple[int, int]:
+        """Multisets counted since the last sample and their bytes."""
+        return self._allocs, self._alloc_bytes
+
+    def merge(self, counters: Tuple[int, int]):
+        """Add the multiset counters of a block, as returned by `counters`."""
+        self._allocs += counters[0]
+        self._alloc_bytes += counters[1]
+
+    @staticmethod
+    def header() -> bytes:
+        """CSV header of the rows returned by `sample`."""
+        return (','.join(SAMPLE_FIELDS) + '\n').encode('utf-8')
+
+    @staticmethod
+    def sites_header() -> bytes:
+        """CSV header of the rows returned by `sites`."""
+        return (','.join(SITE_FIELDS) + '\n').encode('utf-8')
+
+    def sample(self, step: int, root, rules: Dict, pending: List) -> bytes:
+        """Measure the system and reset the multiset arithmetic counters.
+
+        Args:
+            step (int): Current step.
+            root (Membrane): Root membrane of the system.
+            rules (Dict[Tuple, List[Rule]]): Rules of the system.
+            pending (List[Tuple]): Rules pending application.
+
+        Returns:
+            bytes: CSV row with the SAMPLE_FIELDS.
+        """
+        count, membrane_bytes, multiset_bytes = membrane_sizes(root)
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        row = (step, count, membrane_bytes, multiset_bytes, rule_sizes(rules, pending),
+               (membrane_bytes + multiset_bytes) // count, traced, peak, self._allocs, self._alloc_bytes)
+        self._allocs = 0
+        self._alloc_bytes = 0
+        return (','.join(map(str, row)) + '\n').encode('utf-8')
+
+    def sites(self, step: int) -> bytes:
+        """Memory allocated by every engine module and still alive.
+
+        Args:
+            step (int): Current step.
+
+        Returns:
+            bytes: CSV rows with the SITE_FIELDS, one per module of the engine,
+                largest first. Empty when allocations are not traced.
+        """
+        if not tracemalloc.is_tracing():
+            return b''
+        rows = [f'{step},{module},{size},{blocks}\n' for module, size, blocks in self.__modules()]
+        return ''.join(rows).encode('utf-8')
+
+    def __modules(self) -> Iterable[Tuple[str, int, int]]:
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, f'{SRC_PATH}{os.sep}*')])
+        for stat in snapshot.statistics('filename'):
+            module = os.path.relpath(stat.traceback[0].filename, os.path.dirname(SRC_PATH))
+            yield module, stat.size, stat.count
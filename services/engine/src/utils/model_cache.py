@@ -0,0 +1,407 @@
+import gc
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+from types import SimpleNamespace
+from typing import Dict, List, Tuple, Union
+
+from src.classes.membrane import Membrane
+from src.classes.p_system import PSystem
+from src.utils.aux import CACHE_PATH, ENV_PATH
+from src.utils.json_parser import JSONInputParser, dump_rules
+
+"""
+Compiled model cache module for membrane computing systems.
+
+This module keeps a compiled copy of every parsed model in a local cache
+directory, so that launching a simulation of an unchanged scene does not
+parse its XML or JSON files again. Entries are keyed by a hash of the scene
+and rules contents, the parsing options and the engine version, which makes
+stale entries unreachable as soon as any of them changes.
+
+An entry is a directory with:
+    - ``meta.json``: key, versions, interned alphabet, membrane id table and
+      the compiled rule table (rules and output in the JSON rules format).
+    - ``*.npy``: the initial membrane structure as flat arrays in preorder,
+      loaded with a memory map.
+"""
+
+CACHE_FORMAT = 2
+META_FILE = 'meta.json'
+# Separates the name of an entry from its key, never used in model names
+ENTRY_SEPARATOR = '@'
+
+# Flat membrane arrays, one entry per membrane in preorder, and the distinct multisets of the membranes
+ARRAYS = ('parent', 'ids', 'multiplicity', 'capacity', 'objects', 'obj_offsets', 'obj_symbols', 'obj_counts')
+
+
+def engine_version(path: str = ENV_PATH) -> str:
+    """Read the engine version from the environment file of the project.
+
+    Args:
+        path (str, optional): Path of the environment file.
+
+    Returns:
+        str: Value of VERSION, or '0' if it is not defined.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                name, _, value = line.strip().partition('=')
+                if name == 'VERSION':
+                    return value
+    except OSError:
+        pass
+    return '0'
+
+
+def flatten_membranes(root: Membrane, symbols: Dict[str, int]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Flatten a membrane structure into arrays in preorder.
+
+    Membranes with the same objects share one multiset: ``objects[i]`` is the
+    multiset of membrane ``i``, and the distinct multisets are stored in CSR
+    layout, the objects of multiset ``k`` being
+    ``obj_symbols[obj_offsets[k]:obj_offsets[k + 1]]`` with their counts in
+    ``obj_counts``. Symbols not in ``symbols`` are interned on the way.
+
+    Args:
+        root (Membrane): Root of the structure.
+        symbols (Dict[str, int]): Interned alphabet, extended in place.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], List[str]]: Arrays keyed by name and the
+            membrane id table indexed by the ``ids`` array.
+    """
+    parent, ids, multiplicity, capacity, objects = [], [], [], [], []
+    multisets: Dict[Tuple, int] = dict()
+    id_table = dict()
+
+    pending = [(root, -1)]
+    while pending:
+        membrane, parent_position = pending.pop()
+        position = len(parent)
+        parent.append(parent_position)
+        ids.append(id_table.setdefault(membrane.id, len(id_table)))
+        multiplicity.append(membrane.multiplicity)
+        capacity.append(membrane.capacity)
+        multiset = tuple((symbols.setdefault(obj, len(symbols)), count)
+                         for obj, count in membrane.objects.multiset.items())
+        objects.append(multisets.setdefault(multiset, len(multisets)))
+        # Reversed so the children are popped in order
+        pending.extend((child, position) for child in reversed(membrane.children))
+
+    offsets, obj_symbols, obj_counts = [0], [], []
+    for multiset in multisets:
+        obj_symbols.extend(symbol for symbol, _ in multiset)
+        obj_counts.extend(count for _, count in multiset)
+        offsets.append(len(obj_symbols))
+    arrays = {
+        'parent': np.array(parent, dtype=np.int32),
+        'ids': np.array(ids, dtype=np.int32),
+        'multiplicity': np.array(multiplicity, dtype=np.int64),
+        'capacity': np.array(capacity, dtype=np.int64),
+        'objects': np.array(objects, dtype=np.int32),
+        'obj_offsets': np.array(offsets, dtype=np.int64),
+        'obj_symbols': np.array(obj_symbols, dtype=np.int32),
+        'obj_counts': np.array(obj_counts, dtype=np.int64),
+    }
+    return arrays, list(id_table)
+
+
+def build_flat_membranes(arrays: Dict[str, np.ndarray], symbols: List[str], id_table: List[str]) -> Membrane:
+    """Build a membrane structure from its flat arrays.
+
+    Args:
+        arrays (Dict[str, np.ndarray]): Arrays produced by `flatten_membranes`.
+        symbols (List[str]): Interned alphabet.
+        id_table (List[str]): Membrane id table.
+
+    Returns:
+        Membrane: Root of the structure.
+    """
+    parent = arrays['parent'].tolist()
+    ids = [id_table[i] for i in arrays['ids'].tolist()]
+    multiplicity = arrays['multiplicity'].tolist()
+    capacity = arrays['capacity'].tolist()
+    offsets = arrays['obj_offsets'].tolist()
+    obj_symbols = [symbols[s] for s in arrays['obj_symbols'].tolist()]
+    obj_counts = arrays['obj_counts'].tolist()
+    # Every membrane gets a copy of its multiset, built once
+    multisets = [dict(zip(obj_symbols[first:last], obj_counts[first:last]))
+                 for first, last in zip(offsets, offsets[1:])]
+    objects = arrays['objects'].tolist()
+
+    membranes = []
+    # The structure holds no garbage, but its parent links make the collector
+    # walk every membrane built so far several times while it grows
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        for i, parent_position in enumerate(parent):
+            parent_membrane = membranes[parent_position] if parent_position >= 0 else None
+            membrane = Membrane(idx=ids[i], multiplicity=multiplicity[i], capacity=capacity[i], parent=parent_membrane)
+            multiset = multisets[objects[i]]
+            if multiset:
+                membrane.objects.multiset = multiset.copy()
+            if parent_membrane is not None:
+                parent_membrane.children.append(membrane)
+            membranes.append(membrane)
+    finally:
+        if collecting:
+            gc.enable()
+    return membranes[0]
+
+
+class ModelCache:
+    """Directory of compiled models keyed by the content of their files.
+
+    Attributes:
+        path (str): Cache directory.
+        version (str): Engine version included in the keys.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, version: Union[str, None] = None):
+        """Initialize the cache. The directory is created on the first store.
+
+        Args:
+            path (str, optional): Cache directory. Defaults to CACHE_PATH.
+            version (Union[str, None], optional): Engine version. Defaults to
+                the VERSION of the environment file.
+        """
+        self._path = path
+        self._version = version if version is not None else engine_version()
+
+    @property
+    def path(self) -> str:
+        """Gets the cache directory."""
+        return self._path
+
+    @property
+    def version(self) -> str:
+        """Gets the engine version included in the keys."""
+        return self._version
+
+    def key(self, scene_path: str, rules_path: str, *options: str) -> str:
+        """Hash the contents of a model with the versions that can change its compilation.
+
+        Args:
+            scene_path (str): Path of the scene file.
+            rules_path (str): Path of the rules file.
+            *options (str): Parsing options that change the model, such as the
+                input format or the replication mode.
+
+        Returns:
+            str: Hexadecimal sha256 digest.
+        """
+        digest = hashlib.sha256('\0'.join((str(CACHE_FORMAT), self._version, *options, '')).encode('utf-8'))
+        for path in (scene_path, rules_path):
+            with open(path, 'rb') as f:
+                file_digest = hashlib.file_digest(f, 'sha256').digest()
+            digest.update(file_digest)
+        return digest.hexdigest()
+
+    def entry_path(self, name: str, key: str) -> str:
+        """Directory of the entry of a model."""
+        return os.path.join(self._path, f'{name}{ENTRY_SEPARATOR}{key[:16]}')
+
+    def read(self, name: str, key: str) -> Union[Tuple[Tuple[str], Dict, Union[Dict, None], Tuple], None]:
+        """Read a compiled model without building its membrane structure.
+
+        Args:
+            name (str): Name of the model, as used to store it.
+            key (str): Key of the model.
+
+        Returns:
+            Union[Tuple, None]: Alphabet, rules, output and the structure as the
+                arguments of `build_flat_membranes`, or None if there is no valid
+                entry for the key.
+        """
+        path = self.entry_path(name, key)
+        try:
+            with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['key'] != key or meta['format'] != CACHE_FORMAT:
+                return None
+            arrays = {array: np.load(os.path.join(path, f'{array}.npy'), mmap_mode='r') for array in ARRAYS}
+        except (OSError, ValueError, KeyError):
+            return None
+        # The rule table was validated when it was compiled
+        rules_parser = JSONInputParser(SimpleNamespace(scene=None, rules=None))
+        alphabet, rules, output = rules_parser.iterate_rules_node(meta['rules'])
+        return alphabet, rules, output, (arrays, meta['symbols'], meta['membranes'])
+
+    def load(self, name: str, key: str) -> Union[Tuple[Tuple[str], Dict, Union[Dict, None], Membrane], None]:
+        """Load a compiled model.
+
+        Args:
+            name (str): Name of the model, as used to store it.
+            key (str): Key of the model.
+
+        Returns:
+            Union[Tuple, None]: Alphabet, rules, output and root membrane, or None if
+                there is no valid entry for the key.
+        """
+        model = self.read(name, key)
+        if model is None:
+            return None
+        alphabet, rules, output, structure = model
+        return alphabet, rules, output, build_flat_membranes(*structure)
+
+    def store(self, name: str, key: str, alphabet: Tuple[str], rules: Dict, output: Union[Dict, None],
+              root: Membrane) -> Tuple[Dict[str, np.ndarray], List[str], List[str]]:
+        """Compile and store a model, replacing the stale entries of the same name.
+
+        The entry is written to a temporary directory and renamed into place, so
+        readers never see a partial entry.
+
+        Args:
+            name (str): Name of the model.
+            key (str): Key of the model.
+            alphabet (Tuple[str]): Alphabet of objects used in the system.
+            rules (Dict): Mapping of (membrane_id, rule_type) to lists of Rule objects.
+            output (Union[Dict, None]): Output configuration.
+            root (Membrane): Initial membrane structure.
+
+        Returns:
+            Tuple: The stored structure as the arguments of `build_flat_membranes`.
+        """
+        symbols = {obj: i for i, obj in enumerate(dict.fromkeys(alphabet))}
+        arrays, id_table = flatten_membranes(root, symbols)
+        meta = {
+            'key': key,
+            'format': CACHE_FORMAT,
+            'version': self._version,
+            'symbols': list(symbols),
+            'membranes': id_table,
+            'rules': dump_rules(alphabet, rules, output),
+        }
+
+        os.makedirs(self._path, exist_ok=True)
+        path = self.entry_path(name, key)
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=self._path)
+        try:
+            for array, values in arrays.items():
+                np.save(os.path.join(tmp_path, f'{array}.npy'), values)
+            with open(os.path.join(tmp_path, META_FILE), 'w+', encoding='utf-8') as f:
+                json.dump(meta, f, separators=(',', ':'))
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+        self.prune(name, keep=path)
+        return arrays, meta['symbols'], id_table
+
+    def prune(self, name: str, keep: Union[str, None] = None):
+        """Remove the entries of a model except one.
+
+        Entries of the same files parsed with other options have another name
+        and are kept.
+
+        Args:
+            name (str): Name of the model.
+            keep (Union[str, None], optional): Entry directory to keep.
+        """
+        for entry in os.listdir(self._path):
+            path = os.path.join(self._path, entry)
+            if entry.rpartition(ENTRY_SEPARATOR)[0] == name and path != keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+class CachedParser:
+    """Parser that reads models from a `ModelCache` before parsing their files.
+
+    It wraps an XML or JSON parser and has the same interface, so it can be used
+    wherever the wrapped parser is. A miss parses the files with the wrapped
+    parser and stores the compiled model for the next launch.
+    """
+
+    def __init__(self, parser, cache: Union[ModelCache, None] = None):
+        """Initialize the parser.
+
+        Args:
+            parser: Wrapped parser, with `config`, `scene_path`, `rules_path`,
+                `load_scene` and `load_rules`.
+            cache (Union[ModelCache, None], optional): Cache to use. Defaults to a
+                cache in CACHE_PATH.
+        """
+        self._parser = parser
+        self._config = parser.config
+        self._cache = cache if cache is not None else ModelCache()
+        self._hit = None
+        self._compiled = None
+
+    @property
+    def config(self):
+        """Gets the configuration the files are parsed with."""
+        return self._config
+
+    @property
+    def scene_path(self) -> str:
+        """Gets the path of the scene file."""
+        return self._parser.scene_path
+
+    @property
+    def rules_path(self) -> str:
+        """Gets the path of the rules file."""
+        return self._parser.rules_path
+
+    @property
+    def hit(self) -> Union[bool, None]:
+        """Whether the last model was loaded from the cache, None before the first load."""
+        return self._hit
+
+    def load_scene(self) -> Membrane:
+        """Build the membrane structure described in the scene file."""
+        return self.load()[3]
+
+    def load_rules(self) -> Tuple[Tuple[str], Dict, Union[Dict, None]]:
+        """Build the alphabet, rules and output described in the rules file."""
+        return self.load()[:3]
+
+    def load(self) -> Tuple[Tuple[str], Dict, Union[Dict, None], Membrane]:
+        """Load the model from the cache, compiling it on a miss.
+
+        The compiled model is read once: `load_rules` and `load_scene` both take
+        it from the first load, as do later calls. Every call builds a new
+        membrane structure from the compiled arrays, so the systems built from
+        one parser never share their membranes.
+
+        Returns:
+            Tuple: Alphabet, rules, output and root membrane.
+        """
+        if self._compiled is None:
+            config = self._config
+            # Every option in the key is in the name, so an entry only replaces its stale versions
+            name = f'{config.scene}-{config.rules}-{config.format}-{config.replication}'
+            key = self._cache.key(self.scene_path, self.rules_path, config.format, config.replication)
+            compiled = self._cache.read(name, key)
+            self._hit = compiled is not None
+            if compiled is None:
+                alphabet, rules, output = self._parser.load_rules()
+                structure = self._cache.store(name, key, alphabet, rules, output, self._parser.load_scene())
+                compiled = alphabet, rules, output, structure
+            self._compiled = compiled
+        alphabet, rules, output, structure = self._compiled
+        return alphabet, rules, output, build_flat_membranes(*structure)
+
+    def parse(self) -> PSystem:
+        """Build a complete P-system, from the cache when possible.
+
+        Returns:
+            PSystem: object containing alphabet, rules, membrane structure,
+            output configuration, and inference settings.
+        """
+        alphabet, rules, output, membrane_root = self.load()
+        system = PSystem(alpha=alphabet,
+                         rules=rules,
+                         membranes=membrane_root,
+                         out=output,
+                         inference=self._config.inference)
+        return system
@@ -1,5 +1,7 @@
 from src.utils.config_parser import ConfigParser
 from src.utils.xml_parser import XMLInputParser
+from src.utils.json_parser import JSONInputParser
+from src.utils.model_cache import CachedParser
 
 class ParserFactory:
     """A factory for creating input parser instances.
@@ -25,12 +27,17 @@ class ParserFactory:
 
         Returns:
             An instance of a concrete parser capable of processing input files
-            of the specified format (e.g., an `XMLInputParser` instance).
+            of the specified format (e.g., an `XMLInputParser` instance). When the
+            `cache` option is enabled the parser is wrapped in a `CachedParser`.
 
         Raises:
             NotImplementedError: If the format specified in the `config` object
                 does not correspond to any available parser implementation.
         """
         if config.format == 'xml':
-            return XMLInputParser(config)
-        raise NotImplementedError(f'Format {config.format} not implemented.')
\ No newline at end of file
+            parser = XMLInputParser(config)
+        elif config.format == 'json':
+            parser = JSONInputParser(config)
+        else:
+            raise NotImplementedError(f'Format {config.format} not implemented.')
+        return CachedParser(parser) if config.cache else parser
\ No newline at end of file
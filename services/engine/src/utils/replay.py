@@ -0,0 +1,296 @@
+import re
+import json
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Tuple, Union
+
+from src.classes.membrane import Membrane
+
+"""
+Replay module for membrane computing simulations.
+
+This module records the evolution of the membrane structure as per-step
+deltas, with a full keyframe every K steps, and rebuilds the exact membrane
+tree at any recorded step by loading the nearest keyframe and applying the
+deltas that follow it.
+
+The replay file is a JSON lines file. Every line starts with its type
+(``k`` for keyframes, ``d`` for deltas) and its step, so the file can be
+indexed without decoding the lines.
+"""
+
+KEYFRAME = 'k'
+DELTA = 'd'
+LINE_HEADER = re.compile(rb'^\{"t":"([kd])","step":(\d+)')
+
+# Node layout: (id, multiplicity, capacity, objects, children handles)
+NODE_ID, NODE_MUL, NODE_CAP, NODE_OBJECTS, NODE_CHILDREN = range(5)
+
+
+def capture_state(root: Membrane) -> Dict[int, Tuple]:
+    """Take a plain snapshot of a membrane structure.
+
+    Args:
+        root (Membrane): Root of the structure. Membranes must have handles.
+
+    Returns:
+        Dict[int, Tuple]: Node of every membrane keyed by its handle.
+    """
+    state = dict()
+    pending = [root]
+    while pending:
+        membrane = pending.pop()
+        children = membrane.children
+        state[membrane.handle] = (membrane.id,
+                                  membrane.multiplicity,
+                                  membrane.capacity,
+                                  dict(membrane.objects.multiset),
+                                  [child.handle for child in children])
+        pending.extend(children)
+    return state
+
+
+def build_membranes(state: Dict[int, Tuple], root: int) -> Membrane:
+    """Build a membrane structure from a snapshot.
+
+    Args:
+        state (Dict[int, Tuple]): Node of every membrane keyed by its handle.
+        root (int): Handle of the root membrane.
+
+    Returns:
+        Membrane: Root of the rebuilt structure.
+    """
+    def new_membrane(handle, parent):
+        idx, multiplicity, capacity, objects, _ = state[handle]
+        membrane = Membrane(idx=idx, multiplicity=multiplicity, capacity=capacity, parent=parent)
+        membrane.handle = handle
+        for obj, m in objects.items():
+            membrane.objects.add_object(obj, m)
+        return membrane
+
+    membrane_root = new_membrane(root, None)
+    pending = [membrane_root]
+    while pending:
+        membrane = pending.pop()
+        children = [new_membrane(handle, membrane) for handle in state[membrane.handle][NODE_CHILDREN]]
+        membrane.add_children(children)
+        pending.extend(children)
+    return membrane_root
+
+
+class ReplayRecorder:
+    """Records per-step deltas of a membrane structure with periodic keyframes.
+
+    Attributes:
+        keyframe_interval (int): Number of steps between two keyframes.
+    """
+
+    def __init__(self, keyframe_interval: int):
+        """Initialize the recorder.
+
+        Args:
+            keyframe_interval (int): Number of steps between two keyframes.
+
+        Raises:
+            ValueError: If the interval is not a positive number.
+        """
+        if keyframe_interval is None or keyframe_interval < 1:
+            raise ValueError(f'The keyframe interval must be a positive number, got {keyframe_interval}')
+        self._interval = keyframe_interval
+        self._previous = None
+        self._last_step = None
+
+    @property
+    def keyframe_interval(self) -> int:
+        """Gets the number of steps between two keyframes."""
+        return self._interval
+
+    @property
+    def last_step(self) -> Union[int, None]:
+        """Gets the last recorded step, None if nothing was recorded yet."""
+        return self._last_step
+
+    def record(self, step: int, root: Membrane) -> bytes:
+        """Record the state of a structure after a step.
+
+        Args:
+            step (int): Step that has just finished.
+            root (Membrane): Root of the structure.
+
+        Returns:
+            bytes: Serialized line to append to the replay file.
+        """
+        state = capture_state(root)
+        if self._previous is None or step % self._interval == 0:
+            line = {'t': KEYFRAME, 'step': step, 'root': root.handle, 'nodes': state}
+        else:
+            line = {'t': DELTA, 'step': step, **self.__delta(self._previous, state)}
+        self._previous = state
+        self._last_step = step
+        return (json.dumps(line, separators=(',', ':')) + '\n').encode('utf-8')
+
+    @staticmethod
+    def __delta(previous: Dict[int, Tuple], state: Dict[int, Tuple]) -> Dict:
+        """Compute the changes between two snapshots.
+
+        Returns:
+            Dict: Added and removed membranes, changed object counts (0 means the
+                object is gone) and changed children lists.
+        """
+        added, objects, children = dict(), dict(), dict()
+        for handle, node in state.items():
+            old = previous.get(handle, None)
+            if old is None:
+                added[handle] = node[:NODE_OBJECTS]
+                objects[handle] = node[NODE_OBJECTS]
+                children[handle] = node[NODE_CHILDREN]
+                continue
+            old_objects, new_objects = old[NODE_OBJECTS], node[NODE_OBJECTS]
+            if old_objects != new_objects:
+                objects[handle] = {obj: new_objects.get(obj, 0)
+                                   for obj in old_objects.keys() | new_objects.keys()
+                                   if old_objects.get(obj, 0) != new_objects.get(obj, 0)}
+            if old[NODE_CHILDREN] != node[NODE_CHILDREN]:
+                children[handle] = node[NODE_CHILDREN]
+        removed = [handle for handle in previous if handle not in state]
+        return {'added': added, 'removed': removed, 'objects': objects, 'children': children}
+
+
+class Replay:
+    """Random access to the states recorded in a replay file.
+
+    Seeking to a step loads the nearest keyframe at or before it and applies the
+    deltas up to the step. The last rebuilt state is kept, so moving forward
+    step by step only applies one delta each time.
+
+    Attributes:
+        steps (List[int]): Recorded steps in increasing order.
+        keyframes (List[int]): Steps that have a keyframe.
+    """
+
+    def __init__(self, path: str):
+        """Index a replay file.
+
+        Args:
+            path (str): Path of the replay file.
+        """
+        self._path = path
+        self._offsets = dict()
+        self._steps = []
+        self._keyframes = []
+        self._root = None
+        self._cached = None
+        self.reload()
+
+    def reload(self):
+        """Index the replay file again, picking up the steps appended since."""
+        self._offsets.clear()
+        self._steps.clear()
+        self._keyframes.clear()
+        self._cached = None
+        with open(self._path, 'rb') as f:
+            offset = 0
+            for line in f:
+                header = LINE_HEADER.match(line)
+                if header is None:
+                    raise ValueError(f'Malformed replay line at byte {offset} of {self._path}')
+                kind, step = header.group(1).decode(), int(header.group(2))
+                if kind == KEYFRAME:
+                    self._keyframes.append(step)
+                self._offsets[step] = offset
+                self._steps.append(step)
+                offset += len(line)
+
+    @property
+    def steps(self) -> List[int]:
+        """Gets the recorded steps in increasing order."""
+        return list(self._steps)
+
+    @property
+    def keyframes(self) -> List[int]:
+        """Gets the steps that have a keyframe."""
+        return list(self._keyframes)
+
+    def __read(self, f, step: int) -> Dict:
+        f.seek(self._offsets[step])
+        return json.loads(f.readline())
+
+    def state_at(self, step: int) -> Dict[int, Tuple]:
+        """Rebuild the plain snapshot of the structure at a step.
+
+        Args:
+            step (int): Recorded step to rebuild.
+
+        Returns:
+            Dict[int, Tuple]: Node of every membrane keyed by its handle.
+
+        Raises:
+            KeyError: If the step was not recorded.
+        """
+        if step not in self._offsets:
+            raise KeyError(f'Step {step} is not recorded in {self._path}')
+        position = bisect_right(self._keyframes, step) - 1
+        if position < 0:
+            raise KeyError(f'There is no keyframe before step {step} in {self._path}')
+        keyframe = self._keyframes[position]
+
+        with open(self._path, 'rb') as f:
+            if self._cached is not None and keyframe <= self._cached[0] <= step:
+                current, state = self._cached
+                # Copy the nodes that deltas modify in place
+                state = {handle: (*node[:NODE_OBJECTS], dict(node[NODE_OBJECTS]), list(node[NODE_CHILDREN]))
+                         for handle, node in state.items()}
+            else:
+                line = self.__read(f, keyframe)
+                current, self._root = keyframe, line['root']
+                state = {int(handle): tuple(node) for handle, node in line['nodes'].items()}
+
+            first, last = bisect_right(self._steps, current), bisect_right(self._steps, step)
+            for delta_step in self._steps[first:last]:
+                self.__apply_delta(state, self.__read(f, delta_step))
+        self._cached = (step, state)
+        return state
+
+    def membranes_at(self, step: int) -> Membrane:
+        """Rebuild the membrane structure at a step.
+
+        Args:
+            step (int): Recorded step to rebuild.
+
+        Returns:
+            Membrane: Root of the structure as it was after the step.
+        """
+        state = self.state_at(step)
+        return build_membranes(state, self._root)
+
+    def iter_membranes(self, start: Union[int, None] = None, stop: Union[int, None] = None) -> Iterator[Tuple[int, Membrane]]:
+        """Iterate over the recorded structures of a range of steps.
+
+        Args:
+            start (Union[int, None]): First step included. Defaults to the first one.
+            stop (Union[int, None]): Last step included. Defaults to the last one.
+
+        Yields:
+            Tuple[int, Membrane]: Step and root of the structure after the step.
+        """
+        first = 0 if start is None else bisect_left(self._steps, start)
+        last = len(self._steps) if stop is None else bisect_right(self._steps, stop)
+        for step in self._steps[first:last]:
+            yield step, self.membranes_at(step)
+
+    @staticmethod
+    def __apply_delta(state: Dict[int, Tuple], delta: Dict):
+        for handle, node in delta['added'].items():
+            state[int(handle)] = (*node, dict(), list())
+        for handle in delta['removed']:
+            state.pop(handle, None)
+        for handle, changes in delta['objects'].items():
+            objects = state[int(handle)][NODE_OBJECTS]
+            for obj, count in changes.items():
+                if count == 0:
+                    objects.pop(obj, None)
+                else:
+                    objects[obj] = count
+        for handle, children in delta['children'].items():
+            node = state[int(handle)]
+            state[int(handle)] = (*node[:NODE_CHILDREN], children)
@@ -0,0 +1,142 @@
+import numpy as np
+
+from typing import List, Tuple
+
+from src.classes.membrane import Membrane
+from src.enums.constants import Replication
+
+"""
+Membrane replication module for scene files.
+
+Scenes can describe a population with a single replicated membrane instead of
+spelling out every copy:
+
+    <membrane id="h1" m="1" capacity="1000" count="20000" seed="7">
+        <BO v="home1" m="1"/>
+        <BO v="move" m="1"/>
+        <BO v="v1" m="1" pb="0.01"/>
+        <BO v="age" m="18" mmax="90"/>
+    </membrane>
+
+Objects directly inside a replicated membrane may vary between copies: with
+``pb`` the object is present in each copy with that probability, and with
+``mmax`` its multiplicity is drawn uniformly between ``m`` and ``mmax``.
+Variations are drawn for all the copies at once from a generator seeded with
+the ``seed`` attribute (0 by default) and the position of the replicated
+membrane in the file, so a scene always expands to the same structure and the
+simulation random state is not touched.
+"""
+
+DEFAULT_SEED = 0
+
+# Variation layout: (object, multiplicity, maximum multiplicity, probability)
+Variation = Tuple[str, int, int, float]
+
+
+def variation(obj: str, multiplicity: int, maximum: int | None = None, probability: float | None = None) -> Variation:
+    """Validate the variation of an object between copies.
+
+    Args:
+        obj (str): Object that varies.
+        multiplicity (int): Multiplicity, or minimum multiplicity if a maximum is given.
+        maximum (int | None, optional): Maximum multiplicity. Defaults to the multiplicity.
+        probability (float | None, optional): Probability of the object being present
+            in a copy. Defaults to 1.
+
+    Returns:
+        Variation: Validated variation.
+
+    Raises:
+        ValueError: If the multiplicities or the probability are out of range.
+    """
+    maximum = multiplicity if maximum is None else maximum
+    probability = 1.0 if probability is None else probability
+    if multiplicity < 0 or maximum < multiplicity:
+        raise ValueError(f'Invalid multiplicity range [{multiplicity}, {maximum}] for object "{obj}"')
+    if not 0.0 <= probability <= 1.0:
+        raise ValueError(f'Invalid probability {probability} for object "{obj}"')
+    return obj, multiplicity, maximum, probability
+
+
+class Replicator:
+    """Expands replicated membranes of a scene in bulk.
+
+    A replicator is created for every scene that is read, so the position of each
+    replicated membrane, used to seed its variations, starts from 0.
+
+    Attributes:
+        mode (str): ``Replication.EXPAND`` or ``Replication.COMPRESS``.
+    """
+
+    def __init__(self, mode: str = Replication.EXPAND):
+        """Initialize the replicator.
+
+        Args:
+            mode (str, optional): How copies are built. Defaults to Replication.EXPAND.
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in (Replication.EXPAND, Replication.COMPRESS):
+            raise ValueError(f'Unknown replication mode "{mode}"')
+        self._mode = mode
+        self._position = 0
+
+    @property
+    def mode(self) -> str:
+        """Gets how copies are built."""
+        return self._mode
+
+    def replicate(self, template: Membrane, count: int, variations: List[Variation], seed: int | None = None) -> List[Membrane]:
+        """Build the copies of a replicated membrane.
+
+        In expand mode every copy is a separate membrane. In compress mode copies
+        that end up identical are merged into one membrane whose multiplicity is
+        multiplied by the number of copies, so a population without variations is
+        kept as a single membrane.
+
+        Args:
+            template (Membrane): Membrane to replicate, with its descendants and
+                without the varying objects.
+            count (int): Number of copies.
+            variations (List[Variation]): Objects that vary between copies.
+            seed (int | None, optional): Seed of the variations. Defaults to 0.
+
+        Returns:
+            List[Membrane]: Copies without parent, in a deterministic order.
+
+        Raises:
+            ValueError: If the count is negative.
+        """
+        if count < 0:
+            raise ValueError(f'The count of membrane "{template.id}" cannot be negative')
+        rng = np.random.default_rng([DEFAULT_SEED if seed is None else seed, self._position])
+        self._position += 1
+        if count == 0:
+            return []
+        if not variations:
+            if self._mode == Replication.COMPRESS:
+                return [template.copy(multiplicity=template.multiplicity * count)]
+            return [template.copy() for _ in range(count)]
+
+        objects = [obj for obj, _, _, _ in variations]
+        values = np.empty((count, len(variations)), dtype=np.int64)
+        for i, (_, low, high, probability) in enumerate(variations):
+            column = rng.integers(low, high + 1, size=count) if high > low else np.full(count, low)
+            if probability < 1.0:
+                column = column * (rng.random(count) < probability)
+            values[:, i] = column
+
+        if self._mode == Replication.COMPRESS:
+            values, counts = np.unique(values, axis=0, return_counts=True)
+            multiplicities = (counts * template.multiplicity).tolist()
+        else:
+            multiplicities = [template.multiplicity] * count
+
+        copies = []
+        for row, multiplicity in zip(values.tolist(), multiplicities):
+            membrane = template.copy(multiplicity=multiplicity)
+            for obj, value in zip(objects, row):
+                membrane.objects.add_object(obj, value)
+            copies.append(membrane)
+        return copies
@@ -0,0 +1,132 @@
+import csv
+import numpy as np
+
+from typing import Dict, List, Tuple, Union
+
+"""
+Results table module for simulation outputs.
+
+The run output CSV is in long format, one ``step,object,count`` row per step
+and output object, which a plotting client has to filter or pivot once per
+object. This module keeps the same counts as a step-indexed wide table with a
+typed NumPy column per object:
+
+- `ResultsFrame` is built incrementally from the counts of every logged step,
+  so a caller following a running engine never reshapes anything.
+- The engine can write the same table as a wide CSV, ``step,<object>,...``
+  with one row per logged step, and `ResultsFrame.read_csv` loads it (or a long
+  output CSV, pivoted once) straight into columns.
+"""
+
+STEP = 'step'
+
+
+def wide_header(objects: List[str]) -> bytes:
+    """Header of a wide results CSV."""
+    return (','.join((STEP, *objects)) + '\n').encode('utf-8')
+
+
+def wide_row(step: int, counts: List[Tuple[str, int]]) -> bytes:
+    """Row of a wide results CSV with the ``(object, count)`` pairs of a step."""
+    return (','.join([str(step)] + [str(count) for _, count in counts]) + '\n').encode('utf-8')
+
+
+class ResultsFrame:
+    """Output counts of a run, one row per logged step and one column per object.
+
+    Columns are NumPy ``int64`` arrays grown by doubling, so appending a step is
+    amortized constant time and reading a column returns a view without copies.
+
+    Attributes:
+        objects (List[str]): Output objects, in the order of the columns.
+    """
+
+    def __init__(self, objects: List[str], capacity: int = 1024):
+        """Initialize an empty table.
+
+        Args:
+            objects (List[str]): Output objects.
+            capacity (int, optional): Initial number of rows.
+        """
+        self.objects = list(objects)
+        self._index = {obj: i for i, obj in enumerate(self.objects)}
+        self._steps = np.empty(max(capacity, 1), dtype=np.int64)
+        self._counts = np.empty((max(capacity, 1), len(self.objects)), dtype=np.int64)
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def steps(self) -> np.ndarray:
+        """Logged steps, in increasing order."""
+        return self._steps[:self._rows]
+
+    @property
+    def last_step(self) -> Union[int, None]:
+        return int(self._steps[self._rows - 1]) if self._rows else None
+
+    def column(self, obj: str) -> np.ndarray:
+        """Counts of an object at every logged step."""
+        return self._counts[:self._rows, self._index[obj]]
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Counts of every object, keyed by object."""
+        return {obj: self.column(obj) for obj in self.objects}
+
+    def append(self, step: int, counts: List[Tuple[str, int]]):
+        """Add the ``(object, count)`` pairs of a step, in the order of the objects.
+
+        Usable as the step listener of an engine (see `PSystem.set_step_listener`).
+        """
+        if self._rows == len(self._steps):
+            self._steps = np.resize(self._steps, 2 * self._rows)
+            self._counts = np.resize(self._counts, (2 * self._rows, len(self.objects)))
+        self._steps[self._rows] = step
+        self._counts[self._rows] = [count for _, count in counts]
+        self._rows += 1
+
+    def window(self, first: int, last: int) -> slice:
+        """Rows of the steps between ``first`` and ``last``, both included."""
+        steps = self.steps
+        return slice(int(np.searchsorted(steps, first, side='left')), int(np.searchsorted(steps, last, side='right')))
+
+    @classmethod
+    def read_csv(cls, path: str) -> 'ResultsFrame':
+        """Load a wide results CSV, or a long output CSV pivoted in one pass.
+
+        Args:
+            path (str): CSV with a ``step,<object>,...`` header, or the
+                ``step,object,count`` output of a run.
+
+        Returns:
+            ResultsFrame: Table with the counts of the file.
+        """
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            if header == [STEP, 'object', 'count']:
+                return cls.__from_long(reader)
+            frame = cls(header[1:])
+            rows = np.array([[int(value) for value in row] for row in reader if row], dtype=np.int64)
+        if len(rows):
+            frame._steps = rows[:, 0].copy()
+            frame._counts = rows[:, 1:].copy()
+            frame._rows = len(rows)
+        return frame
+
+    @classmethod
+    def __from_long(cls, reader) -> 'ResultsFrame':
+        objects, rows = [], dict()
+        for step, obj, count in reader:
+            if obj not in rows:
+                objects.append(obj)
+                rows[obj] = []
+            rows[obj].append((int(step), int(count)))
+        frame = cls(objects, capacity=max((len(values) for values in rows.values()), default=1))
+        if objects:
+            frame._rows = len(rows[objects[0]])
+            frame._steps[:frame._rows] = [step for step, _ in rows[objects[0]]]
+            for i, obj in enumerate(objects):
+                frame._counts[:frame._rows, i] = [count for _, count in rows[obj]]
+        return frame
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import numpy as np
+
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+from src.utils.aux import RUNS_PATH
+from src.utils.results import ResultsFrame
+
+"""
+Results store module for queries across runs.
+
+The output CSV of a run has no record of the scene, rules, seed or inference
+mode it was run with. The results store is a SQLite database, by default
+``runs/results.sqlite3``, with the metadata of every recorded run and its
+output counts in indexed tables, so cross-run questions are answered by one
+indexed query instead of parsing CSV files:
+
+    with ResultsStore() as store:
+        # Mean v1symptoms at step 200 of the maxpar runs of rules_01 with seeds 1..100
+        store.mean_at('v1symptoms', 200, rules='rules_01', inference='maxpar', seed=(1, 100))
+
+Runs are recorded from a `ResultsFrame` in a single transaction. Query filters
+are run fields: a value matches it, a list matches any of its values and a
+``(low, high)`` tuple matches the range between both, included.
+"""
+
+STORE_FILE = 'results.sqlite3'
+STORE_PATH = os.path.join(RUNS_PATH, STORE_FILE)
+# Run metadata recorded and accepted as query filters
+RUN_FIELDS = ('scene', 'rules', 'format', 'inference', 'seed', 'max_steps', 'selection', 'shards',
+              'steps', 'seconds', 'created')
+# Seconds to wait for another process writing to the store
+BUSY_TIMEOUT_S = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    scene TEXT,
+    rules TEXT,
+    format TEXT,
+    inference TEXT,
+    seed INTEGER,
+    max_steps INTEGER,
+    selection TEXT,
+    shards INTEGER,
+    steps INTEGER,
+    seconds REAL,
+    created TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_model ON runs (rules, scene, inference, seed);
+CREATE TABLE IF NOT EXISTS objects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS counts (
+    run INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    object INTEGER NOT NULL REFERENCES objects (id),
+    step INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (run, object, step)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_by_step ON counts (object, step, run, count);
+"""
+
+
+def config_metadata(config) -> Dict:
+    """Run fields of a configuration.
+
+    Args:
+        config (ConfigParser): Configuration of the run.
+
+    Returns:
+        Dict: The configuration values of RUN_FIELDS.
+    """
+    return {'scene': config.scene, 'rules': config.rules, 'format': config.format, 'inference': config.inference,
+            'seed': config.seed, 'max_steps': config.max_steps, 'selection': config.selection,
+            'shards': config.shards or 0}
+
+
+def record_run(config, name: str, frame: ResultsFrame, steps: Union[int, None] = None,
+               seconds: Union[float, None] = None, path: str = STORE_PATH) -> int:
+    """Record a run configured by a configuration file.
+
+    Args:
+        config (ConfigParser): Configuration of the run.
+        name (str): Name of the run, the directory of its files.
+        frame (ResultsFrame): Output counts of the run.
+        steps (Union[int, None], optional): Steps run, the last step of the
+            frame if not given.
+        seconds (Union[float, None], optional): Duration of the run.
+        path (str, optional): Path of the database. Defaults to STORE_PATH.
+
+    Returns:
+        int: Id of the run in the store.
+    """
+    metadata = config_metadata(config)
+    if steps is not None:
+        metadata['steps'] = steps
+    if seconds is not None:
+        metadata['seconds'] = seconds
+    with ResultsStore(path) as store:
+        return store.record(name, frame, **metadata)
+
+
+class ResultsStore:
+    """Runs and output counts in a SQLite database.
+
+    A store is a connection to the database and must be used in the thread
+    that opened it. Every process or thread recording runs opens its own.
+
+    Attributes:
+        path (str): Path of the database.
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        """Open the database, creating its tables if needed.
+
+        Args:
+            path (str, optional): Path of the database. Defaults to STORE_PATH.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        with self._connection:
+            self._connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        self._connection.close()
+
+    def record(self, name: str, frame: ResultsFrame, **metadata) -> int:
+        """Record a run, replacing any run with the same name.
+
+        Args:
+            name (str): Name of the run, the directory of its files.
+            frame (ResultsFrame): Output counts of the run.
+            **metadata: Run fields of RUN_FIELDS. ``steps`` defaults to the
+                last step of the frame and ``created`` to now.
+
+        Returns:
+            int: Id of the run in the store.
+
+        Raises:
+            ValueError: If a field is not in RUN_FIELDS.
+        """
+        unknown = set(metadata) - set(RUN_FIELDS)
+        if unknown:
+            raise ValueError(f'Unknown run fields: {", ".join(sorted(unknown))}')
+        metadata.setdefault('steps', frame.last_step)
+        metadata.setdefault('created', datetime.now().isoformat(timespec='seconds'))
+        fields = ['name', *metadata]
+        steps = frame.steps.tolist()
+        with self._connection:
+            self._connection.execute('DELETE FROM runs WHERE name = ?', (name,))
+            run = self._connection.execute(
+                f'INSERT INTO runs ({", ".join(fields)}) VALUES ({", ".join("?" * len(fields))})',
+                (name, *metadata.values())).lastrowid
+            for obj, counts in frame.columns().items():
+                self._connection.executemany('INSERT INTO counts VALUES (?, ?, ?, ?)',
+                                             zip([run] * len(steps), [self.__object_id(obj)] * len(steps),
+                                                 steps, counts.tolist()))
+        return run
+
+    def import_csv(self, path: str, **metadata) -> int:
+        """Record the output CSV of a run, wide or long.
+
+        Args:
+            path (str): Output CSV. The name of the run is the name of its
+                directory.
+            **metadata: Run fields of RUN_FIELDS.
+
+        Returns:
+            int: Id of the run in the store.
+        """
+        name = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        return self.record(name, ResultsFrame.read_csv(path), **metadata)
+
+    def runs(self, **filters) -> List[Dict]:
+        """Recorded runs matching the filters, in recording order."""
+        where, parameters = self.__where(filters)
+        rows = self._connection.execute(f'SELECT * FROM runs {where} ORDER BY id', parameters)
+        return [dict(row) for row in rows]
+
+    def delete(self, name: str):
+        with self._connection:
+            self._connection.execute('DELETE FROM runs WHERE name = ?', (name,))
+
+    def counts_at(self, obj: str, step: int, **filters) -> Dict[str, int]:
+        """Count of an object at a step of every matching run.
+
+        Returns:
+            Dict[str, int]: Count keyed by run name, for the runs that logged the step.
+        """
+        where, parameters = self.__where(filters, prefix='AND')
+        rows = self._connection.execute(
+            'SELECT runs.name, counts.count FROM counts JOIN runs ON runs.id = counts.run '
+            f'WHERE counts.object = (SELECT id FROM objects WHERE name = ?) AND counts.step = ? {where} '
+            'ORDER BY runs.id', (obj, step, *parameters))
+        return {name: count for name, count in rows}
+
+    def stats_at(self, obj: str, step: int, **filters) -> Dict[str, Union[float, None]]:
+        """Number of runs, mean, minimum and maximum count of an object at a step."""
+        where, parameters = self.__where(filters, prefix='AND')
+        row = self._connection.execute(
+            'SELECT COUNT(*), AVG(counts.count), MIN(counts.count), MAX(counts.count) '
+            'FROM counts JOIN runs ON runs.id = counts.run '
+            f'WHERE counts.object = (SELECT id FROM objects WHERE name = ?) AND counts.step = ? {where}',
+            (obj, step, *parameters)).fetchone()
+        return {'runs': row[0], 'mean': row[1], 'min': row[2], 'max': row[3]}
+
+    def mean_at(self, obj: str, step: int, **filters) -> Union[float, None]:
+        """Mean count of an object at a step over the matching runs, None if none logged it."""
+        return self.stats_at(obj, step, **filters)['mean']
+
+    def trajectory(self, name: str, obj: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Steps and counts of an object in a run."""
+        rows = self._connection.execute(
+            'SELECT counts.step, counts.count FROM counts JOIN runs ON runs.id = counts.run '
+            'WHERE runs.name = ? AND counts.object = (SELECT id FROM objects WHERE name = ?) '
+            'ORDER BY counts.step', (name, obj)).fetchall()
+        values = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        return values[:, 0], values[:, 1]
+
+    def mean_trajectory(self, obj: str, **filters) -> Tuple[np.ndarray, np.ndarray]:
+        """Steps and mean count of an object over the matching runs."""
+        where, parameters = self.__where(filters, prefix='AND')
+        rows = self._connection.execute(
+            'SELECT counts.step, AVG(counts.count) FROM counts JOIN runs ON runs.id = counts.run '
+            f'WHERE counts.object = (SELECT id FROM objects WHERE name = ?) {where} '
+            'GROUP BY counts.step ORDER BY counts.step', (obj, *parameters)).fetchall()
+        values = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return values[:, 0].astype(np.int64), values[:, 1]
+
+    def __object_id(self, obj: str) -> int:
+        self._connection.execute('INSERT OR IGNORE INTO objects (name) VALUES (?)', (obj,))
+        return self._connection.execute('SELECT id FROM objects WHERE name = ?', (obj,)).fetchone()[0]
+
+    @staticmethod
+    def __where(filters: Dict, prefix: str = 'WHERE') -> Tuple[str, List]:
+        """SQL condition and parameters of run filters.
+
+        Raises:
+            ValueError: If a filter is not in RUN_FIELDS.
+        """
+        conditions, parameters = [], []
+        for field, value in filters.items():
+            if field not in RUN_FIELDS:
+                raise ValueError(f'Unknown run field "{field}", expected one of {", ".join(RUN_FIELDS)}')
+            if isinstance(value, tuple):
+                low, high = value
+                conditions.append(f'runs.{field} BETWEEN ? AND ?')
+                parameters.extend((low, high))
+            elif isinstance(value, list):
+                conditions.append(f'runs.{field} IN ({", ".join("?" * len(value))})')
+                parameters.extend(value)
+            elif value is None:
+                conditions.append(f'runs.{field} IS NULL')
+            else:
+                conditions.append(f'runs.{field} = ?')
+                parameters.append(value)
+        if not conditions:
+            return '', parameters
+        return f'{prefix} ' + ' AND '.join(conditions), parameters
@@ -0,0 +1,185 @@
+import copy
+
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+"""
+Rule execution statistics module for membrane computing systems.
+
+This module counts, for every rule of a system, how many times it is checked
+against a membrane, found applicable, rejected by its probability draw and
+applied, so the rules that dominate the runtime and the ones that never fire
+can be told apart.
+"""
+
+COUNTERS = ('checked', 'applicable', 'rejected', 'applied')
+SUMMARY_HEADER = 'membrane,rule,move,' + ','.join(COUNTERS) + '\n'
+STEP_HEADER = 'step,membrane,rule,' + ','.join(COUNTERS) + '\n'
+
+
+class RuleStats:
+    """Per-rule execution counters keyed by (membrane id, rule idx).
+
+    Counters are kept in plain lists indexed by the position of the rule in the
+    rule table of the system, and rules are found by identity, so counting is a
+    dictionary lookup and an integer increment.
+
+    - ``checked``: the rule was evaluated against a membrane (or, for membrane
+      rules, against a child membrane).
+    - ``applicable``: the membrane had the objects of its left-hand side and no
+      rule with priority over it was applicable.
+    - ``rejected``: the rule was applicable but its probability draw did not
+      select it. In minimal parallelism every applicable rule not chosen by the
+      draw of its membrane is rejected. In maximal parallelism a rule can be
+      drawn several times in a step, and every failed draw counts.
+    - ``applied``: number of applications, counting multiplicities.
+
+    Attributes:
+        rules (List[Tuple[str, Rule]]): Rule table as ``(membrane id, rule)`` pairs.
+    """
+
+    def __init__(self, rules: List[Tuple]):
+        """Initialize every counter to zero.
+
+        Args:
+            rules (List[Tuple]): Rule table as ``(membrane id, rule)`` pairs.
+        """
+        self._rules = rules
+        self._slots = {id(rule): i for i, (_, rule) in enumerate(rules)}
+        self.checked = [0] * len(rules)
+        self.applicable = [0] * len(rules)
+        self.rejected = [0] * len(rules)
+        self.applied = [0] * len(rules)
+        self._last = self.__snapshot()
+
+    @property
+    def rules(self) -> List[Tuple]:
+        """Gets the rule table."""
+        return self._rules
+
+    def slot(self, rule) -> int:
+        """Position of a rule in the counters."""
+        return self._slots[id(rule)]
+
+    def count_checks(self, obj_rules: List, mem_rules: List, children: List, applicable: List):
+        """Count the rules checked against a membrane and the applicable ones.
+
+        Args:
+            obj_rules (List[Rule]): Object rules of the membrane.
+            mem_rules (List[Rule]): Membrane rules of the membrane, each one
+                checked against the children it targets.
+            children (List[Membrane]): Children of the membrane.
+            applicable (List[Tuple]): Applicable rules, as returned by
+                `PSystem.applicable_rules`.
+        """
+        slots = self._slots
+        for rule in obj_rules:
+            self.checked[slots[id(rule)]] += 1
+        if mem_rules:
+            targets = Counter(child.id for child in children)
+            for rule in mem_rules:
+                self.checked[slots[id(rule)]] += targets[rule.mem_idx]
+        for data in applicable:
+            self.applicable[slots[id(data[-1])]] += 1
+
+    def count_rejections(self, applicable: List, selected: int):
+        """Count the applicable rules a minimal parallelism draw did not select.
+
+        Args:
+            applicable (List[Tuple]): Applicable rules of the membrane.
+            selected (int): Index of the selected rule, -1 when none was.
+        """
+        slots = self._slots
+        for i, data in enumerate(applicable):
+            if i != selected:
+                self.rejected[slots[id(data[-1])]] += 1
+
+    def count_applications(self, to_apply: List[Tuple]):
+        """Count the applications of a step.
+
+        Args:
+            to_apply (List[Tuple]): ``(membrane, rule data, multiplicity)`` of
+                every rule to apply.
+        """
+        slots = self._slots
+        for _, data, multiplicity in to_apply:
+            self.applied[slots[id(data[-1])]] += multiplicity
+
+    def block(self) -> 'RuleStats':
+        """Zeroed counters on the same rule table, for a block selected apart.
+
+        Returns:
+            RuleStats: Counters whose values are added back with `merge`.
+        """
+        block = copy.copy(self)
+        block.checked, block.applicable, block.rejected, block.applied = ([0] * len(self._rules) for _ in COUNTERS)
+        return block
+
+    def counters(self) -> Tuple[List[int], List[int], List[int], List[int]]:
+        """Counter lists in the order of COUNTERS, indexed by slot."""
+        return self.checked, self.applicable, self.rejected, self.applied
+
+    def merge(self, counters: Tuple[List[int], ...]):
+        """Add the counters of a block, as returned by `counters`."""
+        for mine, theirs in zip(self.counters(), counters):
+            for slot, value in enumerate(theirs):
+                if value:
+                    mine[slot] += value
+
+    def __snapshot(self) -> List[Tuple[int, int, int, int]]:
+        return list(zip(self.checked, self.applicable, self.rejected, self.applied))
+
+    def key(self, slot: int) -> Tuple[str, object]:
+        """(membrane id, rule idx) of a slot."""
+        mem_id, rule = self._rules[slot]
+        return mem_id, rule.idx
+
+    def totals(self) -> Dict[Tuple[str, object], Dict[str, int]]:
+        """Counters of every rule.
+
+        Returns:
+            Dict[Tuple[str, object], Dict[str, int]]: Counters keyed by (membrane id, rule idx).
+        """
+        return {self.key(slot): dict(zip(COUNTERS, values)) for slot, values in enumerate(self.__snapshot())}
+
+    def step_rows(self, step: int) -> bytes:
+        """Counters changed since the previous call, as CSV rows.
+
+        Args:
+            step (int): Step the changes belong to.
+
+        Returns:
+            bytes: One ``step,membrane,rule,checked,applicable,rejected,applied``
+                row per rule whose counters changed, with the increments of the step.
+        """
+        current = self.__snapshot()
+        rows = []
+        for slot, (now, before) in enumerate(zip(current, self._last)):
+            if now != before:
+                mem_id, idx = self.key(slot)
+                rows.append(f'{step},{mem_id},{idx},' + ','.join(str(a - b) for a, b in zip(now, before)) + '\n')
+        self._last = current
+        return ''.join(rows).encode('utf-8')
+
+    def summary_csv(self) -> bytes:
+        """Counters of every rule as a CSV file."""
+        rows = [SUMMARY_HEADER]
+        for slot, values in enumerate(self.__snapshot()):
+            mem_id, rule = self._rules[slot]
+            rows.append(f'{mem_id},{rule.idx},{rule.move},' + ','.join(map(str, values)) + '\n')
+        return ''.join(rows).encode('utf-8')
+
+    def summary_lines(self) -> Iterator[str]:
+        """Summary table of the counters, rules sorted by times checked.
+
+        Yields:
+            str: Header and one line per rule. Rules that were never applied are
+                marked as unused.
+        """
+        yield f'{"membrane":>10} {"rule":>6} {"move":>10} ' + ' '.join(f'{c:>11}' for c in COUNTERS)
+        order = sorted(range(len(self._rules)), key=lambda slot: -self.checked[slot])
+        for slot in order:
+            mem_id, rule = self._rules[slot]
+            values = (self.checked[slot], self.applicable[slot], self.rejected[slot], self.applied[slot])
+            line = f'{mem_id:>10} {str(rule.idx):>6} {rule.move:>10} ' + ' '.join(f'{v:>11}' for v in values)
+            yield line + ('  (unused)' if values[-1] == 0 else '')
@@ -0,0 +1,383 @@
+import random
+import numpy as np
+
+from typing import Dict, List, Tuple
+
+from src.classes.membrane import Membrane
+from src.classes.rule import Rule
+from src.enums.constants import InferenceType, MoveCode, SceneObject
+
+"""
+Rule selection module for membrane computing systems.
+
+This module holds the selection phase of a step: finding the applicable rules
+of a membrane and choosing the ones to apply in minimal or maximal parallelism.
+Selection only reads the membranes, so the functions work on any object with
+the ``id``, ``objects`` and ``children`` of a `Membrane`, and draw their random
+numbers from a random source given by the caller:
+
+- `LegacyRandom` draws from the global `random` and `numpy.random` states, as
+  the serial engine always has, so seeded runs keep their results.
+- `StreamRandom` draws from its own `numpy.random.Generator`. Selection backends
+  give every block of membranes its own stream, seeded with the seed of the
+  system, the step and the block, so the blocks can be selected in any order
+  and by any worker with the same result. The DMEM rules selected in a block
+  draw their probabilities from a second stream of the block, `apply_random`.
+
+Selected rules are appended to a list of ``(membrane, rule data, multiplicity)``
+entries, the format of `PSystem` pending rules.
+"""
+
+
+class LegacyRandom:
+    """Random source of the serial engine, on the global random states."""
+
+    @staticmethod
+    def index(n: int) -> int:
+        """Uniform index in ``range(n)``."""
+        return random.choice(range(n))
+
+    @staticmethod
+    def choice(indexes: List[int], p) -> int:
+        """One of ``indexes`` with probabilities ``p``."""
+        return np.random.choice(indexes, p=p)
+
+    @staticmethod
+    def random() -> float:
+        """Uniform float in [0, 1)."""
+        return np.random.random()
+
+
+class StreamRandom:
+    """Random source on an independent `numpy.random.Generator`."""
+
+    def __init__(self, generator: np.random.Generator):
+        """Initialize a source on a generator.
+
+        Args:
+            generator (np.random.Generator): Generator to draw from.
+        """
+        self._generator = generator
+
+    def index(self, n: int) -> int:
+        """Uniform index in ``range(n)``."""
+        return int(self._generator.integers(n))
+
+    def choice(self, indexes: List[int], p) -> int:
+        """One of ``indexes`` with probabilities ``p``."""
+        return indexes[self._generator.choice(len(indexes), p=p)]
+
+    def random(self) -> float:
+        """Uniform float in [0, 1)."""
+        return self._generator.random()
+
+
+LEGACY_RANDOM = LegacyRandom()
+
+# Last seed word of the apply streams, so they never match a selection stream
+APPLY_STREAM = 1
+
+
+def block_random(seed: int, step: int, block: int) -> StreamRandom:
+    """Random stream of a block of membranes on a step.
+
+    Args:
+        seed (int): Seed of the system.
+        step (int): Current step.
+        block (int): Block number, 0 for the skin membrane and ``i + 1`` for the
+            subtree of its ``i``-th child.
+
+    Returns:
+        StreamRandom: Source seeded with ``[seed, step, block]``.
+    """
+    return StreamRandom(np.random.default_rng([seed, step, block]))
+
+
+def apply_random(seed: int, step: int, block: int) -> StreamRandom:
+    """Random stream of the DMEM draws of a block of membranes on a step.
+
+    Args:
+        seed (int): Seed of the system.
+        step (int): Current step.
+        block (int): Block number, as in `block_random`.
+
+    Returns:
+        StreamRandom: Source seeded with ``[seed, step, block, APPLY_STREAM]``.
+    """
+    return StreamRandom(np.random.default_rng([seed, step, block, APPLY_STREAM]))
+
+
+def applicable_rules(membrane: Membrane, rules: Dict[Tuple, List[Rule]], stats=None) -> List[Tuple]:
+    """Find all applicable rules for a given membrane.
+
+    Determines which object and membrane rules can be applied in the current
+    state of the membrane, considering rule priorities and object availability.
+
+    Args:
+        membrane (Membrane): The membrane to check for applicable rules.
+        rules (Dict[Tuple, List[Rule]]): Rules of the system by membrane id and kind.
+        stats (RuleStats, optional): Counters of the checked and applicable rules.
+
+    Returns:
+        List[Tuple]: Applicable object rules followed by the applicable membrane
+            rules (in reversed order), as ``(membrane id, child id, child index, rule)``.
+    """
+    membrane_obj_rules = rules.get((membrane.id, SceneObject.OBJECT_RULE), [])
+    membrane_mem_rules = rules.get((membrane.id, SceneObject.MEMBRANE_RULE), [])
+
+    app_obj_rules = []              # Rules with defined priorities
+    app_mem_rules = []              # Rules that move an entire membrane
+    app_rules_idxs = []             # List of IDs of the applicable rules
+
+    for rule in membrane_obj_rules:
+        left = rule.left
+        if all(membrane.objects.count(obj) >= m for obj, m in left.items()):
+            if rule.priority is not None:
+                if not (set(app_rules_idxs) & set(rule.priority)):
+                    app_obj_rules.append((membrane.id, 0, 0, rule))
+                    app_rules_idxs.append(rule.idx)
+            else:
+                app_obj_rules.append((membrane.id, 0, 0, rule))
+                app_rules_idxs.append(rule.idx)
+
+    for i, child in enumerate(membrane.children):
+        for rule in membrane_mem_rules:
+            mem_idx = rule.mem_idx
+            if child.id == mem_idx and all(child.objects.count(obj) >= m for obj, m in rule.left.items()):
+                app_mem_rules.append((membrane.id, child.id, i, rule))
+    applicable = app_obj_rules + list(reversed(app_mem_rules))
+    if stats is not None:
+        stats.count_checks(membrane_obj_rules, membrane_mem_rules, membrane.children, applicable)
+    return applicable
+
+
+def maximal_group(membrane: Membrane, rules: List[Tuple], rng=LEGACY_RANDOM, stats=None, memory=None) -> Dict:
+    """Generates a single, non-deterministically chosen, maximal multiset of rules.
+
+    This function implements an efficient, iterative ("greedy") algorithm to
+    determine one valid multiset of rules to be applied in a single computation
+    step, following the "maximally parallel" derivation mode. Instead of
+    calculating all possible maximal sets (which is computationally expensive),
+    it randomly selects rules one by one until no more rules can be applied to
+    the remaining objects.
+
+    The process is non-deterministic due to the random selection of rules at
+    each iteration and the probabilistic application of each rule. The final
+    multiset of rules is guaranteed to be "maximal" because the loop only
+    terminates when the set cannot be extended further.
+
+    The function categorizes the selected rules into three groups: those that
+    affect objects ('obj'), those that affect the membrane itself ('mem',
+    such as dissolution rules), and those that handle the movement of child
+    membranes ('move').
+
+    Pseudo-código del algoritmo:
+    1.  Inicializar un 'grupo' de reglas vacío con tres categorías: 'obj',
+        'mem' y 'move'.
+    2.  Crear una copia de los objetos de la membrana para poder modificarlos.
+    3.  Iniciar un bucle que se ejecuta mientras la lista de reglas a
+        considerar no esté vacía.
+    4.  Dentro del bucle:
+        a.  Elegir una regla al azar de la lista de reglas disponibles.
+        b.  Verificar el tipo de regla:
+            i.  Si es una regla de movimiento de membrana ('move'):
+                - Añadirla al grupo 'move'.
+                - Eliminarla de la lista para que no se considere más en
+                  este paso.
+                - Continuar con la siguiente iteración del bucle.
+            ii. Si es una regla de evolución de objetos o disolución:
+                - Comprobar si es aplicable con los objetos restantes.
+                - Si NO es aplicable:
+                    - Eliminar la regla de la lista y continuar.
+                - Si ES aplicable:
+                    1. Evaluar la probabilidad de la regla. Si la
+                       comprobación probabilística falla, no se aplica la
+                       regla, pero el bucle continúa para dar oportunidad
+                       a otras reglas.
+                    2. Si la regla se aplica, añadirla al 'grupo'
+                       correspondiente ('obj' o 'mem'), incrementando su
+                       contador.
+                    3. Restar los objetos consumidos por la regla de la
+                       copia de objetos.
+    5.  El bucle termina cuando la lista de reglas a considerar se vacía, lo
+        que implica que no se pueden aplicar más reglas a los objetos
+        restantes.
+    6.  Devolver el 'grupo' de reglas final.
+
+    Args:
+        membrane (Membrane): El objeto de la membrana que contiene el
+            multiconjunto actual de objetos sobre los que operar.
+        rules (List): Una lista de todas las reglas potencialmente
+            aplicables en esta membrana. Esta lista se modifica durante la
+            ejecución de la función (las reglas no aplicables se eliminan).
+        rng (optional): Fuente de números aleatorios. Por defecto, `LEGACY_RANDOM`.
+        stats (RuleStats, optional): Contadores de reglas rechazadas.
+        memory (MemoryProfiler, optional): Contador de multiconjuntos reservados.
+
+    Returns:
+        Dict: Un diccionario que contiene el multiconjunto de reglas
+            seleccionado, categorizado por su tipo de efecto. La estructura es:
+            {
+                'obj': {rule_idx: {'count': N, 'data': rule_data},...},
+                'mem': {rule_idx: {'count': M, 'data': rule_data},...},
+                'move': {child_idx: {'count': 1, 'data': rule_data},...}
+            }
+    """
+
+    group = { 'obj': dict(), 'mem': dict(), 'move': dict() }
+    if len(rules) > 0:
+        original_objects = membrane.objects.copy()
+        if memory is not None:
+            memory.count_multiset(original_objects)
+
+        def select_rule():
+            nonlocal original_objects
+            if len(rules) == 0:
+                return False
+
+            index = rng.index(len(rules))
+            rule_data = rules[index]
+            rule = rule_data[-1]
+
+            # Condición para movimiento de objetos y disolución de membranas
+            if rule.move not in (MoveCode.MEMwOB.name,):
+                # Determine if the rule remains applicable
+                count = original_objects.count_subsets(rule.left)
+
+                if count > 0:
+                    prob = rule.probability
+                    if prob != 1.0:
+                        probs = np.array([prob, 1-prob])
+                        indexes = [1, -1]
+                        rule_idx = rng.choice(indexes, p=probs)
+                        if rule_idx == -1:
+                            if stats is not None:
+                                stats.rejected[stats.slot(rule)] += 1
+                            return True
+                    branch = 'obj' if rule.move not in (MoveCode.DISS_KEEP.name, MoveCode.DISS.name) else 'mem'
+                    is_applied = group[branch].get(rule.idx, False)
+                    if is_applied:
+                        group[branch][rule.idx]['count'] = group[branch][rule.idx]['count'] + 1
+                    else:
+                        group[branch][rule.idx] = dict()
+                        group[branch][rule.idx]['count'] = 1
+                        group[branch][rule.idx]['data'] = rule_data
+                    original_objects = original_objects - rule.left
+                    if memory is not None:
+                        memory.count_multiset(original_objects)
+                else:
+                    # Remove the rule if not applicable
+                    del rules[index]
+                return True
+            # Condición para movimiento de membranas
+            else:
+                child_idx = rule_data[2]
+                group['move'][child_idx] = dict()
+                group['move'][child_idx]['count'] = 1
+                group['move'][child_idx]['data'] = rule_data
+                del rules[index]
+                return True
+
+        while select_rule():
+            # Avoiding recursion to prevent stack overflow due to excessive calls
+            pass
+    return group
+
+
+def select_minpar(membrane: Membrane, rules: Dict[Tuple, List[Rule]], rng, pending: List, stats=None, memory=None):
+    """Select the rules of one membrane in minimal parallelism.
+
+    At most one of the applicable rules is chosen, with the rule probabilities;
+    when they add up to less than 1, the remainder is the probability of
+    choosing none.
+
+    Args:
+        membrane (Membrane): The membrane to process. Its children are not.
+        rules (Dict[Tuple, List[Rule]]): Rules of the system.
+        rng: Random source.
+        pending (List): List the selected rule is appended to.
+        stats (RuleStats, optional): Per-rule counters.
+        memory (MemoryProfiler, optional): Unused, minimal parallelism does no
+            multiset arithmetic.
+    """
+    applicable = applicable_rules(membrane, rules, stats)
+
+    if len(applicable) > 0:
+        probs = np.array([rule.probability for _,_,_,rule in applicable])
+        total_prob = probs.sum()
+        indexes = list(range(len(applicable)))
+
+        if total_prob > 1.0:
+            # Normalize if prob is greater than 1.0
+            probs /= total_prob
+        elif total_prob < 1.0:
+            probs = np.append(probs, 1 - total_prob)
+            indexes += [-1]
+        rule_idx = rng.choice(indexes, p=probs)
+        if rule_idx != -1:
+            pending.append((membrane, applicable[rule_idx], 1))
+        if stats is not None:
+            stats.count_rejections(applicable, rule_idx)
+
+
+def select_maxpar(membrane: Membrane, rules: Dict[Tuple, List[Rule]], rng, pending: List, stats=None, memory=None):
+    """Select the rules of one membrane in maximal parallelism.
+
+    A random non-extendable group of object and dissolution rules is chosen
+    with `maximal_group`, and every membrane moving rule in it is kept with its
+    probability.
+
+    Args:
+        membrane (Membrane): The membrane to process. Its children are not.
+        rules (Dict[Tuple, List[Rule]]): Rules of the system.
+        rng: Random source.
+        pending (List): List the selected rules are appended to.
+        stats (RuleStats, optional): Per-rule counters.
+        memory (MemoryProfiler, optional): Counter of the allocated multisets.
+    """
+    applicable = applicable_rules(membrane, rules, stats)
+    group = maximal_group(membrane, applicable, rng, stats, memory)
+
+    for type in ['obj', 'mem']:
+        for _, item in group[type].items():
+            pending.append((membrane, item['data'], item['count']))
+
+    child_indices = list(group['move'].keys())
+    child_indices.sort(reverse=True)
+
+    for i in child_indices:
+        child_rule = group['move'][i]
+        rule_data = child_rule['data']
+        count = child_rule['count']
+        rule = rule_data[-1]
+        prob = rule.probability
+        if rng.random() < prob:
+            pending.append((membrane, rule_data, count))
+        elif stats is not None:
+            stats.rejected[stats.slot(rule)] += 1
+
+
+SELECTORS = {
+    InferenceType.MIN_PARALLEL: select_minpar,
+    InferenceType.MAX_PARALLEL: select_maxpar,
+}
+
+
+def select_subtree(select, membrane: Membrane, rules: Dict[Tuple, List[Rule]], rng, pending: List,
+                   stats=None, memory=None):
+    """Select the rules of a membrane and all its descendants, in preorder.
+
+    Args:
+        select (Callable): `select_minpar` or `select_maxpar`.
+        membrane (Membrane): Root of the subtree.
+        rules (Dict[Tuple, List[Rule]]): Rules of the system.
+        rng: Random source, shared by the whole subtree.
+        pending (List): List the selected rules are appended to.
+        stats (RuleStats, optional): Per-rule counters.
+        memory (MemoryProfiler, optional): Counter of the allocated multisets.
+    """
+    stack = [membrane]
+    while stack:
+        current = stack.pop()
+        select(current, rules, rng, pending, stats, memory)
+        stack.extend(reversed(current.children))
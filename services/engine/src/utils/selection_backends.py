@@ -0,0 +1,391 @@
+import os
+import multiprocessing
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple, Union
+
+from src.classes.membrane import Membrane
+from src.classes.objects_multiset import ObjectsMultiset
+from src.classes.rule import Rule
+from src.utils.memory_profile import MemoryProfiler
+from src.utils.rule_stats import RuleStats
+from src.utils.selection import SELECTORS, block_random, select_subtree
+
+"""
+Block selection backends for membrane computing systems.
+
+The selection phase of a step only reads the membranes, and the choice of
+every membrane is independent of the others until the rules are applied, so
+the membrane tree can be split into blocks that are selected separately: the
+skin membrane is block 0 and the subtree of its ``i``-th child is block
+``i + 1``. Every block draws from its own random stream, seeded with the seed
+of the system, the step and the block number (see `block_random`), and the
+selections of the blocks are concatenated in block order, which is the preorder
+of the serial engine. The result does not depend on which worker selects a
+block, so every backend gives the same rules as `BlockSelection` for the same
+seed. It is not the same as the serial engine, which draws every membrane from
+the global random state.
+
+Backends:
+    BlockSelection    Selects the blocks one after the other in this process.
+    ThreadSelection   Selects the blocks in a pool of threads.
+    ProcessSelection  Selects the blocks in a pool of processes that read the
+                      membrane objects from shared memory.
+"""
+
+
+def rule_table(rules: Dict[Tuple, List[Rule]]) -> List[Tuple[str, Rule]]:
+    """Rules of a system as ``(membrane id, rule)`` pairs, in a stable order."""
+    return [(mem_id, rule) for (mem_id, _), rule_list in rules.items() for rule in rule_list]
+
+
+class BlockSelection:
+    """Selects the rules of a step block by block, in this process.
+
+    This is the reference of the parallel backends, and is also useful on its
+    own to run a system with the block seed scheme without starting workers.
+
+    Attributes:
+        seed (int): Seed of the block random streams. A random one is drawn
+            when the system is not seeded.
+        workers (int): Number of workers of the parallel backends.
+    """
+
+    def __init__(self, inference: str, rules: Dict[Tuple, List[Rule]], seed: Union[int, None] = None,
+                 workers: Union[int, None] = None):
+        """Initialize a backend.
+
+        Args:
+            inference (str): Inference mode.
+            rules (Dict[Tuple, List[Rule]]): Rules of the system.
+            seed (Union[int, None], optional): Seed of the random streams.
+            workers (Union[int, None], optional): Number of workers. Defaults to
+                the number of CPUs.
+
+        Raises:
+            NotImplementedError: If the inference mode has no selection function.
+        """
+        if inference not in SELECTORS:
+            raise NotImplementedError(f'Inference type "{inference}" not Implemented')
+        self._inference = inference
+        self._select = SELECTORS[inference]
+        self._rules = rules
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @seed.setter
+    def seed(self, value: Union[int, None]):
+        self._seed = int(np.random.SeedSequence().entropy) if value is None else value
+
+    def select(self, root: Membrane, step: int, stats=None, memory=None) -> List[List[Tuple]]:
+        """Select the rules of every membrane of a system for a step.
+
+        Args:
+            root (Membrane): Skin membrane of the system.
+            step (int): Current step.
+            stats (RuleStats, optional): Per-rule counters.
+            memory (MemoryProfiler, optional): Counter of the allocated multisets.
+
+        Returns:
+            List[List[Tuple]]: Selected rules of every block as ``(membrane,
+                rule data, multiplicity)``, in preorder: the skin first, then the
+                subtree of every child of the skin.
+        """
+        pending = []
+        self._select(root, self._rules, block_random(self.seed, step, 0), pending, stats, memory)
+        return [pending] + self._select_blocks(root, step, stats, memory)
+
+    def _select_blocks(self, root: Membrane, step: int, stats=None, memory=None) -> List[List[Tuple]]:
+        """Selected rules of the subtree of every child of the skin, in order."""
+        blocks = []
+        for block, child in enumerate(root.children, start=1):
+            pending = []
+            select_subtree(self._select, child, self._rules, block_random(self.seed, step, block), pending,
+                           stats, memory)
+            blocks.append(pending)
+        return blocks
+
+    def close(self):
+        """Release the workers and the memory of the backend."""
+        pass
+
+
+class ThreadSelection(BlockSelection):
+    """Selects the blocks of a step in a pool of threads.
+
+    Threads read the membranes of this process directly, so nothing is copied
+    or pickled. Every block is a task with its own random generator and its own
+    list of selected rules, so the threads share no mutable state and the lists
+    are merged in block order when all the tasks of the step have finished.
+
+    Selection is Python code, so on a regular CPython build the threads take
+    turns on the GIL; the backend pays off on free-threaded builds. The pool is
+    started on the first step and stopped by `close`. Rule statistics and the
+    multiset counters of the memory profiler are also counted per block and
+    added to the ones of the system in block order.
+    """
+
+    def __init__(self, inference: str, rules: Dict[Tuple, List[Rule]], seed: Union[int, None] = None,
+                 workers: Union[int, None] = None):
+        super().__init__(inference, rules, seed, workers)
+        self._executor = None
+
+    def __select_block(self, child: Membrane, step: int, block: int, stats=None, memory=None) -> Tuple:
+        pending = []
+        block_stats = None if stats is None else stats.block()
+        block_memory = None if memory is None else memory.block()
+        select_subtree(self._select, child, self._rules, block_random(self.seed, step, block), pending,
+                       block_stats, block_memory)
+        return pending, block_stats, block_memory
+
+    def _select_blocks(self, root: Membrane, step: int, stats=None, memory=None) -> List[List[Tuple]]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='psys-selection')
+        futures = [self._executor.submit(self.__select_block, child, step, block, stats, memory)
+                   for block, child in enumerate(root.children, start=1)]
+        blocks = []
+        for future in futures:
+            pending, block_stats, block_memory = future.result()
+            if block_stats is not None:
+                stats.merge(block_stats.counters())
+            if block_memory is not None:
+                memory.merge(block_memory.counters())
+            blocks.append(pending)
+        return blocks
+
+    def close(self):
+        """Stop the thread pool."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+class MembraneView:
+    """Read-only membrane rebuilt by a worker from the shared arrays."""
+    __slots__ = ('id', 'objects', 'children', 'index')
+
+    def __init__(self, idx: str, objects: ObjectsMultiset, index: int):
+        self.id = idx
+        self.objects = objects
+        self.children = []
+        self.index = index
+
+
+# State of a selection worker process
+_worker = dict()
+
+
+def _init_worker(rules: Dict[Tuple, List[Rule]]):
+    _worker['rules'] = rules
+    _worker['slots'] = {id(rule): i for i, (_, rule) in enumerate(rule_table(rules))}
+    _worker['stats'] = RuleStats(rule_table(rules))
+    _worker['profiler'] = MemoryProfiler(1)
+    _worker['memory'] = dict()
+
+
+def _release_stale(names: Tuple[str, ...]):
+    """Detach the shared memory blocks the main process has replaced."""
+    for name in [name for name in _worker['memory'] if name not in names]:
+        _worker['memory'].pop(name).close()
+
+
+def _shared_array(name: str, shape: Tuple, dtype) -> np.ndarray:
+    """Array on a shared memory block, attached once per worker."""
+    attached = _worker['memory'].get(name)
+    if attached is None:
+        attached = _worker['memory'][name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=attached.buf)
+
+
+def _build_views(counts: np.ndarray, structure: np.ndarray, objects: List[str], labels: List[str],
+                 start: int, end: int) -> MembraneView:
+    """Rebuild the subtree stored in the rows ``start:end`` in preorder."""
+    root = None
+    stack, remaining = [], []
+    for i in range(start, end):
+        row = counts[i]
+        multiset = ObjectsMultiset.from_dict({objects[c]: int(row[c]) for c in np.flatnonzero(row)})
+        view = MembraneView(labels[structure[i, 0]], multiset, i)
+        if stack:
+            stack[-1].children.append(view)
+            remaining[-1] -= 1
+            if remaining[-1] == 0:
+                stack.pop()
+                remaining.pop()
+        else:
+            root = view
+        if structure[i, 1] > 0:
+            stack.append(view)
+            remaining.append(int(structure[i, 1]))
+    return root
+
+
+def _select_chunk(task: Dict) -> Tuple[List[List[Tuple]], Union[Tuple, None], Union[Tuple, None]]:
+    """Select the rules of some blocks in a worker.
+
+    Returns:
+        Tuple: For every block of the task, its selected rules as
+            ``(row, rule slot, child id, child index, multiplicity)``, and the
+            rule statistics and multiset counters of the blocks, or None when
+            the system does not collect them.
+    """
+    _release_stale((task['counts'], task['structure']))
+    rows, columns = task['shape']
+    counts = _shared_array(task['counts'], (rows, columns), np.int64)
+    structure = _shared_array(task['structure'], (rows, 2), np.int32)
+    select = SELECTORS[task['inference']]
+    rules, slots = _worker['rules'], _worker['slots']
+    stats = _worker['stats'].block() if task['stats'] else None
+    memory = _worker['profiler'].block() if task['memory'] else None
+    results = []
+    for block, start, end in task['blocks']:
+        root = _build_views(counts, structure, task['objects'], task['labels'], start, end)
+        pending = []
+        select_subtree(select, root, rules, block_random(task['seed'], task['step'], block), pending, stats, memory)
+        results.append([(view.index, slots[id(data[-1])], data[1], data[2], multiplicity)
+                        for view, data, multiplicity in pending])
+    return (results, None if stats is None else stats.counters(),
+            None if memory is None else memory.counters())
+
+
+class ProcessSelection(BlockSelection):
+    """Selects the blocks of a step in a pool of worker processes.
+
+    On every step the membranes of the blocks are flattened in preorder into two
+    `multiprocessing.shared_memory` arrays: the object counts of every membrane,
+    one column per object, and its label and number of children. Workers get the
+    rules once, when the pool starts, and on every step only the names of the
+    arrays and the blocks to select; they rebuild the blocks from the arrays,
+    select them with their random streams and send back the selected rules as
+    rows of the arrays and positions in the rule table, which this process turns
+    into pending rules of its own membranes.
+
+    The pool is started on the first step and stopped by `close`. Rule
+    statistics and the multiset counters of the memory profiler are counted by
+    the workers and added to the ones of the system in block order.
+    """
+
+    def __init__(self, inference: str, rules: Dict[Tuple, List[Rule]], seed: Union[int, None] = None,
+                 workers: Union[int, None] = None):
+        super().__init__(inference, rules, seed, workers)
+        self._table = rule_table(rules)
+        self._executor = None
+        self._columns = dict()      # Object -> column of the counts array
+        self._labels = dict()       # Membrane id -> label index
+        self._counts = None
+        self._structure = None
+        self._capacity = (0, 0)
+
+    def __ensure_capacity(self, rows: int, columns: int):
+        """Allocate shared arrays with room for ``rows`` membranes and ``columns`` objects."""
+        if rows <= self._capacity[0] and columns <= self._capacity[1]:
+            return
+        self.__release_memory()
+        capacity = (max(rows, 2 * self._capacity[0], 1), max(columns, 2 * self._capacity[1], 1))
+        self._counts = shared_memory.SharedMemory(create=True, size=capacity[0] * capacity[1] * 8)
+        self._structure = shared_memory.SharedMemory(create=True, size=capacity[0] * 2 * 4)
+        self._capacity = capacity
+
+    def __release_memory(self):
+        for block in (self._counts, self._structure):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self._counts = self._structure = None
+        self._capacity = (0, 0)
+
+    def __flatten(self, root: Membrane) -> Tuple[List[Membrane], List[Tuple[int, int, int]]]:
+        """Write the blocks of a system to the shared arrays.
+
+        Returns:
+            Tuple[List[Membrane], List[Tuple[int, int, int]]]: Membrane of every
+                row, and block number, first row and end row of every block.
+        """
+        nodes, ranges = [], []
+        labels, children, cells, values = [], [], [], []
+        columns, label_index = self._columns, self._labels
+        for block, child in enumerate(root.children, start=1):
+            start = len(nodes)
+            stack = [child]
+            while stack:
+                membrane = stack.pop()
+                row = len(nodes)
+                nodes.append(membrane)
+                labels.append(label_index.setdefault(membrane.id, len(label_index)))
+                children.append(len(membrane.children))
+                for obj, multiplicity in membrane.objects.items():
+                    cells.append((row, columns.setdefault(obj, len(columns))))
+                    values.append(multiplicity)
+                stack.extend(reversed(membrane.children))
+            ranges.append((block, start, len(nodes)))
+
+        self.__ensure_capacity(len(nodes), len(columns))
+        rows, width = self._capacity
+        counts = np.ndarray((rows, width), dtype=np.int64, buffer=self._counts.buf)
+        structure = np.ndarray((rows, 2), dtype=np.int32, buffer=self._structure.buf)
+        counts[:len(nodes)] = 0
+        if cells:
+            index = np.array(cells)
+            counts[index[:, 0], index[:, 1]] = values
+        structure[:len(nodes), 0] = labels
+        structure[:len(nodes), 1] = children
+        return nodes, ranges
+
+    def __chunks(self, ranges: List[Tuple[int, int, int]]) -> List[List[Tuple[int, int, int]]]:
+        """Split the blocks, in order, into one group of similar size per worker."""
+        total = sum(end - start for _, start, end in ranges)
+        target = total / self.workers
+        chunks, size = [[]], 0
+        for block in ranges:
+            if chunks[-1] and size >= target * len(chunks):
+                chunks.append([])
+            chunks[-1].append(block)
+            size += block[2] - block[1]
+        return chunks
+
+    def _select_blocks(self, root: Membrane, step: int, stats=None, memory=None) -> List[List[Tuple]]:
+        if not root.children:
+            return []
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker, initargs=(self._rules,))
+        nodes, ranges = self.__flatten(root)
+        task = {
+            'counts': self._counts.name,
+            'structure': self._structure.name,
+            'shape': self._capacity,
+            'objects': list(self._columns),
+            'labels': list(self._labels),
+            'inference': self._inference,
+            'seed': self.seed,
+            'step': step,
+            'stats': stats is not None,
+            'memory': memory is not None,
+        }
+        futures = [self._executor.submit(_select_chunk, {**task, 'blocks': chunk}) for chunk in self.__chunks(ranges)]
+
+        blocks = []
+        for future in futures:
+            selections, chunk_stats, chunk_memory = future.result()
+            if chunk_stats is not None:
+                stats.merge(chunk_stats)
+            if chunk_memory is not None:
+                memory.merge(chunk_memory)
+            for selected in selections:
+                blocks.append([(nodes[row], (nodes[row].id, child_id, child_index, self._table[slot][1]), multiplicity)
+                               for row, slot, child_id, child_index, multiplicity in selected])
+        return blocks
+
+    def close(self):
+        """Stop the worker pool and free the shared arrays."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.__release_memory()
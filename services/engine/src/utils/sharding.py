@@ -0,0 +1,516 @@
+import multiprocessing
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple, Union
+
+from src.classes.membrane import Membrane
+from src.classes.objects_multiset import ObjectsMultiset
+from src.classes.rule import Rule
+from src.enums.constants import MoveCode, SceneObject
+from src.utils.async_writer import AsyncWriter
+from src.utils.results import wide_row
+from src.utils.selection import SELECTORS, apply_random, block_random, select_subtree
+
+"""
+Sharded simulation module for membrane computing systems.
+
+The children of the skin membrane (the zones and homes of an epidemic scene)
+are split into shards, and every shard runs the selection and application of
+its membranes in its own worker process. The skin stays in the coordinator
+process, and the effects that cross a shard boundary are exchanged as batched
+messages at a barrier at the end of every step:
+
+- OUT rules of a skin child and dissolutions of a skin child send objects to
+  the skin.
+- IN rules of the skin send objects to a skin child.
+- MEMwOB rules move a membrane to another skin child. The moved membrane is
+  detached when the rule is applied and attached to its destination at the
+  barrier, serialized with `pack_membrane`.
+
+Every membrane still sees the structure of the start of the step, and the
+barrier handles the effects of all the shards in the order of their skin
+children, so the results do not depend on the number of shards nor on whether
+they run in worker processes. Each skin child is a block with its own random
+streams, seeded with the seed of the system, the step and the block: one for
+the selection (the streams of `block_random`) and one for the draws of DMEM
+rules (the streams of `apply_random`). These are the streams of the block
+selection backends of `PSystem`, so a sharded run matches a run of the system
+with the same seed and block selection; it does not match the serial engine.
+
+Not supported: membrane rules of the skin, DMEM rules of skin children (their
+targets would be in other shards) and output membranes other than the skin or
+one of its children. Traces, replays, timings, rule statistics and memory
+profiles are not recorded.
+"""
+
+
+def pack_membrane(membrane: Membrane) -> Tuple:
+    """Serialize a membrane and its descendants.
+
+    Returns:
+        Tuple: One ``(id, multiplicity, capacity, number of children, objects)``
+            entry per membrane in preorder, with the objects as a tuple of
+            ``(object, multiplicity)`` pairs.
+    """
+    packed = []
+    pending = [membrane]
+    while pending:
+        current = pending.pop()
+        packed.append((current.id, current.multiplicity, current.capacity, len(current.children),
+                       tuple(current.objects.items())))
+        pending.extend(reversed(current.children))
+    return tuple(packed)
+
+
+def unpack_membrane(packed: Tuple) -> Membrane:
+    """Rebuild a membrane serialized with `pack_membrane`, without parent."""
+    root = None
+    stack, remaining = [], []
+    for idx, multiplicity, capacity, n_children, objects in packed:
+        membrane = Membrane(idx=idx, multiplicity=multiplicity, capacity=capacity)
+        membrane.objects = ObjectsMultiset.from_dict(dict(objects))
+        if stack:
+            stack[-1].add_child(membrane)
+            membrane.parent = stack[-1]
+            remaining[-1] -= 1
+            if remaining[-1] == 0:
+                stack.pop()
+                remaining.pop()
+        else:
+            root = membrane
+        if n_children > 0:
+            stack.append(membrane)
+            remaining.append(n_children)
+    return root
+
+
+def count_objects(membrane: Membrane, objects: List[str]) -> List[int]:
+    """Number of every object in a membrane and its descendants."""
+    counts = [0] * len(objects)
+    pending = [membrane]
+    while pending:
+        current = pending.pop()
+        for i, obj in enumerate(objects):
+            counts[i] += current.objects.count(obj)
+        pending.extend(current.children)
+    return counts
+
+
+class Shard:
+    """Blocks of a sharded system, run by a worker.
+
+    The skin children of the shard hang from a stand-in of the skin, so OUT
+    rules and dissolutions of the blocks leave their objects in it and are sent
+    to the coordinator from there.
+    """
+
+    def __init__(self, skin: Tuple, blocks: Dict[int, Tuple], rules: Dict[Tuple, List[Rule]], inference: str,
+                 seed: int, output: Tuple[Union[int, None], List[str]]):
+        """Initialize a shard.
+
+        Args:
+            skin (Tuple): Id, multiplicity and capacity of the skin membrane.
+            blocks (Dict[int, Tuple]): Packed skin children of the shard by block number.
+            rules (Dict[Tuple, List[Rule]]): Rules of the system.
+            inference (str): Inference mode.
+            seed (int): Seed of the block random streams.
+            output (Tuple[Union[int, None], List[str]]): Block of the output
+                membrane, None for the skin, and output objects.
+        """
+        self._skin = Membrane(idx=skin[0], multiplicity=skin[1], capacity=skin[2])
+        self._blocks = dict()
+        for block, packed in sorted(blocks.items()):
+            root = unpack_membrane(packed)
+            root.parent = self._skin
+            self._skin.add_child(root)
+            self._blocks[block] = root
+        self._rules = rules
+        self._select = SELECTORS[inference]
+        self._seed = seed
+        self._output_block, self._output_objects = output
+
+    def __deliver(self, inbox: Dict):
+        """Apply the effects of the previous barrier on the blocks of the shard."""
+        for block, objects in inbox['objects']:
+            root = self._blocks[block]
+            for obj, m in objects:
+                root.objects.add_object(obj=obj, multiplicity=m)
+        for block, packed in inbox['migrants']:
+            migrant = unpack_membrane(packed)
+            self._blocks[block].add_child(migrant)
+            migrant.parent = self._blocks[block]
+
+    def __count(self) -> List[int]:
+        counts = [0] * len(self._output_objects)
+        for block, root in self._blocks.items():
+            if self._output_block is None or self._output_block == block:
+                counts = [a + b for a, b in zip(counts, count_objects(root, self._output_objects))]
+        return counts
+
+    def __apply(self, block: int, step: int, pending: List[Tuple], outbox: Dict) -> int:
+        """Apply the selected rules of a block, deferring its cross-shard effects."""
+        skin = self._skin
+        draws = apply_random(self._seed, step, block)
+        moved = []
+        applications = 0
+        for membrane, data, multiplicity in pending:
+            _, _, child_index, rule = data
+            match rule.move:
+                case MoveCode.OUT.name:
+                    membrane.apply_out_rule(rule=rule, multiplicity=multiplicity)
+                case MoveCode.HERE.name:
+                    membrane.apply_here_rule(rule=rule, multiplicity=multiplicity)
+                case MoveCode.IN.name:
+                    dest = next((child for child in membrane.children if child.id == rule.destination))
+                    membrane.apply_in_rule(rule=rule, destination=dest, multiplicity=multiplicity)
+                case MoveCode.MEMwOB.name:
+                    child = membrane.remove_child(child_index)
+                    child.apply_here_rule(rule, multiplicity=1)
+                    moved.append((rule.destination, child))
+                case MoveCode.DISS_KEEP.name:
+                    membrane.apply_dissolve_to_parent_rule(rule=rule)
+                    if membrane.parent is skin:
+                        outbox['dissolved'].append(block)
+                case MoveCode.DMEM.name:
+                    if membrane.parent is skin:
+                        raise NotImplementedError('DMEM rules of skin children are not supported in sharded mode')
+                    membrane.apply_dmem_rule(rule=rule, multiplicity=multiplicity, random=draws.random)
+            applications += multiplicity
+        # Moved membranes are packed last, the rules selected inside them this step still apply to them
+        for destination, child in moved:
+            outbox['migrants'].append((block, destination, pack_membrane(child)))
+        return applications
+
+    def step(self, inbox: Dict, step: int) -> Tuple[List[int], Dict]:
+        """Deliver the previous barrier and run a step on the blocks of the shard.
+
+        Args:
+            inbox (Dict): Effects of the previous barrier on this shard.
+            step (int): Step to run.
+
+        Returns:
+            Tuple[List[int], Dict]: Output counts of the shard before the step,
+                and its outbox: the applications, the objects sent to the skin,
+                the migrating membranes and the dissolved blocks.
+        """
+        self.__deliver(inbox)
+        counts = self.__count()
+        selected = []
+        for block, root in self._blocks.items():
+            pending = []
+            select_subtree(self._select, root, self._rules, block_random(self._seed, step, block), pending)
+            selected.append((block, pending))
+
+        outbox = {'applications': 0, 'skin': (), 'migrants': [], 'dissolved': []}
+        for block, pending in selected:
+            outbox['applications'] += self.__apply(block, step, pending, outbox)
+        outbox['skin'] = tuple(self._skin.objects.items())
+        self._skin.objects.remove_all()
+        for block in outbox['dissolved']:
+            del self._blocks[block]
+        return counts, outbox
+
+    def gather(self, inbox: Dict) -> Tuple[List[int], Dict[int, Tuple]]:
+        """Deliver the last barrier and return the blocks of the shard.
+
+        Returns:
+            Tuple[List[int], Dict[int, Tuple]]: Output counts of the shard and its
+                packed skin children by block number.
+        """
+        self.__deliver(inbox)
+        return self.__count(), {block: pack_membrane(root) for block, root in self._blocks.items()}
+
+
+class InlineShard:
+    """Runs a shard in the coordinator process."""
+
+    def __init__(self, *args):
+        self._shard = Shard(*args)
+        self._reply = None
+
+    def send(self, message: Tuple):
+        command, *args = message
+        self._reply = getattr(self._shard, command)(*args)
+
+    def recv(self):
+        return self._reply
+
+    def close(self):
+        pass
+
+
+def _shard_main(connection, args: Tuple):
+    """Loop of a shard worker process: run every message until None."""
+    shard = Shard(*args)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        command, *params = message
+        try:
+            connection.send((True, getattr(shard, command)(*params)))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+class ProcessShard:
+    """Runs a shard in a worker process, messages go through a pipe."""
+
+    def __init__(self, *args):
+        context = multiprocessing.get_context('spawn')
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_shard_main, args=(child, args), daemon=True)
+        self._process.start()
+        child.close()
+
+    def send(self, message: Tuple):
+        self._connection.send(message)
+
+    def recv(self):
+        ok, reply = self._connection.recv()
+        if not ok:
+            raise reply
+        return reply
+
+    def close(self):
+        try:
+            self._connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self._process.join()
+        self._connection.close()
+
+
+class ShardedRun:
+    """Coordinator of a sharded simulation.
+
+    Attributes:
+        step (int): Last step run.
+        applications (int): Number of rule applications, counting multiplicities.
+    """
+
+    def __init__(self, root: Membrane, rules: Dict[Tuple, List[Rule]], inference: str, seed: int,
+                 output: Dict, shards: int, processes: bool = True):
+        """Split a system into shards and start them.
+
+        Args:
+            root (Membrane): Skin membrane of the system.
+            rules (Dict[Tuple, List[Rule]]): Rules of the system.
+            inference (str): Inference mode.
+            seed (int): Seed of the block random streams.
+            output (Dict): Output membrane and objects of the system.
+            shards (int): Number of shards. Capped at the number of skin children.
+            processes (bool, optional): Run every shard in a worker process.
+                Defaults to True; False runs them in this process.
+
+        Raises:
+            NotImplementedError: If the system uses a feature sharding does not support.
+        """
+        if rules.get((root.id, SceneObject.MEMBRANE_RULE)):
+            raise NotImplementedError('Membrane rules of the skin are not supported in sharded mode')
+        if inference not in SELECTORS:
+            raise NotImplementedError(f'Inference type "{inference}" not Implemented')
+        self._root = root
+        self._rules = rules
+        self._select = SELECTORS[inference]
+        self._seed = seed
+        self.step = 0
+        self.applications = 0
+
+        self._output_objects = list(output['objects'])
+        if output['membrane'] is root:
+            output_block = None
+        elif output['membrane'] in root.children:
+            output_block = root.children.index(output['membrane']) + 1
+        else:
+            raise NotImplementedError('The output membrane must be the skin or one of its children in sharded mode')
+        self._output_block = output_block
+
+        # Block number, id and shard of every skin child, in order
+        blocks = list(enumerate(root.children, start=1))
+        sizes = [sum(1 for _ in self.__walk(child)) for _, child in blocks]
+        owners = self.__partition(sizes, max(1, min(shards, len(blocks))))
+        self._roots = [(block, child.id, owner) for (block, child), owner in zip(blocks, owners)]
+        n_shards = max(owners) + 1 if owners else 0
+
+        skin = (root.id, root.multiplicity, root.capacity)
+        handle = ProcessShard if processes else InlineShard
+        self._shards = [handle(skin, {block: pack_membrane(child) for (block, child), owner in zip(blocks, owners)
+                                      if owner == shard},
+                               rules, inference, seed, (output_block, self._output_objects))
+                        for shard in range(n_shards)]
+        self._skin = Membrane(idx=root.id, multiplicity=root.multiplicity, capacity=root.capacity)
+        self._skin.objects = root.objects.copy()
+        self._inboxes = self.__empty_inboxes()
+
+    @staticmethod
+    def __walk(membrane: Membrane):
+        pending = [membrane]
+        while pending:
+            current = pending.pop()
+            yield current
+            pending.extend(current.children)
+
+    @staticmethod
+    def __partition(sizes: List[int], shards: int) -> List[int]:
+        """Shard of every block: contiguous groups of similar number of membranes."""
+        target = sum(sizes) / shards if shards else 0
+        owners, shard, size = [], 0, 0
+        for block_size in sizes:
+            if size >= target * (shard + 1) and shard < shards - 1:
+                shard += 1
+            owners.append(shard)
+            size += block_size
+        return owners
+
+    def __empty_inboxes(self) -> List[Dict]:
+        return [{'objects': [], 'migrants': []} for _ in self._shards]
+
+    def __owner(self, block: int) -> int:
+        return next(owner for b, _, owner in self._roots if b == block)
+
+    def __destination(self, idx: str) -> int:
+        """Block of the first skin child with an id."""
+        block = next((b for b, child_id, _ in self._roots if child_id == idx), None)
+        if block is None:
+            raise RuntimeError(f'No skin child with id "{idx}" to receive a membrane')
+        return block
+
+    def __apply_skin(self, pending: List[Tuple]) -> Tuple[int, List[Tuple[int, Tuple]]]:
+        """Apply the selected rules of the skin, deferring the objects sent to its children."""
+        deliveries = []
+        applications = 0
+        for membrane, data, multiplicity in pending:
+            rule = data[-1]
+            match rule.move:
+                case MoveCode.HERE.name:
+                    membrane.apply_here_rule(rule=rule, multiplicity=multiplicity)
+                case MoveCode.OUT.name:
+                    membrane.apply_out_rule(rule=rule, multiplicity=multiplicity)
+                case MoveCode.IN.name:
+                    for obj, m in rule.left.items():
+                        membrane.objects.sub_object(obj=obj, multiplicity=m * multiplicity)
+                    objects = tuple((obj, m * multiplicity) for obj, m in rule.right.items())
+                    deliveries.append((self.__destination(rule.destination), objects))
+                case move:
+                    raise NotImplementedError(f'{move} rules of the skin are not supported in sharded mode')
+            applications += multiplicity
+        return applications, deliveries
+
+    def __barrier(self, outboxes: List[Dict], deliveries: List[Tuple[int, Tuple]]):
+        """Exchange the cross-shard effects of a step, in block order."""
+        for outbox in outboxes:
+            for obj, m in outbox['skin']:
+                self._skin.objects.add_object(obj=obj, multiplicity=m)
+        dissolved = {block for outbox in outboxes for block in outbox['dissolved']}
+        self._roots = [root for root in self._roots if root[0] not in dissolved]
+
+        inboxes = self.__empty_inboxes()
+        for block, objects in deliveries:
+            inboxes[self.__owner(block)]['objects'].append((block, objects))
+        # Stable sort: the migrants of a block keep the order of its rules
+        migrants = sorted((migrant for outbox in outboxes for migrant in outbox['migrants']), key=lambda m: m[0])
+        for _, destination, packed in migrants:
+            block = self.__destination(destination)
+            inboxes[self.__owner(block)]['migrants'].append((block, packed))
+        self._inboxes = inboxes
+
+    def __log_output(self, writer: AsyncWriter, path: str, step: int, skin_counts: List[int],
+                     shard_counts: List[List[int]], listener, wide_path: Union[str, None]):
+        counts = list(skin_counts)
+        for shard in shard_counts:
+            counts = [a + b for a, b in zip(counts, shard)]
+        counts = list(zip(self._output_objects, counts))
+        writer.write(path, ''.join(f'{step},{obj},{count}\n' for obj, count in counts).encode('utf-8'))
+        if wide_path is not None:
+            writer.write(wide_path, wide_row(step, counts))
+        if listener is not None:
+            listener(step, counts)
+
+    def __skin_counts(self) -> List[int]:
+        if self._output_block is None:
+            return [self._skin.objects.count(obj) for obj in self._output_objects]
+        return [0] * len(self._output_objects)
+
+    def run(self, output_path: str, max_steps: Union[int, None] = None,
+            listener: Union[Callable[[int, List[Tuple[str, int]]], None], None] = None, control=None,
+            wide_path: Union[str, None] = None):
+        """Run steps until no rule is applied or ``max_steps`` steps are run.
+
+        Output rows are written to ``output_path`` as in a single-process run,
+        starting with the state of step 0. When the run ends, the skin children
+        are gathered from the shards back into the skin membrane.
+
+        Args:
+            output_path (str): Output CSV of the run.
+            max_steps (Union[int, None], optional): Maximum number of steps.
+            listener (Union[Callable, None], optional): Called with the step and
+                the ``(object, count)`` pairs of every logged step.
+            control (RunControl, optional): Pause and cancel flags checked
+                before every step.
+            wide_path (Union[str, None], optional): Wide output CSV the logged
+                steps are also written to.
+        """
+        writer = AsyncWriter()
+        error = None
+        try:
+            has_applied = True
+            if max_steps is not None:
+                max_steps = max_steps + self.step
+            logged = None       # Step whose output is pending, None when there is none
+            if self.step == 0:
+                logged = 0
+            while has_applied and (max_steps is None or self.step < max_steps):
+                if control is not None and not control.proceed():
+                    break
+                self.step += 1
+                skin_counts = self.__skin_counts()
+                for shard, inbox in zip(self._shards, self._inboxes):
+                    shard.send(('step', inbox, self.step))
+
+                pending = []
+                self._select(self._skin, self._rules, block_random(self._seed, self.step, 0), pending)
+                applications, deliveries = self.__apply_skin(pending)
+
+                replies = [shard.recv() for shard in self._shards]
+                if logged is not None:
+                    self.__log_output(writer, output_path, logged, skin_counts, [c for c, _ in replies],
+                                      listener, wide_path)
+                outboxes = [outbox for _, outbox in replies]
+                applications += sum(outbox['applications'] for outbox in outboxes)
+                self.__barrier(outboxes, deliveries)
+                self.applications += applications
+                has_applied = applications > 0
+                logged = self.step if has_applied else None
+
+            skin_counts = self.__skin_counts()
+            for shard, inbox in zip(self._shards, self._inboxes):
+                shard.send(('gather', inbox))
+            replies = [shard.recv() for shard in self._shards]
+            self._inboxes = self.__empty_inboxes()
+            if logged is not None:
+                self.__log_output(writer, output_path, logged, skin_counts, [c for c, _ in replies],
+                                  listener, wide_path)
+            self.__rebuild({block: packed for _, blocks in replies for block, packed in blocks.items()})
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            writer.close(error)
+
+    def __rebuild(self, blocks: Dict[int, Tuple]):
+        """Replace the skin of the system with the gathered state."""
+        root = self._root
+        root.objects = self._skin.objects.copy()
+        root.children.clear()
+        for block in sorted(blocks):
+            child = unpack_membrane(blocks[block])
+            child.parent = root
+            root.add_child(child)
+
+    def close(self):
+        """Stop the shards."""
+        for shard in self._shards:
+            shard.close()
+        self._shards = []
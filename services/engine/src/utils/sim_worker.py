@@ -0,0 +1,360 @@
+import time
+import queue
+import multiprocessing
+
+from collections import deque
+from typing import Dict, List, Tuple, Union
+
+from src.utils.aux import RUNS_PATH
+
+"""
+Background simulation worker module.
+
+This module runs a P-System in a worker process, so a caller such as the GUI
+stays responsive while the simulation runs. The engine lives in the worker for
+as long as it is open and runs the steps requested with `run`; the output
+counts of every logged step are sent back through a queue, and `poll` collects
+them without blocking together with the progress of the run.
+
+Runs are paused, resumed and cancelled cooperatively with a `RunControl`: the
+step loop of the engine checks it before every step, so a paused run stops
+between two steps and a cancelled run ends after the step in course, leaving
+the engine in a consistent state to keep stepping it.
+"""
+
+IDLE = 'idle'
+RUNNING = 'running'
+PAUSED = 'paused'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+# Logged steps used to estimate the speed of a run
+RATE_WINDOW = 32
+
+# Seconds between checks that the worker process is still alive while it builds the engine
+START_POLL_S = 0.2
+
+# Engine settings a worker accepts, with the setter that applies them
+SETTINGS = {
+    'trace': 'set_trace_level',
+    'timings': 'set_timings',
+    'wide_output': 'set_wide_output',
+    'rule_stats': 'set_rule_stats',
+    'memory': 'set_memory_profile',
+    'structure': 'set_structure_snapshots',
+}
+
+
+class RunControl:
+    """Pause, resume and cancel flags of a run, shared between processes."""
+
+    def __init__(self, context=None):
+        """Initialize the flags: not paused and not cancelled.
+
+        Args:
+            context (optional): Multiprocessing context of the processes that
+                share the control. Defaults to the spawn context.
+        """
+        context = context if context is not None else multiprocessing.get_context('spawn')
+        self._running = context.Event()
+        self._cancelled = context.Event()
+        self._running.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        """Cancel the run, waking it up if it is paused."""
+        self._cancelled.set()
+        self._running.set()
+
+    def reset(self):
+        """Clear the flags before a new run."""
+        self._cancelled.clear()
+        self._running.set()
+
+    def proceed(self) -> bool:
+        """Wait while the run is paused.
+
+        Returns:
+            bool: False if the run was cancelled and must stop.
+        """
+        self._running.wait()
+        return not self._cancelled.is_set()
+
+
+def _worker_main(model: Tuple, options: Dict, control: RunControl, commands, events):
+    """Build the engine and run every command until None."""
+    from src.classes.p_system import PSystem
+
+    engine = None
+    try:
+        alphabet, rules, output, root = model
+        engine = PSystem(alpha=alphabet, membranes=root, rules=rules, out=output,
+                         inference=options['inference'], runs_path=options['runs_path'])
+        engine.seed(options['seed'])
+        engine.set_replay(options['keyframes'])
+        for name, value in options['settings'].items():
+            getattr(engine, SETTINGS[name])(value)
+        engine.set_selection(options['selection'], options['workers'])
+        engine.set_shards(options['shards'], options['shard_processes'])
+        engine.set_control(control)
+        engine.set_step_listener(lambda step, counts: events.put(('step', step, counts, time.monotonic())))
+    except Exception as error:
+        if engine is not None:
+            engine.close()
+        events.put((FAILED, f'{type(error).__name__}: {error}'))
+        return
+    events.put(('ready', engine.run_id, engine.output_file, engine.replay_file, engine.output_objects))
+
+    # The engine keeps its selection workers between runs
+    with engine:
+        while True:
+            command = commands.get()
+            if command is None:
+                break
+            _, max_steps = command
+            try:
+                engine.run(max_steps)
+                events.put((CANCELLED if control.cancelled else DONE, engine.step))
+            except Exception as error:
+                events.put((FAILED, f'{type(error).__name__}: {error}'))
+    # Closing: the events nobody will read must not keep the process alive
+    events.cancel_join_thread()
+
+
+class SimulationWorker:
+    """P-System running in a worker process.
+
+    Attributes:
+        state (str): IDLE before the first run, RUNNING, PAUSED, DONE,
+            CANCELLED or FAILED.
+        step (int): Last logged step.
+        error (Union[str, None]): Error of a failed run.
+        run_id (Union[str, None]): Run directory of the engine, once started.
+        output_file (Union[str, None]): Output CSV of the engine, once started.
+        replay_file (Union[str, None]): Replay file of the engine, once started.
+        objects (List[str]): Output objects of the engine, once started.
+    """
+
+    def __init__(self, model: Tuple, inference: str, seed: Union[int, None] = None,
+                 keyframes: Union[int, None] = None, runs_path: str = RUNS_PATH, selection: Union[str, None] = None,
+                 workers: Union[int, None] = None, shards: Union[int, None] = None, shard_processes: bool = True,
+                 **settings):
+        """Initialize a worker. The process is started by `start`.
+
+        Args:
+            model (Tuple): Alphabet, rules, output and root membrane of the
+                system. The worker runs on a copy, the root is not modified.
+            inference (str): Inference mode.
+            seed (Union[int, None], optional): Seed of the engine.
+            keyframes (Union[int, None], optional): Replay keyframe interval,
+                None to record no replay.
+            runs_path (str, optional): Directory of the run outputs.
+            selection (Union[str, None], optional): Selection backend, see
+                `PSystem.set_selection`. Defaults to the serial engine.
+            workers (Union[int, None], optional): Workers of the selection backend.
+            shards (Union[int, None], optional): Shards of the run, see
+                `PSystem.set_shards`. Defaults to a single-process run.
+            shard_processes (bool, optional): Run the shards in worker processes.
+            **settings: Other engine settings, keyed by the names in SETTINGS.
+
+        Raises:
+            ValueError: If a setting is not in SETTINGS.
+        """
+        unknown = set(settings) - set(SETTINGS)
+        if unknown:
+            raise ValueError(f'Unknown engine settings: {", ".join(sorted(unknown))}')
+        self._model = model
+        self._options = {'inference': inference, 'seed': seed, 'keyframes': keyframes, 'runs_path': runs_path,
+                         'selection': selection, 'workers': workers, 'shards': shards,
+                         'shard_processes': shard_processes, 'settings': settings}
+        self._context = multiprocessing.get_context('spawn')
+        self._control = RunControl(self._context)
+        self._commands = None
+        self._events = None
+        self._process = None
+        self._rates = deque(maxlen=RATE_WINDOW)
+        self._target = None
+        self.state = IDLE
+        self.step = 0
+        self.error = None
+        self.run_id = None
+        self.output_file = None
+        self.replay_file = None
+        self.objects = []
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def busy(self) -> bool:
+        """Whether a run is in course, paused or not."""
+        return self.state in (RUNNING, PAUSED)
+
+    def start(self, timeout: Union[float, None] = None):
+        """Start the worker process and wait until its engine is built.
+
+        Args:
+            timeout (Union[float, None], optional): Seconds to wait for the engine.
+
+        Raises:
+            RuntimeError: If the engine could not be built, the process exited before it was
+                ready or it was not ready within ``timeout`` seconds.
+        """
+        self._commands = self._context.Queue()
+        self._events = self._context.Queue()
+        self._process = self._context.Process(target=_worker_main, daemon=True,
+                                              args=(self._model, self._options, self._control,
+                                                    self._commands, self._events))
+        self._process.start()
+        self._model = None
+        event = self.__wait_ready(timeout)
+        if event[0] == FAILED:
+            self.state = FAILED
+            self.error = event[1]
+            raise RuntimeError(f'The simulation worker could not build the engine: {self.error}')
+        _, self.run_id, self.output_file, self.replay_file, self.objects = event
+
+    def __wait_ready(self, timeout: Union[float, None]) -> tuple:
+        """First event of the worker, checking that its process is still alive while waiting."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = START_POLL_S if deadline is None else min(START_POLL_S, max(deadline - time.monotonic(), 0))
+            try:
+                return self._events.get(timeout=wait)
+            except queue.Empty:
+                pass
+            if not self._process.is_alive():
+                # The event may have been sent right before the process exited
+                try:
+                    return self._events.get(timeout=START_POLL_S)
+                except queue.Empty:
+                    return FAILED, f'The worker process exited with code {self._process.exitcode}'
+            if deadline is not None and time.monotonic() >= deadline:
+                return FAILED, f'The engine was not ready after {timeout} s'
+
+    def run(self, max_steps: Union[int, None] = None):
+        """Run up to ``max_steps`` steps in the background.
+
+        Raises:
+            RuntimeError: If the worker is not started or a run is in course.
+        """
+        if not self.alive:
+            raise RuntimeError('The simulation worker is not running')
+        if self.busy:
+            raise RuntimeError('The simulation worker is already running')
+        self._control.reset()
+        self._rates.clear()
+        self._target = None if max_steps is None else self.step + max_steps
+        self.state = RUNNING
+        self.error = None
+        self._commands.put(('run', max_steps))
+
+    def pause(self):
+        if self.state == RUNNING:
+            self._control.pause()
+            self.state = PAUSED
+
+    def resume(self):
+        if self.state == PAUSED:
+            self._control.resume()
+            self.state = RUNNING
+
+    def cancel(self):
+        """Stop the run in course after its current step."""
+        if self.busy:
+            self._control.cancel()
+
+    def poll(self, timeout: float = 0.0) -> List[Tuple[int, List[Tuple[str, int]]]]:
+        """Collect the steps logged since the last call.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the first event.
+                Defaults to 0, not blocking.
+
+        Returns:
+            List[Tuple[int, List[Tuple[str, int]]]]: Step and ``(object, count)``
+                pairs of every logged step, in order.
+        """
+        steps = []
+        if self._events is None:
+            return steps
+        try:
+            event = self._events.get(timeout=timeout) if timeout > 0 else self._events.get_nowait()
+            while True:
+                self.__handle(event, steps)
+                event = self._events.get_nowait()
+        except queue.Empty:
+            pass
+        if self.busy and not self.alive:
+            self.state = FAILED
+            self.error = f'The simulation worker exited with code {self._process.exitcode}'
+        return steps
+
+    def __handle(self, event: Tuple, steps: List):
+        kind = event[0]
+        if kind == 'step':
+            _, step, counts, timestamp = event
+            steps.append((step, counts))
+            self.step = step
+            self._rates.append((step, timestamp))
+        elif kind in (DONE, CANCELLED):
+            self.state = kind
+            self.step = event[1]
+        elif kind == FAILED:
+            self.state = FAILED
+            self.error = event[1]
+
+    def progress(self) -> Dict:
+        """Progress of the current or last run.
+
+        Returns:
+            Dict: ``state``, last logged ``step``, ``target`` step (None when
+                unlimited), ``steps_per_s`` over the last RATE_WINDOW logged
+                steps and ``eta_s`` (None when unknown).
+        """
+        rate = None
+        if len(self._rates) > 1:
+            (first_step, first_time), (last_step, last_time) = self._rates[0], self._rates[-1]
+            if last_time > first_time:
+                rate = (last_step - first_step) / (last_time - first_time)
+        eta = None
+        if rate and self._target is not None and self.busy:
+            eta = max(self._target - self.step, 0) / rate
+        return {'state': self.state, 'step': self.step, 'target': self._target, 'steps_per_s': rate, 'eta_s': eta}
+
+    def close(self, timeout: float = 5.0):
+        """Cancel any run in course and stop the worker process."""
+        if self._process is None:
+            return
+        self._control.cancel()
+        if self._process.is_alive():
+            self._commands.put(None)
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+        self._process = None
+        self._commands = None
+        self._events = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,218 @@
+import json
+
+from typing import Dict, Iterable, List, Tuple
+
+from src.classes.membrane import Membrane
+
+"""
+Structure export module for membrane structures.
+
+A snapshot of the membrane structure is exported as a compact JSON tree in
+one pass over the membranes. Identical subtrees, with the same ids,
+multiplicities, objects and children, are written once: a membrane lists
+every distinct child subtree with the number of siblings equal to it, so a
+skin with a thousand identical cells is a single ``×1000`` child. A snapshot
+is a table of distinct nodes, children before their parents, and the index of
+the root node:
+
+    {"step": 10, "membranes": 1001, "root": 1,
+     "nodes": [["cell", 1, {"a": 2}, []], ["skin", 1, {}, [[0, 1000]]]]}
+
+Snapshots of a run are written as JSON lines, and `viewer_html` renders any
+number of them as a standalone page that only builds the rows of the
+expanded membranes, and only draws the rows in view, so its cost does not
+grow with the size of the structure.
+"""
+
+# Node layout: (id, multiplicity, objects, [(child node, siblings)])
+NODE_ID, NODE_MUL, NODE_OBJECTS, NODE_CHILDREN = range(4)
+
+
+def export_structure(root: Membrane, step: int = 0) -> Dict:
+    """Export a membrane structure as a snapshot with identical siblings collapsed.
+
+    Args:
+        root (Membrane): Root of the structure.
+        step (int, optional): Step of the snapshot.
+
+    Returns:
+        Dict: ``step``, number of ``membranes``, ``nodes`` and ``root`` node.
+    """
+    nodes: List[list] = []
+    index: Dict[Tuple, int] = dict()
+    node_of: Dict[int, int] = dict()
+    membranes = 0
+    # Children before their parents: a reversed preorder
+    order = []
+    pending = [root]
+    while pending:
+        membrane = pending.pop()
+        order.append(membrane)
+        pending.extend(membrane.children)
+    for membrane in reversed(order):
+        membranes += 1
+        siblings: Dict[int, int] = dict()
+        for child in membrane.children:
+            node = node_of.pop(id(child))
+            siblings[node] = siblings.get(node, 0) + 1
+        objects = tuple(sorted((obj, int(count)) for obj, count in membrane.objects.items()))
+        key = (membrane.id, membrane.multiplicity, objects, tuple(siblings.items()))
+        node = index.get(key)
+        if node is None:
+            node = index[key] = len(nodes)
+            nodes.append([membrane.id, membrane.multiplicity, dict(objects),
+                          [[child, times] for child, times in siblings.items()]])
+        node_of[id(membrane)] = node
+    return {'step': step, 'membranes': membranes, 'root': node_of[id(root)], 'nodes': nodes}
+
+
+def snapshot_line(snapshot: Dict) -> bytes:
+    """JSON line of a snapshot, for the structure file of a run."""
+    return (json.dumps(snapshot, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def read_snapshots(path: str) -> List[Dict]:
+    """Snapshots of a structure file, in order."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def count_membranes(snapshot: Dict) -> int:
+    """Membranes of a snapshot, counting every collapsed sibling."""
+    totals = []
+    for _, _, _, children in snapshot['nodes']:
+        totals.append(1 + sum(totals[child] * times for child, times in children))
+    return totals[snapshot['root']]
+
+
+def viewer_html(snapshots: Iterable[Dict], title: str = 'Membrane structure') -> str:
+    """Standalone HTML page to browse snapshots of a membrane structure.
+
+    Membranes are expanded on click, starting with the root, and the rows of
+    the expanded membranes are drawn only while they are in view.
+
+    Args:
+        snapshots (Iterable[Dict]): Snapshots to browse, selected with a slider.
+        title (str, optional): Title of the page.
+
+    Returns:
+        str: The page, with the snapshots embedded.
+    """
+    data = json.dumps(list(snapshots), separators=(',', ':')).replace('</', '<\\/')
+    return VIEWER_TEMPLATE.replace('{{title}}', title).replace('{{data}}', data)
+
+
+def write_viewer(path: str, snapshots: Iterable[Dict], title: str = 'Membrane structure'):
+    """Write the viewer page of some snapshots (see `viewer_html`)."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(viewer_html(snapshots, title))
+
+
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>{{title}}</title>
+<style>
+  body { font-family: sans-serif; margin: 16px; }
+  #bar { display: flex; gap: 12px; align-items: center; margin-bottom: 8px; }
+  #bar input { flex: 1; }
+  #view { height: 80vh; overflow-y: auto; position: relative; border: 1px solid #ccc; border-radius: 6px; }
+  #rows { position: relative; }
+  .row { position: absolute; left: 0; right: 0; height: 22px; line-height: 22px; white-space: nowrap;
+         overflow: hidden; text-overflow: ellipsis; font-family: monospace; font-size: 13px; cursor: pointer; }
+  .row:hover { background: #eef4fb; }
+  .id { color: #005a9c; font-weight: bold; }
+  .times { color: #7a3e9d; font-weight: bold; }
+  .objects { color: #c93756; }
+</style>
+</head>
+<body>
+<div id="bar">
+  <span id="step"></span>
+  <input id="slider" type="range" min="0" value="0">
+  <span id="count"></span>
+</div>
+<div id="view"><div id="rows"></div></div>
+<script id="data" type="application/json">{{data}}</script>
+<script>
+const ROW = 22;
+const snapshots = JSON.parse(document.getElementById('data').textContent);
+const view = document.getElementById('view');
+const rowsDiv = document.getElementById('rows');
+const slider = document.getElementById('slider');
+const expanded = new Set(['r']);
+let snapshot = null;
+let rows = [];
+
+function objectsText(objects) {
+  const entries = Object.entries(objects);
+  return entries.length ? '{' + entries.map(([o, n]) => o + ': ' + n).join(', ') + '}' : '';
+}
+
+// Rows of the expanded membranes only, walking the node table from the root
+function buildRows() {
+  rows = [];
+  const pending = [[snapshot.root, 1, 'r', 0]];
+  while (pending.length) {
+    const [node, times, key, depth] = pending.pop();
+    rows.push([node, times, key, depth]);
+    if (!expanded.has(key)) continue;
+    const children = snapshot.nodes[node][3];
+    for (let i = children.length - 1; i >= 0; i--) {
+      pending.push([children[i][0], children[i][1], key + '.' + i, depth + 1]);
+    }
+  }
+  rowsDiv.style.height = (rows.length * ROW) + 'px';
+}
+
+// Only the rows in view are in the document
+function draw() {
+  const first = Math.max(0, Math.floor(view.scrollTop / ROW) - 10);
+  const last = Math.min(rows.length, first + Math.ceil(view.clientHeight / ROW) + 20);
+  const html = [];
+  for (let i = first; i < last; i++) {
+    const [node, times, key, depth] = rows[i];
+    const [id, mul, objects, children] = snapshot.nodes[node];
+    const marker = children.length ? (expanded.has(key) ? '▾' : '▸') : '·';
+    html.push('<div class="row" data-key="' + key + '" style="top:' + (i * ROW) + 'px;padding-left:' +
+              (8 + depth * 18) + 'px">' + marker + ' <span class="id"></span>' +
+              (times > 1 ? ' <span class="times">×' + times + '</span>' : '') +
+              ' (mul=' + mul + ') <span class="objects"></span></div>');
+  }
+  rowsDiv.innerHTML = html.join('');
+  // Ids and objects come from the model files: set as text, never as markup
+  const nodes = rowsDiv.children;
+  for (let i = first; i < last; i++) {
+    const [id, , objects] = snapshot.nodes[rows[i][0]];
+    nodes[i - first].querySelector('.id').textContent = id;
+    nodes[i - first].querySelector('.objects').textContent = objectsText(objects);
+  }
+}
+
+function show(i) {
+  snapshot = snapshots[i];
+  document.getElementById('step').textContent = 'Step ' + snapshot.step;
+  document.getElementById('count').textContent = snapshot.membranes + ' membranes';
+  buildRows();
+  draw();
+}
+
+rowsDiv.addEventListener('click', (event) => {
+  const row = event.target.closest('.row');
+  if (!row) return;
+  const key = row.dataset.key;
+  if (expanded.has(key)) expanded.delete(key); else expanded.add(key);
+  buildRows();
+  draw();
+});
+view.addEventListener('scroll', () => requestAnimationFrame(draw));
+slider.max = Math.max(snapshots.length - 1, 0);
+slider.value = slider.max;
+slider.hidden = snapshots.length < 2;
+slider.addEventListener('input', () => show(Number(slider.value)));
+if (snapshots.length) show(snapshots.length - 1);
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,88 @@
+from time import perf_counter_ns
+from typing import Dict
+
+"""
+Step phase timing module for membrane computing simulations.
+
+This module measures how long every step of a simulation spends in each of
+its phases with `time.perf_counter_ns`, and serializes the durations as CSV
+rows that are written next to the run output.
+"""
+
+SELECTION, APPLICATION, OUTPUT, TRACE = range(4)
+PHASES = ('selection', 'application', 'output', 'trace')
+
+
+class PhaseTimer:
+    """Accumulates the duration of the phases of every step.
+
+    The step loop takes a timestamp when a phase starts and calls `lap` when it
+    ends, which adds the elapsed time to the phase and returns the timestamp to
+    use for the next one:
+
+        t = perf_counter_ns()
+        step_fn(root)
+        t = timer.lap(SELECTION, t)
+        apply_rules()
+        t = timer.lap(APPLICATION, t)
+
+    Phases are ``selection`` (walking the membranes to choose the rules),
+    ``application`` (applying them, including handing events to the trace
+    recorder), ``output`` (serializing the output and the replay deltas) and
+    ``trace`` (handing the trace events to the writer).
+    """
+
+    def __init__(self):
+        """Initialize a timer with every phase at zero."""
+        self._current = [0] * len(PHASES)
+        self._totals = [0] * len(PHASES)
+        self._steps = 0
+
+    @staticmethod
+    def now() -> int:
+        """Current timestamp in nanoseconds."""
+        return perf_counter_ns()
+
+    def lap(self, phase: int, start: int) -> int:
+        """Add the time elapsed since ``start`` to a phase of the current step.
+
+        Args:
+            phase (int): Phase index, one of SELECTION, APPLICATION, OUTPUT, TRACE.
+            start (int): Timestamp taken when the phase started.
+
+        Returns:
+            int: Timestamp taken when the phase ended.
+        """
+        now = perf_counter_ns()
+        self._current[phase] += now - start
+        return now
+
+    def end_step(self, step: int) -> bytes:
+        """Close a step and reset the phase durations.
+
+        Args:
+            step (int): The step that has just finished.
+
+        Returns:
+            bytes: CSV row with the step and the duration of each phase in ns.
+        """
+        row = self._current
+        for i, duration in enumerate(row):
+            self._totals[i] += duration
+        self._current = [0] * len(PHASES)
+        self._steps += 1
+        return (f'{step},' + ','.join(map(str, row)) + '\n').encode('utf-8')
+
+    @staticmethod
+    def header() -> bytes:
+        """CSV header of the rows returned by `end_step`."""
+        return ('step,' + ','.join(f'{phase}_ns' for phase in PHASES) + '\n').encode('utf-8')
+
+    @property
+    def steps(self) -> int:
+        """Gets the number of timed steps."""
+        return self._steps
+
+    def totals(self) -> Dict[str, int]:
+        """Total duration of every phase over the timed steps, in ns."""
+        return dict(zip(PHASES, self._totals))
@@ -0,0 +1,248 @@
+import json
+import numpy as np
+
+from array import array
+from typing import Dict, Iterator, List, Tuple, Union
+
+from src.enums.constants import MoveCode, TraceLevel
+
+"""
+Rule application trace module for membrane computing systems.
+
+This module records which rules are applied at every step of a simulation
+as compact binary events, and formats them as human readable text only when
+somebody asks for it through a viewer.
+"""
+
+TRACE_FIELDS = ('step', 'membrane', 'rule', 'multiplicity')
+TRACE_DTYPE = np.int64
+BINARY_FORMAT = '.bin'
+LABELS_FORMAT = '.json'
+AGGREGATED = -1
+
+
+class TraceRecorder:
+    """Records rule applications as fixed-size binary events.
+
+    Every event is stored as four signed 64-bit integers
+    ``(step, membrane handle, rule id, multiplicity)``. Rule ids are positions
+    in the rule table of the system, and membrane handles are the integers
+    assigned by the system to each membrane, so no text is built while the
+    simulation runs.
+
+    With ``TraceLevel.COUNTS`` the applications are aggregated by rule within
+    a step and the events use ``-1`` as membrane handle.
+
+    Events are kept in memory only until they are taken with `take`, which
+    returns them already serialized so they can be handed to a writer.
+
+    Attributes:
+        level (str): Trace level, one of ``TraceLevel.COUNTS`` or ``TraceLevel.FULL``.
+        rules (List[Tuple[str, Rule]]): Rule table as ``(membrane id, rule)`` pairs.
+        membranes (List[str]): Membrane id of every membrane handle.
+    """
+
+    def __init__(self, level: str, rules: List[Tuple], membranes: List[str]):
+        """Initialize an empty recorder.
+
+        Args:
+            level (str): Trace level, ``TraceLevel.COUNTS`` or ``TraceLevel.FULL``.
+            rules (List[Tuple]): Rule table as ``(membrane id, rule)`` pairs.
+            membranes (List[str]): Membrane id of every membrane handle.
+
+        Raises:
+            ValueError: If the level is not a recording level.
+        """
+        if level not in (TraceLevel.COUNTS, TraceLevel.FULL):
+            raise ValueError(f'Trace level "{level}" does not record events')
+        self._level = level
+        self._rules = rules
+        self._membranes = membranes
+        self._rule_ids = {id(rule): i for i, (_, rule) in enumerate(rules)}
+        self._events = array('q')
+        self._counts = dict()
+        self._recorded = 0
+
+        self.record = self.__record_full if level == TraceLevel.FULL else self.__record_count
+
+    @property
+    def level(self) -> str:
+        """Gets the trace level."""
+        return self._level
+
+    @property
+    def rules(self) -> List[Tuple]:
+        """Gets the rule table used to resolve rule ids."""
+        return self._rules
+
+    @property
+    def membranes(self) -> List[str]:
+        """Gets the membrane ids indexed by membrane handle."""
+        return self._membranes
+
+    def __len__(self):
+        """Number of events recorded so far, including the ones already taken."""
+        return self._recorded + len(self._events) // len(TRACE_FIELDS)
+
+    def __record_full(self, step: int, handle: int, rule, multiplicity: int):
+        self._events.extend((step, handle, self._rule_ids[id(rule)], multiplicity))
+
+    def __record_count(self, step: int, handle: int, rule, multiplicity: int):
+        rule_id = self._rule_ids[id(rule)]
+        self._counts[rule_id] = self._counts.get(rule_id, 0) + multiplicity
+
+    def end_step(self, step: int):
+        """Close a step, turning the aggregated counts into events.
+
+        Args:
+            step (int): The step that has just been applied.
+        """
+        if self._counts:
+            for rule_id in sorted(self._counts):
+                self._events.extend((step, AGGREGATED, rule_id, self._counts[rule_id]))
+            self._counts.clear()
+
+    def take(self) -> bytes:
+        """Take the events recorded since the last call.
+
+        Returns:
+            bytes: Events serialized as raw little-endian int64 values, ready to be
+                appended to a ``.bin`` trace file.
+        """
+        events = np.frombuffer(self._events, dtype=TRACE_DTYPE).astype('<i8').tobytes()
+        self._recorded += len(self._events) // len(TRACE_FIELDS)
+        self._events = array('q')
+        return events
+
+    def labels(self) -> Dict:
+        """Build the labels needed to format the events outside this process.
+
+        Returns:
+            Dict: Trace level, field names, rule descriptions and membrane ids.
+        """
+        return {
+            'level': self._level,
+            'fields': TRACE_FIELDS,
+            'rules': [[mem_id, rule.move, str(rule)] for mem_id, rule in self._rules],
+            'membranes': self._membranes,
+        }
+
+    def serialized_labels(self) -> bytes:
+        """Get the labels serialized as the content of a ``.json`` trace file."""
+        return json.dumps(self.labels()).encode('utf-8')
+
+
+class TraceViewer:
+    """Formats recorded trace events as text on demand.
+
+    Attributes:
+        level (str): Trace level of the recorded events.
+        events (np.ndarray): Array of shape (n_events, 4) with the recorded events.
+    """
+
+    def __init__(self, events: np.ndarray, labels: Dict):
+        """Initialize a viewer over a set of events.
+
+        Args:
+            events (np.ndarray): Array of shape (n_events, 4) with the recorded events.
+            labels (Dict): Labels as produced by ``TraceRecorder.labels``.
+        """
+        self._events = events
+        self._level = labels['level']
+        self._rules = labels['rules']
+        self._membranes = labels['membranes']
+
+    @classmethod
+    def load(cls, path: str) -> 'TraceViewer':
+        """Create a viewer from a trace written to disk during a run.
+
+        Args:
+            path (str): Path of the trace without extension.
+        """
+        with open(path + LABELS_FORMAT, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+        events = np.fromfile(path + BINARY_FORMAT, dtype='<i8').reshape(-1, len(TRACE_FIELDS))
+        return cls(events, labels)
+
+    @property
+    def level(self) -> str:
+        """Gets the trace level of the recorded events."""
+        return self._level
+
+    @property
+    def events(self) -> np.ndarray:
+        """Gets the recorded events."""
+        return self._events
+
+    def steps(self, start: Union[int, None] = None, stop: Union[int, None] = None) -> np.ndarray:
+        """Select the events of a range of steps.
+
+        Args:
+            start (Union[int, None]): First step included. Defaults to the first one.
+            stop (Union[int, None]): Last step included. Defaults to the last one.
+
+        Returns:
+            np.ndarray: Events whose step is within the range.
+        """
+        mask = np.ones(len(self._events), dtype=bool)
+        if start is not None:
+            mask &= self._events[:, 0] >= start
+        if stop is not None:
+            mask &= self._events[:, 0] <= stop
+        return self._events[mask]
+
+    def totals(self) -> Dict[Tuple[str, str], int]:
+        """Total number of applications of every rule.
+
+        Returns:
+            Dict[Tuple[str, str], int]: Applications keyed by (membrane id, rule description).
+        """
+        totals = np.bincount(self._events[:, 2], weights=self._events[:, 3], minlength=len(self._rules))
+        return {(mem_id, label): int(total) for (mem_id, _, label), total in zip(self._rules, totals) if total > 0}
+
+    def format_event(self, event) -> str:
+        """Format a single event as a trace line.
+
+        Args:
+            event: Sequence with the fields in TRACE_FIELDS.
+
+        Returns:
+            str: Human readable description of the event.
+        """
+        _, handle, rule_id, multiplicity = (int(value) for value in event)
+        mem_id, move, label = self._rules[rule_id]
+        where = mem_id if handle == AGGREGATED else self._membranes[handle]
+        match move:
+            case MoveCode.MEMwOB.name | MoveCode.DISS_KEEP.name | MoveCode.DMEM.name if handle != AGGREGATED:
+                return f' - Applying {move} {where:>5} -> {label}'
+            case _:
+                return f' - Applying {move} {where:>5} -> {multiplicity} x {label}'
+
+    def lines(self, start: Union[int, None] = None, stop: Union[int, None] = None) -> Iterator[str]:
+        """Generate the text trace of a range of steps.
+
+        Args:
+            start (Union[int, None]): First step included. Defaults to the first one.
+            stop (Union[int, None]): Last step included. Defaults to the last one.
+
+        Yields:
+            str: Step headers followed by one line per event.
+        """
+        current = None
+        for event in self.steps(start, stop):
+            if event[0] != current:
+                current = event[0]
+                yield f'{"="*15} STEP {current} {"="*15}'
+            yield self.format_event(event)
+
+    def write(self, path: str, start: Union[int, None] = None, stop: Union[int, None] = None):
+        """Write the text trace of a range of steps to a file.
+
+        Args:
+            path (str): Destination text file.
+            start (Union[int, None]): First step included. Defaults to the first one.
+            stop (Union[int, None]): Last step included. Defaults to the last one.
+        """
+        with open(path, 'w+', encoding='utf-8') as f:
+            for line in self.lines(start, stop):
+                f.write(line + '\n')
@@ -1,6 +1,6 @@
-from collections import deque
 from typing import Dict, List, Tuple
 from xml.dom import minidom
+from xml.etree import ElementTree
 
 from src.classes.rule import Rule
 from src.classes.rule_dmem import RuleDMEM
@@ -8,6 +8,8 @@ from src.classes.objects_multiset import ObjectsMultiset
 from src.classes.membrane import Membrane
 from src.classes.p_system import PSystem
 from src.enums.constants import SceneObject, MoveCode
+from src.utils.replication import Replicator, variation
+from src.utils.aux import SCENES_PATH, RULES_PATH
 
 class XMLInputParser:
     """Parser for XML configuration files defining P-system scenes and rules.
@@ -27,51 +29,132 @@ class XMLInputParser:
                 along with other system parameters like inference settings.
         
         Note:
-            The constructor automatically loads and parses the XML files specified
-            in the config object. Scene and rules files are expected to be located
-            in '../../scenes/' and '../../rules/' directories respectively.
+            Files are read when the system is built in `parse`, or separately with
+            `load_scene` and `load_rules`. Scene and rules files are expected to be
+            located in '../../scenes/' and '../../rules/' directories respectively.
         """
-        scene_doc = minidom.parse(f'../../scenes/{config.scene}.xml')
-        
         self._config = config
-        self._rules = minidom.parse(f'../../rules/{config.rules}.xml')
-        self._scene_root = scene_doc.getElementsByTagName('config')[0]
+        self._scene_path = f'{SCENES_PATH}{config.scene}.xml'
+        self._rules_path = f'{RULES_PATH}{config.rules}.xml'
+
+    @property
+    def config(self):
+        """Gets the configuration the files are parsed with."""
+        return self._config
+
+    @property
+    def scene_path(self) -> str:
+        """Gets the path of the scene file."""
+        return self._scene_path
+
+    @property
+    def rules_path(self) -> str:
+        """Gets the path of the rules file."""
+        return self._rules_path
+
+    def load_scene(self) -> Membrane:
+        """Build the membrane structure described in the scene file."""
+        return self.iterate_scene_file(self._scene_path)
+
+    def load_rules(self) -> Tuple[Tuple[str], Dict, Dict | None]:
+        """Build the alphabet, rules and output described in the rules file."""
+        return self.iterate_rules_node(minidom.parse(self._rules_path))
+
+    def iterate_scene_file(self, path: str) -> Membrane:
+        """Stream a scene XML file to build the membrane structure.
+
+        The file is read with `ElementTree.iterparse` instead of being loaded as a
+        DOM. Membranes are created when their opening tag is read, objects are added
+        to the innermost open membrane, and every element is detached from the
+        partial tree as soon as it is closed. The structure is built with an explicit
+        stack instead of recursion, so peak memory depends on the depth of the
+        hierarchy and not on the size of the file. Comments are skipped by the
+        parser.
+
+        Membranes with a ``count`` attribute are templates: they are built like the
+        rest and, when their closing tag is read, their copies are added to the
+        parent in bulk by a `Replicator` (see `src.utils.replication`).
 
-    def iterate_scene_node(self, node, parent : None | Membrane = None ) -> Membrane:
-        """Recursively parse scene XML nodes to build the membrane structure.
-        
-        Traverses the XML scene tree and constructs the corresponding membrane
-        hierarchy with their contained objects. Creates parent-child relationships
-        between membranes and populates them with their initial object multisets.
-        
         Args:
-            node: XML node to process (typically the root config node).
-            parent: Parent membrane for the current node, None for root membrane.
-            
+            path (str): Path of the scene file.
+
         Returns:
             Membrane: The root membrane of the constructed hierarchy.
-            
-        Note:
-            This method handles both MEMBRANE and OBJECT node types, creating
-            the appropriate data structures and relationships between them.
+
+        Raises:
+            ValueError: If the scene has no root membrane, more than one, objects
+                outside of any membrane, a replicated root or variations outside of a
+                replicated membrane.
         """
-        for child in node.childNodes:
-            if child.nodeType == minidom.Node.ELEMENT_NODE:
-                attr = self.__get_node_attributes(child)
+        root = None
+        membranes = []          # Open membranes, innermost last
+        replicas = []           # (count, seed, variations) of each open membrane, None if not replicated
+        elements = []           # Open elements, to detach them once closed
+        in_config = False
+        replicator = Replicator(self._config.replication)
 
-                if child.nodeName == SceneObject.MEMBRANE:
-                    m_id, m_mul, m_cap = attr
+        for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                elements.append(element)
+                if tag == 'config':
+                    in_config = True
+                elif in_config and tag == SceneObject.MEMBRANE:
+                    m_id, m_mul, m_cap = self.__get_element_attributes(element)
                     membrane = Membrane(idx=m_id, multiplicity=m_mul, capacity=m_cap)
-                    if parent:
-                        parent.add_children(membrane)
+                    count = element.get('count')
+                    if count is not None:
+                        if not membranes:
+                            raise ValueError(f'The root membrane of the scene {path} cannot be replicated.')
+                        seed = element.get('seed')
+                        replicas.append((int(count), None if seed is None else int(seed), []))
+                    elif membranes:
+                        replicas.append(None)
+                        parent = membranes[-1]
+                        parent.add_child(membrane)
                         membrane.parent = parent
+                    elif root is None:
+                        replicas.append(None)
+                        root = membrane
+                    else:
+                        raise ValueError(f'The scene {path} has more than one root membrane.')
+                    membranes.append(membrane)
+                continue
+
+            if in_config:
+                if tag == SceneObject.OBJECT:
+                    if not membranes:
+                        raise ValueError(f'The scene {path} has objects outside of any membrane.')
+                    bo_v, bo_mul = self.__get_element_attributes(element)
+                    maximum, probability = element.get('mmax'), element.get('pb')
+                    if maximum is None and probability is None:
+                        membranes[-1].objects.add_object(bo_v, bo_mul)
+                    elif replicas[-1] is None:
+                        raise ValueError(f'The object "{bo_v}" of the scene {path} varies outside of a replicated membrane.')
                     else:
-                        parent = membrane
-                    self.iterate_scene_node(child, membrane)
-                elif child.nodeName == SceneObject.OBJECT:
-                    bo_v, bo_mul = attr
-                    parent.objects.add_object(bo_v, bo_mul)
-        return parent
+                        replicas[-1][2].append(variation(bo_v, bo_mul,
+                                                         None if maximum is None else int(maximum),
+                                                         None if probability is None else float(probability)))
+                elif tag == SceneObject.MEMBRANE:
+                    membrane, replica = membranes.pop(), replicas.pop()
+                    if replica is not None:
+                        count, seed, variations = replica
+                        parent = membranes[-1]
+                        copies = replicator.replicate(membrane, count, variations, seed)
+                        parent.add_children(copies)
+                        for copy in copies:
+                            copy.parent = parent
+                elif tag == 'config':
+                    in_config = False
+            # Free the closed element and detach it from its parent
+            elements.pop()
+            element.clear()
+            if elements:
+                elements[-1].remove(element)
+
+        if root is None:
+            raise ValueError(f'The scene {path} does not define any membrane.')
+        return root
     
     def iterate_rules_node(self, node: minidom.Document) -> Tuple[List[str], Dict]:
         """Parse the rules XML document to extract alphabet, rules, and output configuration.
@@ -337,42 +420,43 @@ class XMLInputParser:
         return None
 
     @staticmethod
-    def __get_node_attributes(node) -> List[str] | None:
-        """Extract attributes from XML nodes based on node type.
+    def __get_element_attributes(element) -> Tuple | None:
+        """Extract attributes from XML elements based on element type.
         
-        Static method that parses XML node attributes and returns them in
-        the appropriate format based on whether the node represents an
+        Static method that parses XML element attributes and returns them in
+        the appropriate format based on whether the element represents an
         object or a membrane.
         
         Args:
-            node: XML node to extract attributes from.
+            element (ElementTree.Element): XML element to extract attributes from.
             
         Returns:
-            List containing:
-                - For OBJECT nodes: [value, multiplicity]
-                - For MEMBRANE nodes: [id, multiplicity, capacity]
-                - None for unrecognized node types.
+            Tuple containing:
+                - For OBJECT elements: (value, multiplicity)
+                - For MEMBRANE elements: (id, multiplicity, capacity)
+                - None for unrecognized element types.
                 
         Note:
             Multiplicity and capacity values are converted to integers,
-            while IDs and values remain as strings.
+            while IDs and values remain as strings. The multiplicity of
+            membranes defaults to 1.
         """
-        if node.nodeName == SceneObject.OBJECT:
-            bo_v = node.getAttribute('v')
-            bo_mul = int(node.getAttribute('m'))
+        if element.tag == SceneObject.OBJECT:
+            bo_v = element.get('v')
+            bo_mul = int(element.get('m'))
             return  bo_v, bo_mul
-        if node.nodeName == SceneObject.MEMBRANE:
-            m_id  = node.getAttribute('id')
-            m_mul = int(node.getAttribute('m'))
-            m_cap = int(node.getAttribute('capacity'))
+        if element.tag == SceneObject.MEMBRANE:
+            m_id  = element.get('id')
+            m_mul = int(element.get('m', 1))
+            m_cap = int(element.get('capacity'))
             return m_id, m_mul, m_cap
         return None
 
     def parse(self) -> PSystem:
-        """Parse the loaded XML files and construct a complete P-system.
+        """Parse the XML files and construct a complete P-system.
         
         Main parsing method that orchestrates the extraction of all system
-        components from the loaded XML files and constructs a complete
+        components from the XML files and constructs a complete
         PSystem object ready for simulation.
         
         Returns:
@@ -383,8 +467,8 @@ class XMLInputParser:
             This method combines the results from scene and rules parsing to
             create a unified system representation.
         """
-        alphabet, rules, output = self.iterate_rules_node(self._rules)
-        membrane_root = self.iterate_scene_node(self._scene_root)
+        alphabet, rules, output = self.load_rules()
+        membrane_root = self.load_scene()
         system = PSystem(alpha=alphabet,
                          rules=rules,
                          membranes=membrane_root,
@@ -0,0 +1,97 @@
+import time
+import threading
+import pytest
+from src.enums.constants import RuleStatsLevel
+from src.utils.async_writer import AsyncWriter
+
+
+def blocked_writer(max_pending: int):
+    """Writer whose thread waits for the returned event before every write."""
+    writer = AsyncWriter(max_pending=max_pending)
+    release = threading.Event()
+    write_item = writer._AsyncWriter__write_item
+
+    def blocked(*item):
+        release.wait()
+        write_item(*item)
+    writer._AsyncWriter__write_item = blocked
+    return writer, release
+
+
+class TestAsyncWriter:
+
+    def test_writes_in_order(self, tmp_path):
+        """Cada fichero recibe sus buffers en el orden en que se encolan"""
+        paths = [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')]
+        with AsyncWriter(max_pending=4) as writer:
+            for i in range(200):
+                writer.write(paths[i % 2], f'{i}\n'.encode())
+            writer.replace(str(tmp_path / 'c.txt'), b'old')
+            writer.replace(str(tmp_path / 'c.txt'), b'new')
+        assert (tmp_path / 'a.txt').read_text().split() == [str(i) for i in range(0, 200, 2)]
+        assert (tmp_path / 'b.txt').read_text().split() == [str(i) for i in range(1, 200, 2)]
+        assert (tmp_path / 'c.txt').read_text() == 'new'
+
+    def test_backpressure(self, tmp_path):
+        """Con la cola llena, write espera a que el hilo escriba"""
+        writer, release = blocked_writer(max_pending=2)
+        path = str(tmp_path / 'out.txt')
+        # One buffer taken by the blocked thread and two queued
+        for _ in range(3):
+            writer.write(path, b'x')
+        producer = threading.Thread(target=writer.write, args=(path, b'y'))
+        producer.start()
+        producer.join(0.3)
+        assert producer.is_alive()
+        release.set()
+        producer.join(5)
+        assert not producer.is_alive()
+        writer.close()
+        assert (tmp_path / 'out.txt').read_text() == 'xxxy'
+
+    def test_error_raised_on_next_write(self, tmp_path):
+        writer = AsyncWriter()
+        writer.write(str(tmp_path / 'missing' / 'out.txt'), b'x')
+        with pytest.raises(FileNotFoundError):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                writer.write(str(tmp_path / 'out.txt'), b'y')
+                time.sleep(0.01)
+        # The error is raised once
+        writer.close()
+
+    def test_error_raised_on_close(self, tmp_path):
+        writer = AsyncWriter()
+        writer.write(str(tmp_path / 'missing' / 'out.txt'), b'x')
+        with pytest.raises(FileNotFoundError):
+            writer.close()
+
+    def test_error_does_not_replace_producer_error(self, tmp_path):
+        """Un error del hilo se añade como nota al error del productor"""
+        with pytest.raises(ValueError) as info:
+            with AsyncWriter() as writer:
+                writer.write(str(tmp_path / 'missing' / 'out.txt'), b'x')
+                raise ValueError('step failed')
+        assert 'FileNotFoundError' in info.value.__notes__[0]
+
+    def test_step_loop_error_flushes_outputs(self, tmp_path, build_system):
+        """Si el bucle de pasos falla, las salidas pendientes se escriben y el error no se pierde"""
+        system, _ = build_system()
+
+        def fail(step, counts):
+            if step == 5:
+                raise KeyboardInterrupt
+        system.set_step_listener(fail)
+        with pytest.raises(KeyboardInterrupt):
+            system.run(20)
+        steps = [line.split(',')[0] for line in (tmp_path / system.output_file).read_text().splitlines()[1:]]
+        assert steps[-1] == '5' and sorted(set(steps), key=int) == [str(step) for step in range(6)]
+
+        # The rule stats summary cannot be written over a directory
+        system, _ = build_system()
+        system.set_rule_stats(RuleStatsLevel.SUMMARY)
+        (tmp_path / system.rule_stats_file).mkdir()
+        system.set_step_listener(fail)
+        with pytest.raises(KeyboardInterrupt) as info:
+            system.run(20)
+        assert 'IsADirectoryError' in info.value.__notes__[0]
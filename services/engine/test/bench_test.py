@@ -0,0 +1,20 @@
+from types import SimpleNamespace
+from src.bench.scenes import write_scene
+from src.bench.suite import run_case
+from src.utils.xml_parser import XMLInputParser
+
+
+class TestBench:
+
+    def test_synthetic_scenes(self, tmp_path):
+        """Las escenas sintéticas tienen la población pedida"""
+        parser = XMLInputParser(SimpleNamespace(scene=None, rules=None, inference='maxpar', replication='expand'))
+        epidemic = parser.iterate_scene_file(write_scene('epidemic', 1003, str(tmp_path / 'epidemic.xml')))
+        assert sum(len(home.children) for home in epidemic.children if home.id.startswith('home')) == 1003
+        toy = parser.iterate_scene_file(write_scene('toy', 7, str(tmp_path / 'toy.xml')))
+        assert [m.id for m in toy.children] == ['2'] * 7 and toy.children[0].children[0].id == '3'
+
+    def test_run_case(self):
+        result = run_case('toy', 10, 'maxpar', steps=3)
+        assert result['steps'] == 3 and result['applications'] > 0
+        assert result['steps_per_s'] > 0 and result['applications_per_s'] > 0
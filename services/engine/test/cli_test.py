@@ -0,0 +1,38 @@
+import sys
+import subprocess
+import pytest
+from psys import build_arg_parser, cli_overrides, expand_manifest
+from src.utils.config_parser import ConfigParser
+
+
+class TestCli:
+
+    def test_expand_manifest(self):
+        """Las listas del manifiesto se expanden en todas sus combinaciones"""
+        runs = expand_manifest({'defaults': {'Runtime.MaxSteps': 10},
+                                'runs': [{'Input.Scene': 's', 'Input.Rules': ['r0', 'r1'], 'Runtime.Seed': [1, 2, 3]},
+                                         {'Input.Scene': 't', 'Runtime.MaxSteps': 5}]})
+        assert len(runs) == 7
+        assert runs[0] == {'Runtime.MaxSteps': 10, 'Input.Scene': 's', 'Input.Rules': 'r0', 'Runtime.Seed': 1}
+        assert runs[-1] == {'Runtime.MaxSteps': 5, 'Input.Scene': 't'}
+        with pytest.raises(ValueError):
+            expand_manifest({'runs': 'scene_00'})
+
+    def test_overrides(self):
+        """Los flags y --set sustituyen los campos del fichero de configuración"""
+        args = build_arg_parser().parse_args(['run', '--seed', '4', '--set', 'Runtime.Trace=counts',
+                                              '--set', 'Input.Scene=other', '--scene', 'toy_scene_00'])
+        config = ConfigParser(overrides={'Runtime.MaxSteps': 3, **cli_overrides(args)})
+        assert config.seed == 4 and config.max_steps == 3
+        assert config.trace == 'counts' and config.scene == 'toy_scene_00'
+        with pytest.raises(ValueError):
+            ConfigParser(overrides={'Seed': 1})
+
+    def test_parser_loads_no_heavy_modules(self):
+        """Construir la línea de comandos no importa el motor ni los procesos del benchmark"""
+        heavy = ('multiprocessing', 'concurrent.futures', 'numpy', 'src.bench.suite', 'src.bench.gate',
+                 'src.classes.p_system')
+        code = ('import sys, psys; psys.build_arg_parser(); '
+                f'print(",".join(m for m in {heavy!r} if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == ''
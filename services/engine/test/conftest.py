@@ -0,0 +1,29 @@
+import pytest
+from types import SimpleNamespace
+from src.classes.p_system import PSystem
+from src.utils.xml_parser import XMLInputParser
+
+
+@pytest.fixture
+def load_model():
+    """Loads the alphabet, rules, output and root membrane of a model."""
+    def load(scene: str = 'scene_00', rules: str = 'rules_00'):
+        parser = XMLInputParser(SimpleNamespace(scene=scene, rules=rules, replication='expand'))
+        alphabet, rules, output = parser.load_rules()
+        return alphabet, rules, output, parser.load_scene()
+    return load
+
+
+@pytest.fixture
+def build_system(tmp_path, load_model):
+    """Builds a seeded system that writes its runs to the temporary directory.
+
+    The factory returns the system and its root membrane.
+    """
+    def build(inference: str = 'maxpar', scene: str = 'scene_00', rules: str = 'rules_00', seed: int = 7):
+        alphabet, rules, output, root = load_model(scene, rules)
+        system = PSystem(alpha=alphabet, membranes=root, rules=rules, out=output,
+                         inference=inference, runs_path=f'{tmp_path}/')
+        system.seed(seed)
+        return system, root
+    return build
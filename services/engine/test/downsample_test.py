@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from src.enums.constants import Downsampling
+from src.utils.downsample import downsample
+
+
+class TestDownsample:
+
+    @pytest.mark.parametrize('method', [Downsampling.LTTB, Downsampling.MINMAX])
+    def test_budget_and_ends(self, method):
+        x = np.arange(10_000)
+        y = np.sin(x / 300.0) * 100
+        kept = downsample(x, y, 500, method)
+        assert len(kept) <= 500 and kept[0] == 0 and kept[-1] == len(x) - 1
+        assert np.all(np.diff(kept) > 0)
+
+    @pytest.mark.parametrize('method', [Downsampling.LTTB, Downsampling.MINMAX])
+    def test_keeps_spike(self, method):
+        """Un pico aislado se conserva al reducir la trayectoria"""
+        y = np.zeros(5_000)
+        y[3_217] = 1_000
+        assert 3_217 in downsample(np.arange(len(y)), y, 100, method)
+
+    def test_short_trajectory_unchanged(self):
+        x = np.arange(50)
+        assert np.array_equal(downsample(x, x, 100), x)
+
+    def test_invalid_method(self):
+        with pytest.raises(ValueError):
+            downsample(np.arange(10), np.arange(10), 5, 'average')
@@ -0,0 +1,25 @@
+from src.bench.gate import compare, format_report, median_mad
+
+
+def measurement(median, mad, applications=100, inference='maxpar'):
+    return {'workloads': [{'scenario': 'toy', 'membranes': 1000, 'inference': inference,
+                           'applications': applications, 'median_s': median, 'mad_s': mad}]}
+
+
+class TestGate:
+
+    def test_median_mad(self):
+        assert median_mad([1.0, 2.0, 3.0, 4.0, 100.0]) == (3.0, 1.0)
+
+    def test_compare(self):
+        """Una ralentización dentro del ruido no es una regresión"""
+        baseline = measurement(1.0, 0.01)
+        assert compare(baseline, measurement(1.05, 0.01))[0]['status'] == 'ok'
+        assert compare(baseline, measurement(1.5, 0.01))[0]['status'] == 'regression'
+        assert compare(baseline, measurement(0.5, 0.01))[0]['status'] == 'faster'
+        # A noisy measurement widens the threshold
+        assert compare(baseline, measurement(1.5, 0.2))[0]['status'] == 'ok'
+
+        row, = compare(baseline, measurement(1.5, 0.01, applications=90))
+        assert row['changed'] and 'regression (applications changed)' in format_report([row])
+        assert compare(baseline, measurement(1.0, 0.01, inference='minpar'))[0]['status'] == 'new'
@@ -0,0 +1,23 @@
+import csv
+from src.utils.memory_profile import membrane_sizes
+
+
+class TestMemoryProfile:
+
+    def test_run_writes_samples(self, tmp_path, build_system):
+        """Se escribe una muestra en el paso 0 y cada N pasos"""
+        system, root = build_system(seed=5)
+        system.set_memory_profile(2)
+        system.run(5)
+
+        with open(tmp_path / system.memory_file, newline='') as f:
+            samples = list(csv.DictReader(f))
+        assert [row['step'] for row in samples] == ['0', '2', '4']
+        assert int(samples[0]['membranes']) == membrane_sizes(root)[0]
+        assert all(int(row['rule_bytes']) > 0 for row in samples)
+        # The maximal parallelism selection copies and subtracts multisets
+        assert sum(int(row['multiset_allocs']) for row in samples) > 0
+
+        with open(tmp_path / system.memory_sites_file, newline='') as f:
+            modules = {row['module'] for row in csv.DictReader(f)}
+        assert 'src/classes/p_system.py' in modules
@@ -0,0 +1,86 @@
+import shutil
+from types import SimpleNamespace
+from src.utils.xml_parser import XMLInputParser
+from src.utils.json_parser import dump_scene, dump_rules
+from src.utils.model_cache import CachedParser, ModelCache
+
+
+def cached_parser(tmp_path, cache):
+    """Parser of a copy of the toy model, so the test can modify its files"""
+    for folder, name in (('scenes', 'toy_scene_00'), ('rules', 'toy_rules_00')):
+        (tmp_path / folder).mkdir(exist_ok=True)
+        shutil.copy(f'../../{folder}/{name}.xml', tmp_path / folder / f'{name}.xml')
+    parser = XMLInputParser(SimpleNamespace(scene='toy_scene_00', rules='toy_rules_00', inference='maxpar', format='xml', replication='expand'))
+    parser._scene_path = str(tmp_path / 'scenes' / 'toy_scene_00.xml')
+    parser._rules_path = str(tmp_path / 'rules' / 'toy_rules_00.xml')
+    return CachedParser(parser, cache)
+
+
+class TestModelCache:
+
+    def test_warm_start_matches_parsed_model(self, tmp_path):
+        """El modelo cargado de la caché es idéntico al parseado"""
+        cache = ModelCache(str(tmp_path / 'cache'), version='test')
+        cold = cached_parser(tmp_path, cache)
+        alphabet, rules, output, root = cold.load()
+        warm = cached_parser(tmp_path, cache)
+        cached = warm.load()
+
+        assert cold.hit is False and warm.hit is True
+        assert dump_scene(cached[3]) == dump_scene(root)
+        assert dump_rules(*cached[:3]) == dump_rules(alphabet, rules, output)
+
+    def test_stale_entries_are_replaced(self, tmp_path):
+        """Un cambio en la escena invalida la entrada y elimina la antigua"""
+        cache = ModelCache(str(tmp_path / 'cache'), version='test')
+        parser = cached_parser(tmp_path, cache)
+        parser.load()
+        scene = tmp_path / 'scenes' / 'toy_scene_00.xml'
+        scene.write_text(scene.read_text().replace('v="a" m="1"', 'v="a" m="5"'))
+
+        parser = CachedParser(parser._parser, cache)
+        root = parser.load_scene()
+        assert parser.hit is False
+        assert root.children[0].children[0].objects.count('a') == 5
+        assert len(list((tmp_path / 'cache').iterdir())) == 1
+
+    def test_engine_version_changes_key(self, tmp_path):
+        parser = cached_parser(tmp_path, None)
+        paths = (parser.scene_path, parser.rules_path, 'xml')
+        assert ModelCache(version='0.1').key(*paths) != ModelCache(version='0.2').key(*paths)
+
+    def test_rules_and_scene_load_the_model_once(self, tmp_path, monkeypatch):
+        cache = ModelCache(str(tmp_path / 'cache'), version='test')
+        cached_parser(tmp_path, cache).load()
+        reads = []
+        monkeypatch.setattr(cache, 'read', lambda *args: reads.append(args) or ModelCache.read(cache, *args))
+        parser = cached_parser(tmp_path, cache)
+        alphabet, rules, output = parser.load_rules()
+        root = parser.load_scene()
+        assert len(reads) == 1 and parser.hit is True
+        assert parser.load()[:3] == (alphabet, rules, output)
+
+    def test_every_load_builds_new_membranes(self, tmp_path):
+        """Dos sistemas del mismo parser no comparten sus membranas"""
+        cache = ModelCache(str(tmp_path / 'cache'), version='test')
+        for _ in range(2):
+            parser = cached_parser(tmp_path, cache)
+            first, second = parser.load_scene(), parser.load_scene()
+            assert first is not second and dump_scene(first) == dump_scene(second)
+            first.children[0].children[0].objects.add_object(obj='a', multiplicity=3)
+            assert dump_scene(parser.load_scene()) == dump_scene(second)
+
+    def test_options_keep_their_own_entries(self, tmp_path):
+        """Las entradas de otras opciones del mismo modelo no se eliminan"""
+        cache = ModelCache(str(tmp_path / 'cache'), version='test')
+        expanded = cached_parser(tmp_path, cache)._parser
+        compressed = cached_parser(tmp_path, cache)._parser
+        compressed.config.replication = 'compress'
+        hits = []
+        for _ in range(2):
+            for parser in (expanded, compressed):
+                cached = CachedParser(parser, cache)
+                cached.load()
+                hits.append(cached.hit)
+        assert hits == [False, False, True, True]
+        assert len(list((tmp_path / 'cache').iterdir())) == 2
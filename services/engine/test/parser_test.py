@@ -0,0 +1,95 @@
+import pytest
+from types import SimpleNamespace
+from src.classes.p_system import PSystem
+from src.utils.xml_parser import XMLInputParser
+from src.utils.json_parser import JSONInputParser, dump_scene, dump_rules
+
+
+def config(scene, rules, replication='expand'):
+    return SimpleNamespace(scene=scene, rules=rules, inference='maxpar', replication=replication)
+
+
+class TestParsers:
+
+    @pytest.mark.parametrize('scene,rules', [('scene_00', 'rules_00'), ('toy_scene_00', 'toy_rules_00')])
+    def test_json_matches_xml(self, scene, rules):
+        """Los ficheros JSON convertidos describen el mismo sistema que los XML"""
+        xml_parser = XMLInputParser(config(scene, rules))
+        json_parser = JSONInputParser(config(scene, rules))
+
+        assert dump_scene(json_parser.load_scene()) == dump_scene(xml_parser.load_scene())
+        assert dump_rules(*json_parser.load_rules()) == dump_rules(*xml_parser.load_rules())
+
+    def test_streaming_scene_structure(self):
+        """El parser XML en streaming mantiene la jerarquía y los objetos"""
+        root = XMLInputParser(config('toy_scene_00', None)).load_scene()
+        assert root.id == '1' and root.parent is None
+        inner = root.children[0].children[0]
+        assert inner.id == '3' and inner.parent is root.children[0]
+        assert inner.objects.multiset == {'a': 1, 'f': 1}
+
+    def test_streaming_scene_multiple_roots(self, tmp_path):
+        path = tmp_path / 'scene.xml'
+        path.write_text('<model><config><membrane id="1" m="1" capacity="1"/>'
+                        '<membrane id="2" m="1" capacity="1"/></config></model>')
+        with pytest.raises(ValueError):
+            XMLInputParser(config(None, None)).iterate_scene_file(str(path))
+
+    def test_json_scene_errors(self):
+        """Los errores de validación indican la ruta del elemento incorrecto"""
+        parser = JSONInputParser(config(None, None))
+        scene = {'membrane': {'id': 'a', 'capacity': 1, 'children': [{'id': 'b', 'capacity': 1, 'objects': {'x': -1}}]}}
+        with pytest.raises(ValueError, match=r'membrane.children\[0\].objects'):
+            parser.iterate_scene_node(scene)
+
+    def test_json_rules_errors(self):
+        parser = JSONInputParser(config(None, None))
+        rules = {'alphabet': ['a'], 'membranes': {'m': {'rBO': [{'pr': ['r0'], 'lh': {'a': 1}, 'rh': {'move': 'HERE'}}]}}}
+        with pytest.raises(ValueError, match='non-empty "id"'):
+            parser.iterate_rules_node(rules)
+
+    @pytest.fixture
+    def replicated(self, tmp_path):
+        xml_path = tmp_path / 'scene.xml'
+        xml_path.write_text('<model><config><membrane id="eco" capacity="10">'
+                            '<membrane id="h1" capacity="5" count="50" seed="3">'
+                            '<BO v="move" m="1"/><BO v="v1" m="1" pb="0.2"/><BO v="age" m="1" mmax="3"/>'
+                            '<membrane id="c" capacity="1"/></membrane>'
+                            '<membrane id="zone" capacity="5"/></membrane></config></model>')
+        scene = {'membrane': {'id': 'eco', 'capacity': 10, 'children': [
+                    {'id': 'h1', 'capacity': 5, 'count': 50, 'seed': 3, 'objects': {'move': 1},
+                     'variation': {'v1': {'m': 1, 'pb': 0.2}, 'age': {'m': 1, 'mmax': 3}},
+                     'children': [{'id': 'c', 'capacity': 1}]},
+                    {'id': 'zone', 'capacity': 5}]}}
+        return str(xml_path), scene
+
+    def test_replication_expand(self, replicated):
+        """Las membranas con count se replican igual en XML y JSON, con variaciones deterministas"""
+        xml_path, scene = replicated
+        root = XMLInputParser(config(None, None)).iterate_scene_file(xml_path)
+        assert [m.id for m in root.children] == ['h1'] * 50 + ['zone']
+        assert all(m.parent is root and m.children[0].parent is m for m in root.children[:50])
+        assert all(1 <= m.objects.count('age') <= 3 and m.objects.count('move') == 1 for m in root.children[:50])
+        assert 0 < sum(m.objects.count('v1') for m in root.children) < 50
+
+        json_root = JSONInputParser(config(None, None)).iterate_scene_node(scene)
+        again = XMLInputParser(config(None, None)).iterate_scene_file(xml_path)
+        assert dump_scene(json_root) == dump_scene(root) == dump_scene(again)
+
+    def test_replication_compress(self, tmp_path, replicated):
+        xml_path, scene = replicated
+        expanded = XMLInputParser(config(None, None)).iterate_scene_file(xml_path)
+        compressed = XMLInputParser(config(None, None, 'compress')).iterate_scene_file(xml_path)
+        assert len(compressed.children) < len(expanded.children)
+        assert sum(m.multiplicity for m in compressed.children[:-1]) == 50
+        counts = lambda root: sorted(sum(m.multiplicity * m.objects.count(obj) for m in root.children) for obj in ('v1', 'age'))
+        assert counts(compressed) == counts(expanded)
+        # The engine would simulate one membrane per group of copies
+        with pytest.raises(ValueError, match='multiplicity'):
+            PSystem(alpha=('v1', 'age'), membranes=compressed, rules=dict(), runs_path=f'{tmp_path}/')
+
+    def test_variation_outside_replica(self, tmp_path):
+        path = tmp_path / 'scene.xml'
+        path.write_text('<model><config><membrane id="1" capacity="1"><BO v="a" m="1" pb="0.5"/></membrane></config></model>')
+        with pytest.raises(ValueError, match='outside of a replicated'):
+            XMLInputParser(config(None, None)).iterate_scene_file(str(path))
@@ -0,0 +1,72 @@
+import pytest
+from src.classes.membrane import Membrane
+from src.classes.rule import Rule
+from src.classes.objects_multiset import ObjectsMultiset
+from src.utils.replay import Replay, ReplayRecorder, capture_state
+
+
+def build_structure():
+    root = Membrane(idx='eco', multiplicity=1, capacity=100)
+    for i, idx in enumerate(['home1', 'zone1', 'h1']):
+        child = Membrane(idx=idx, multiplicity=1, capacity=10, parent=root)
+        child.objects.add_object('move', i + 1)
+        root.add_child(child)
+    for handle, membrane in enumerate([root] + root.children):
+        membrane.handle = handle
+    return root
+
+
+def here_rule(left, right):
+    left_ms, right_ms = ObjectsMultiset(), ObjectsMultiset()
+    for obj, m in left.items():
+        left_ms.add_object(obj, m)
+    for obj, m in right.items():
+        right_ms.add_object(obj, m)
+    return Rule(left=left_ms, right=right_ms)
+
+
+class TestReplay:
+
+    @pytest.fixture
+    def recorded(self, tmp_path):
+        """Records 10 steps that change objects and move and dissolve membranes"""
+        root = build_structure()
+        recorder = ReplayRecorder(keyframe_interval=4)
+        path = tmp_path / 'run_replay.jsonl'
+        states = dict()
+        with open(path, 'wb') as f:
+            for step in range(10):
+                if step > 0:
+                    home = root.children[0]
+                    home.apply_here_rule(here_rule({}, {'a': step}), multiplicity=1)
+                    if step == 3:
+                        home.add_child(root.remove_child(2))
+                    if step == 6:
+                        root.children[1].apply_dissolve_to_parent_rule(here_rule({'move': 2}, {}))
+                f.write(recorder.record(step, root))
+                states[step] = capture_state(root)
+        return Replay(str(path)), states
+
+    def test_index(self, recorded):
+        """Los keyframes se guardan cada K pasos"""
+        replay, _ = recorded
+        assert replay.steps == list(range(10))
+        assert replay.keyframes == [0, 4, 8]
+
+    @pytest.mark.parametrize('step', [9, 0, 5, 6, 7, 3, 1])
+    def test_state_at(self, recorded, step):
+        """El estado reconstruido coincide con el de la simulación"""
+        replay, states = recorded
+        assert replay.state_at(step) == states[step]
+
+    def test_membranes_at(self, recorded):
+        """La estructura reconstruida mantiene jerarquía y objetos"""
+        replay, states = recorded
+        for step, root in replay.iter_membranes(start=2, stop=8):
+            assert capture_state(root) == states[step]
+            assert all(child.parent is root for child in root.children)
+
+    def test_missing_step(self, recorded):
+        replay, _ = recorded
+        with pytest.raises(KeyError):
+            replay.state_at(42)
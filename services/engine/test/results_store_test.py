@@ -0,0 +1,60 @@
+import pytest
+from types import SimpleNamespace
+from src.utils.results import ResultsFrame
+from src.utils.results_store import ResultsStore, record_run
+
+
+def frame_of(scale: int, steps: int = 5) -> ResultsFrame:
+    frame = ResultsFrame(['a', 'b'])
+    for step in range(steps):
+        frame.append(step, [('a', scale * step), ('b', scale)])
+    return frame
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ResultsStore(str(tmp_path / 'results.sqlite3')) as store:
+        for seed in range(1, 5):
+            store.record(f'run_{seed}', frame_of(seed), rules='rules_01', inference='maxpar', seed=seed)
+        store.record('other', frame_of(100), rules='rules_00', inference='minpar', seed=2)
+        yield store
+
+
+class TestResultsStore:
+
+    def test_queries_across_runs(self, store):
+        """Las consultas filtran por metadatos: valor, lista o rango (incluido)"""
+        assert [run['name'] for run in store.runs(rules='rules_01', seed=(2, 3))] == ['run_2', 'run_3']
+        assert store.counts_at('a', 4, inference=['maxpar'], seed=(3, 10)) == {'run_3': 12, 'run_4': 16}
+        assert store.mean_at('a', 2, rules='rules_01', inference='maxpar', seed=(1, 4)) == 5.0
+        assert store.stats_at('b', 0, seed=2) == {'runs': 2, 'mean': 51.0, 'min': 2, 'max': 100}
+        assert store.mean_at('a', 99) is None
+        steps, means = store.mean_trajectory('a', rules='rules_01')
+        assert steps.tolist() == [0, 1, 2, 3, 4] and means.tolist() == [0.0, 2.5, 5.0, 7.5, 10.0]
+        with pytest.raises(ValueError):
+            store.runs(colour='red')
+
+    def test_record_replaces_run(self, store):
+        store.record('run_1', frame_of(10, steps=3), rules='rules_01', inference='maxpar', seed=1)
+        runs = store.runs(seed=1)
+        assert len(runs) == 1 and runs[0]['steps'] == 2
+        steps, counts = store.trajectory('run_1', 'a')
+        assert steps.tolist() == [0, 1, 2] and counts.tolist() == [0, 10, 20]
+        store.delete('run_1')
+        assert store.counts_at('a', 1, seed=1) == dict()
+
+    def test_record_run(self, tmp_path, build_system):
+        system, _ = build_system(seed=3)
+        frame = ResultsFrame(system.output_objects)
+        system.set_step_listener(frame.append)
+        system.run(20)
+        config = SimpleNamespace(scene='scene_00', rules='rules_00', format='xml', inference='maxpar', seed=3,
+                                 max_steps=20, selection='serial', shards=None)
+        path = str(tmp_path / 'results.sqlite3')
+        record_run(config, system.run_id, frame, steps=system.step, path=path)
+        with ResultsStore(path) as store:
+            [run] = store.runs(scene='scene_00', seed=3)
+            assert run['name'] == system.run_id and run['steps'] == 20
+            expected = ResultsFrame.read_csv(tmp_path / system.output_file)
+            obj = expected.objects[0]
+            assert store.trajectory(run['name'], obj)[1].tolist() == expected.column(obj).tolist()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from src.utils.results import ResultsFrame
+
+
+def run_system(build_system, shards=0):
+    system, _ = build_system()
+    system.set_wide_output(True)
+    system.set_shards(shards, processes=False)
+    frame = ResultsFrame(system.output_objects, capacity=1)
+    system.set_step_listener(frame.append)
+    system.run(30)
+    return system, frame
+
+
+class TestResultsFrame:
+
+    def test_append_grows_columns(self):
+        frame = ResultsFrame(['a', 'b'], capacity=1)
+        for step in range(5):
+            frame.append(step, [('a', step), ('b', 10 * step)])
+        assert len(frame) == 5 and frame.last_step == 4
+        assert frame.column('b').tolist() == [0, 10, 20, 30, 40]
+        assert frame.column('a').dtype == np.int64
+        assert frame.steps[frame.window(1, 3)].tolist() == [1, 2, 3]
+
+    @pytest.mark.parametrize('shards', [0, 2])
+    def test_wide_output_matches_long(self, tmp_path, build_system, shards):
+        """La salida ancha tiene los mismos conteos que la salida larga pivotada"""
+        system, frame = run_system(build_system, shards)
+        wide = ResultsFrame.read_csv(tmp_path / system.wide_output_file)
+        long = ResultsFrame.read_csv(tmp_path / system.output_file)
+        assert wide.objects == long.objects == frame.objects
+        assert len(wide) == len(frame) > 10
+        assert np.array_equal(wide.steps, long.steps) and np.array_equal(wide.steps, frame.steps)
+        for obj in wide.objects:
+            assert np.array_equal(wide.column(obj), long.column(obj))
+            assert np.array_equal(wide.column(obj), frame.column(obj))
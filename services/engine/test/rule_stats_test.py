@@ -0,0 +1,40 @@
+import pytest
+from src.enums.constants import RuleStatsLevel
+
+
+class TestRuleStats:
+
+    def test_counters_do_not_change_the_run(self, tmp_path, build_system):
+        """Los contadores no consumen números aleatorios"""
+        for inference in ('minpar', 'maxpar'):
+            outputs = []
+            for level in (RuleStatsLevel.OFF, RuleStatsLevel.SUMMARY):
+                system, _ = build_system(inference, seed=5)
+                system.set_rule_stats(level)
+                system.run(20)
+                outputs.append((tmp_path / system.output_file).read_text())
+            assert outputs[0] == outputs[1]
+
+    def test_counters(self, tmp_path, build_system):
+        system, _ = build_system('maxpar', seed=5)
+        system.set_rule_stats(RuleStatsLevel.STEPS)
+        system.run(10)
+        totals = system.rule_stats.totals()
+        assert sum(counters['applied'] for counters in totals.values()) == system.applications
+        for counters in totals.values():
+            assert counters['checked'] >= counters['applicable'] >= 0
+            assert counters['applicable'] == 0 or counters['checked'] > 0
+        # Every h1 object rule is checked once per h1 membrane and step
+        assert totals[('h1', 'r0')]['checked'] == 25 * system.step
+
+        summary = (tmp_path / system.rule_stats_file).read_text().splitlines()
+        assert summary[0] == 'membrane,rule,move,checked,applicable,rejected,applied'
+        assert len(summary) == 1 + len(totals)
+        steps = (tmp_path / system.rule_steps_file).read_text().splitlines()
+        applied = sum(int(line.split(',')[-1]) for line in steps[1:])
+        assert applied == system.applications
+
+    def test_invalid_level(self, build_system):
+        system, _ = build_system('minpar')
+        with pytest.raises(ValueError):
+            system.set_rule_stats('all')
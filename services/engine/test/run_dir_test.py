@@ -0,0 +1,48 @@
+import json
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from src.classes.p_system import PSystem
+from src.utils import aux
+from src.utils.aux import create_run_dir
+
+
+class TestRunDirectories:
+
+    def test_concurrent_runs_get_their_own_directory(self, tmp_path):
+        """Las ejecuciones creadas a la vez nunca comparten directorio"""
+        with ThreadPoolExecutor(8) as pool:
+            names = list(pool.map(lambda _: create_run_dir(f'{tmp_path}/'), range(64)))
+        assert len(set(names)) == 64
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names)
+
+    def test_clash_draws_another_suffix(self, tmp_path, monkeypatch):
+        suffixes = itertools.chain(['aaaaaa', 'aaaaaa'], itertools.repeat('bbbbbb'))
+        monkeypatch.setattr(aux.secrets, 'token_hex', lambda _: next(suffixes))
+        monkeypatch.setattr(aux, 'creation_time_str', lambda: '20240101_000000')
+        assert create_run_dir(f'{tmp_path}/') == '20240101_000000_aaaaaa'
+        assert create_run_dir(f'{tmp_path}/') == '20240101_000000_bbbbbb'
+
+    def test_manifest(self, tmp_path, build_system):
+        system, _ = build_system(seed=5)
+        system.set_replay(10)
+        system.run(8)
+        manifest = json.loads((tmp_path / system.manifest_file).read_text())
+        assert manifest['run'] == system.run_id and manifest['seed'] == 5 and manifest['steps'] == 8
+        assert manifest['output']['objects'] == system.output_objects
+        assert manifest['settings']['keyframes'] == 10
+        assert manifest['files'] == ['output.csv', 'replay.jsonl']
+
+    def test_runs_path_without_separator(self, tmp_path, load_model):
+        """Las salidas se escriben dentro del directorio de la ejecución aunque la ruta no acabe en separador"""
+        alphabet, rules, output, root = load_model()
+        runs = tmp_path / 'runs'
+        with PSystem(alpha=alphabet, membranes=root, rules=rules, out=output, inference='maxpar',
+                     runs_path=str(runs)) as system:
+            system.seed(3)
+            system.set_replay(5)
+            system.set_timings(True)
+            system.run(5)
+        assert [path.name for path in runs.iterdir()] == [system.run_id]
+        assert sorted(path.name for path in (runs / system.run_id).iterdir()) == \
+            ['manifest.json', 'output.csv', 'replay.jsonl', 'timings.csv']
+        assert system.run_dir == f'{runs}/{system.run_id}/'
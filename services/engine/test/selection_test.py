@@ -0,0 +1,70 @@
+import csv
+import pytest
+from src.enums.constants import RuleStatsLevel, Selection
+
+
+@pytest.fixture
+def run_system(tmp_path, build_system):
+    def run(inference, selection, workers=None, steps=30):
+        system, _ = build_system(inference)
+        system.set_selection(selection, workers)
+        system.run(steps)
+        return (tmp_path / system.output_file).read_text()
+    return run
+
+
+class TestSelection:
+
+    @pytest.mark.parametrize('inference', ['minpar', 'maxpar'])
+    def test_process_matches_blocks(self, run_system, inference):
+        """Los procesos seleccionan las mismas reglas que la selección por bloques en serie"""
+        expected = run_system(inference, Selection.BLOCKS)
+        assert run_system(inference, Selection.PROCESS, workers=2) == expected
+        assert len(expected.splitlines()) > 30
+
+    @pytest.mark.parametrize('inference', ['minpar', 'maxpar'])
+    def test_threads_match_blocks(self, run_system, inference):
+        """Los hilos seleccionan las mismas reglas que la selección por bloques en serie"""
+        expected = run_system(inference, Selection.BLOCKS)
+        for workers in (1, 4):
+            assert run_system(inference, Selection.THREAD, workers=workers) == expected
+
+    @pytest.mark.parametrize('mode', [Selection.THREAD, Selection.PROCESS])
+    def test_parallel_counters_match_blocks(self, tmp_path, build_system, mode):
+        """Las estadísticas de reglas y los contadores de memoria coinciden con la selección por bloques"""
+        def counters(selection, workers=None):
+            system, _ = build_system('maxpar')
+            system.set_selection(selection, workers)
+            system.set_rule_stats(RuleStatsLevel.SUMMARY)
+            system.set_memory_profile(5)
+            with system:
+                system.run(20)
+            with open(tmp_path / system.memory_file, newline='') as f:
+                allocs = [int(row['multiset_allocs']) for row in csv.DictReader(f)]
+            return system.rule_stats.totals(), allocs
+
+        totals, allocs = counters(Selection.BLOCKS)
+        assert counters(mode, workers=2) == (totals, allocs)
+        assert all(rule['checked'] > 0 for rule in totals.values() if rule['applied'])
+        assert sum(allocs) > 0
+
+    def test_workers_kept_between_runs(self, tmp_path, build_system, run_system):
+        """Los procesos se mantienen entre llamadas a run hasta cerrar el sistema"""
+        system, _ = build_system('minpar')
+        system.set_selection(Selection.PROCESS, workers=2)
+        with system:
+            system.run(1)
+            executor = system.selection._executor
+            for _ in range(29):
+                system.run(1)
+            assert executor is not None and system.selection._executor is executor
+        assert system.selection._executor is None
+        assert (tmp_path / system.output_file).read_text() == run_system('minpar', Selection.BLOCKS)
+
+    def test_serial_is_unchanged(self, run_system):
+        """El modo serie sigue usando el estado aleatorio global"""
+        assert run_system('maxpar', Selection.SERIAL) == run_system('maxpar', None)
+
+    def test_invalid_mode(self, run_system):
+        with pytest.raises(ValueError):
+            run_system('minpar', 'gpu')
@@ -0,0 +1,53 @@
+import pytest
+from src.enums.constants import Selection
+from src.utils.sharding import pack_membrane, unpack_membrane
+
+
+@pytest.fixture
+def run_sharded(tmp_path, build_system):
+    def run(inference, shards, processes, steps=20):
+        system, membranes = build_system(inference)
+        system.set_shards(shards, processes)
+        system.run(steps)
+        return (tmp_path / system.output_file).read_text(), list(membranes.structure_lines()), system.step
+    return run
+
+
+class TestSharding:
+
+    def test_pack_round_trip(self, build_system):
+        _, root = build_system('minpar')
+        copy = unpack_membrane(pack_membrane(root))
+        assert list(copy.structure_lines()) == list(root.structure_lines())
+        assert all(child.parent is copy for child in copy.children)
+
+    @pytest.mark.parametrize('inference', ['minpar', 'maxpar'])
+    def test_processes_match_inline(self, run_sharded, inference):
+        """Tres procesos dan la misma salida y estructura final que un único fragmento en serie"""
+        expected = run_sharded(inference, shards=1, processes=False)
+        assert run_sharded(inference, shards=3, processes=True) == expected
+        assert len(expected[0].splitlines()) > 20
+
+    @pytest.mark.parametrize('inference', ['minpar', 'maxpar'])
+    def test_shards_match_block_selection(self, tmp_path, run_sharded, build_system, inference):
+        """Los fragmentos dan la misma salida que el sistema con la selección por bloques y la misma semilla"""
+        system, membranes = build_system(inference)
+        system.set_selection(Selection.BLOCKS)
+        # Long enough for the infections of the DMEM rule
+        system.run(80)
+        expected = (tmp_path / system.output_file).read_text(), list(membranes.structure_lines()), system.step
+        assert run_sharded(inference, shards=3, processes=False, steps=80) == expected
+
+    def test_negative_shards(self, build_system):
+        with pytest.raises(ValueError):
+            build_system('minpar')[0].set_shards(-1)
+
+    @pytest.mark.parametrize('shards', [0, 2])
+    def test_step_listener_matches_output(self, tmp_path, build_system, shards):
+        """El listener recibe las mismas filas que se escriben en el CSV de salida"""
+        system, _ = build_system('maxpar')
+        rows = []
+        system.set_step_listener(lambda step, counts: rows.extend(f'{step},{obj},{count}' for obj, count in counts))
+        system.set_shards(shards, processes=False)
+        system.run(10)
+        assert (tmp_path / system.output_file).read_text().splitlines()[1:] == rows
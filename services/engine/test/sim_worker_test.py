@@ -0,0 +1,66 @@
+import os
+import time
+import pytest
+from src.utils.sim_worker import SimulationWorker, CANCELLED, DONE, FAILED, PAUSED
+
+
+def wait(worker, condition, timeout=30.0):
+    steps = []
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        steps.extend(worker.poll(timeout=0.1))
+    steps.extend(worker.poll())
+    return steps
+
+
+class ExitOnLoad:
+    """Model part whose unpickling ends the process that loads it."""
+
+    def __reduce__(self):
+        return os._exit, (3,)
+
+
+class TestSimulationWorker:
+
+    def test_matches_in_process_run(self, tmp_path, build_system, load_model):
+        """El worker produce las mismas filas que una ejecución en el mismo proceso"""
+        system, _ = build_system()
+        system.run(20)
+        expected = (tmp_path / system.output_file).read_text().splitlines()[1:]
+
+        with SimulationWorker(load_model(), 'maxpar', seed=7, runs_path=f'{tmp_path}/') as worker:
+            worker.run(15)
+            steps = wait(worker, lambda: worker.state == DONE)
+            worker.run(5)
+            steps += wait(worker, lambda: worker.state == DONE)
+            assert worker.step == 20
+            assert (tmp_path / worker.output_file).read_text().splitlines()[1:] == expected
+        assert [f'{step},{obj},{count}' for step, counts in steps for obj, count in counts] == expected
+
+    def test_pause_resume_cancel(self, tmp_path, load_model):
+        with SimulationWorker(load_model(), 'minpar', seed=7, runs_path=f'{tmp_path}/') as worker:
+            worker.run(10 ** 7)
+            wait(worker, lambda: worker.step > 5)
+            worker.pause()
+            assert worker.state == PAUSED
+            wait(worker, lambda: False, timeout=0.5)
+            paused_step = worker.step
+            wait(worker, lambda: False, timeout=0.5)
+            assert worker.step == paused_step
+            worker.resume()
+            wait(worker, lambda: worker.step > paused_step)
+            worker.cancel()
+            wait(worker, lambda: worker.state == CANCELLED)
+            assert worker.state == CANCELLED
+            assert worker.progress()['steps_per_s'] > 0
+
+    def test_start_fails_when_process_dies(self, tmp_path, load_model):
+        """Si el proceso muere antes de construir el motor, start falla con su código de salida"""
+        model = load_model() + (ExitOnLoad(),)
+        worker = SimulationWorker(model, 'maxpar', seed=7, runs_path=f'{tmp_path}/')
+        began = time.monotonic()
+        with pytest.raises(RuntimeError, match='code 3'):
+            worker.start()
+        assert time.monotonic() - began < 30
+        assert worker.state == FAILED and not worker.alive
+        worker.close()
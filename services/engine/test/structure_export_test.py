@@ -0,0 +1,41 @@
+import json
+from src.classes.membrane import Membrane
+from src.utils.structure_export import count_membranes, export_structure, read_snapshots
+
+
+def build_tissue(cells: int) -> Membrane:
+    skin = Membrane('skin', 1, 100)
+    for i in range(cells):
+        cell = Membrane('cell', 1, 100, parent=skin)
+        cell.objects.add_object(obj='a', multiplicity=1 + i % 2)
+        cell.add_child(Membrane('nucleus', 1, 10, parent=cell))
+        skin.add_child(cell)
+    return skin
+
+
+class TestStructureExport:
+
+    def test_identical_siblings_collapse(self):
+        """Los hermanos idénticos se exportan una vez con su número de copias"""
+        snapshot = export_structure(build_tissue(1000), step=3)
+        assert snapshot['step'] == 3
+        assert snapshot['membranes'] == 2001
+        # One nucleus, a cell with a=1, a cell with a=2 and the skin
+        assert len(snapshot['nodes']) == 4
+        root = snapshot['nodes'][snapshot['root']]
+        assert root[0] == 'skin'
+        assert sorted(times for _, times in root[3]) == [500, 500]
+        assert count_membranes(snapshot) == 2001
+
+    def test_run_writes_snapshots_and_viewer(self, tmp_path, build_system):
+        """Se escribe una instantánea cada N pasos, otra al final y la página del visor"""
+        system, _ = build_system(seed=5)
+        system.set_structure_snapshots(2)
+        system.run(5)
+
+        snapshots = read_snapshots(tmp_path / system.structure_file)
+        assert [snapshot['step'] for snapshot in snapshots] == [0, 2, 4, 5]
+        assert all(count_membranes(snapshot) == snapshot['membranes'] for snapshot in snapshots)
+        page = (tmp_path / system.structure_viewer_file).read_text(encoding='utf-8')
+        assert json.dumps(snapshots[-1], separators=(',', ':')) in page
+        assert system.manifest()['settings']['structure'] == 2
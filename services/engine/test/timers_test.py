@@ -0,0 +1,22 @@
+from src.utils.timers import PhaseTimer, SELECTION, TRACE
+
+
+class TestTimers:
+
+    def test_phase_timer_rows(self):
+        timer = PhaseTimer()
+        t = timer.lap(SELECTION, timer.now() - 100)
+        timer.lap(TRACE, t)
+        step, selection, application, output, trace = timer.end_step(1).decode().strip().split(',')
+        assert step == '1' and int(selection) >= 100 and application == output == '0'
+        assert timer.end_step(2) == b'2,0,0,0,0\n'
+        assert timer.steps == 2 and timer.totals()['selection'] == int(selection)
+
+    def test_run_writes_timings(self, tmp_path, build_system):
+        """Con los tiempos activados se escribe una fila por paso junto a la salida"""
+        system, _ = build_system(scene='toy_scene_00', rules='toy_rules_00')
+        system.set_timings(True)
+        system.run(3)
+        lines = (tmp_path / system.timings_file).read_text().splitlines()
+        assert lines[0] == 'step,selection_ns,application_ns,output_ns,trace_ns'
+        assert [line.split(',')[0] for line in lines[1:]] == ['1', '2', '3']
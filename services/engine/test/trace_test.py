@@ -0,0 +1,55 @@
+import os
+import pytest
+from src.enums.constants import TraceLevel
+from src.utils.trace import AGGREGATED, BINARY_FORMAT, LABELS_FORMAT, TraceViewer
+
+
+@pytest.fixture
+def traced_run(tmp_path, build_system):
+    def run(level, steps=10):
+        system, _ = build_system('maxpar', seed=5)
+        system.set_trace_level(level)
+        system.run(steps)
+        return system, f'{tmp_path}/{system.trace_file}'
+    return run
+
+
+class TestTrace:
+
+    def test_off_writes_no_trace(self, traced_run):
+        system, path = traced_run(TraceLevel.OFF)
+        assert system.trace is None
+        assert not os.path.exists(path + BINARY_FORMAT) and not os.path.exists(path + LABELS_FORMAT)
+
+    def test_counts_match_full_trace(self, traced_run):
+        """Los eventos agregados suman las mismas aplicaciones que la traza completa"""
+        _, path = traced_run(TraceLevel.COUNTS)
+        viewer = TraceViewer.load(path)
+        assert viewer.level == TraceLevel.COUNTS
+        assert (viewer.events[:, 1] == AGGREGATED).all()
+        # One event per applied rule and step at most
+        pairs = {(int(step), int(rule)) for step, _, rule, _ in viewer.events}
+        assert len(pairs) == len(viewer.events)
+
+        full = TraceViewer.load(traced_run(TraceLevel.FULL)[1])
+        assert viewer.totals() == full.totals() and full.totals()
+
+    def test_full_round_trip(self, traced_run):
+        """Cada evento se lee con su paso, su membrana y su regla"""
+        system, path = traced_run(TraceLevel.FULL)
+        viewer = TraceViewer.load(path)
+        assert viewer.level == TraceLevel.FULL
+        assert set(viewer.events[:, 0].tolist()) == set(range(1, system.step + 1))
+
+        labels = system.trace.labels()
+        lines = list(viewer.lines())
+        headers = [line for line in lines if line.startswith('=')]
+        assert headers == [f'{"="*15} STEP {step} {"="*15}' for step in range(1, system.step + 1)]
+        events = [line for line in lines if not line.startswith('=')]
+        assert len(events) == len(viewer.events)
+        for line, (_, handle, rule_id, _) in zip(events, viewer.events):
+            mem_id, move, label = labels['rules'][rule_id]
+            # A rule is always applied in a membrane with the id it is defined for
+            assert labels['membranes'][handle] == mem_id
+            assert line.startswith(f' - Applying {move} {mem_id:>5} -> ') and line.endswith(label)
+        assert list(viewer.lines(2, 2))[0] == headers[1]
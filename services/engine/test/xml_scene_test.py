@@ -0,0 +1,55 @@
+import sys
+import pytest
+from types import SimpleNamespace
+from xml.dom import minidom
+from src.enums.constants import SceneObject
+from src.utils.xml_parser import XMLInputParser
+
+
+def minidom_structure(node):
+    """Structure of a scene as the former minidom parser built it, as nested tuples."""
+    membranes = []
+    for child in node.childNodes:
+        if child.nodeType != minidom.Node.ELEMENT_NODE or child.nodeName != SceneObject.MEMBRANE:
+            continue
+        objects = dict()
+        for item in child.childNodes:
+            if item.nodeType == minidom.Node.ELEMENT_NODE and item.nodeName == SceneObject.OBJECT:
+                objects[item.getAttribute('v')] = objects.get(item.getAttribute('v'), 0) + int(item.getAttribute('m'))
+        membranes.append((child.getAttribute('id'), int(child.getAttribute('m')), int(child.getAttribute('capacity')),
+                          objects, minidom_structure(child)))
+    return membranes
+
+
+def structure(membrane):
+    children = [structure(child) for child in membrane.children]
+    return (membrane.id, membrane.multiplicity, membrane.capacity,
+            {obj: int(count) for obj, count in membrane.objects.items() if count}, children)
+
+
+def parser():
+    return XMLInputParser(SimpleNamespace(scene=None, rules=None, replication='expand'))
+
+
+class TestXMLScene:
+
+    @pytest.mark.parametrize('scene', ['scene_00', 'toy_scene_00'])
+    def test_matches_minidom(self, scene):
+        """El parser en streaming construye la misma jerarquía que el parser minidom"""
+        path = f'../../scenes/{scene}.xml'
+        [expected] = minidom_structure(minidom.parse(path).getElementsByTagName('config')[0])
+        assert structure(parser().iterate_scene_file(path)) == expected
+
+    def test_deep_scene(self, tmp_path):
+        """Una jerarquía más profunda que el límite de recursión se lee sin recursión"""
+        depth = sys.getrecursionlimit() + 500
+        path = tmp_path / 'deep.xml'
+        path.write_text('<model><config>' +
+                        ''.join(f'<membrane id="m{i}" m="1" capacity="10"><BO v="a" m="{i + 1}"/>'
+                                for i in range(depth)) +
+                        '</membrane>' * depth + '</config></model>')
+        membrane = parser().iterate_scene_file(str(path))
+        for i in range(depth):
+            assert membrane.id == f'm{i}' and dict(membrane.objects.items()) == {'a': i + 1}
+            membrane = membrane.children[0] if membrane.children else None
+        assert membrane is None
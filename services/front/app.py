@@ -2,8 +2,7 @@ import os
 import sys
 import math
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+import streamlit.components.v1 as components
 import plotly.subplots as sp
 import plotly.graph_objects as go
 
@@ -11,16 +10,37 @@ from io import StringIO
 from config import Config
 
 sys.path.append('../engine')
+from results import downsample_columns
+from remote import RemoteSimulation
+from src.enums.constants import Downsampling
+from src.utils.api_client import ApiClient
+from src.utils.model_cache import ModelCache
 from src.utils.parser_factory import ParserFactory
+from src.utils.replay import Replay
+from src.utils.results import ResultsFrame
+from src.utils.sim_worker import SimulationWorker, FAILED
+from src.utils.structure_export import export_structure, viewer_html
 
 
 RULES_PATH = '../../rules/'
 SCENES_PATH = '../../scenes/'
 RUNS_PATH = '../../runs/'
+# Simulation service to run the simulations on, in this process if not set
+API_URL = os.environ.get('PSYS_API_URL')
+# Seconds between two polls of a running simulation
+POLL_INTERVAL_S = 1.0
+# Height in pixels of the membrane structure viewer
+STRUCTURE_VIEWER_HEIGHT = 520
+# Default points of every trajectory sent to the charts
+POINT_BUDGET = 2000
 DERIVATION_MODES = {
     'maxpar': 'Max. Parallelism',
     'minpar': 'Min. Parallelism'
 }
+DOWNSAMPLING_METHODS = {
+    Downsampling.LTTB: 'LTTB (shape)',
+    Downsampling.MINMAX: 'Min/Max (peaks)'
+}
 
 config = Config()
 
@@ -39,6 +59,87 @@ if "rules" not in st.session_state:
 if "last_seed" not in st.session_state:
     st.session_state.last_seed = None
 
+if "replay" not in st.session_state:
+    st.session_state.replay = None
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_model(key: str, _parser):
+    """Parse a model once per content key; engines are built from copies of it."""
+    alphabet, rules, output = _parser.load_rules()
+    return alphabet, rules, output, _parser.load_scene()
+
+
+def build_remote():
+    """Simulation of the configured model on the simulation service."""
+    fields = {'Input.Format': config.format, 'Input.Scene': config.scene, 'Input.Rules': config.rules,
+              'Runtime.Inference': config.inference, 'Runtime.Seed': config.seed,
+              'Runtime.Keyframes': config.keyframes}
+    simulation = RemoteSimulation(ApiClient(API_URL), {name: value for name, value in fields.items()
+                                                       if value is not None})
+    simulation.start()
+    st.session_state.replay = None
+    return simulation
+
+
+def build_engine():
+    """Start a background worker with the model selected in the configuration.
+
+    The parsed model is shared by the reruns and sessions of the app, keyed by
+    the contents of its files, and every worker runs on its own copy of it. The
+    output of every step is appended to the in-memory results of the session
+    when the worker is polled. With PSYS_API_URL set, the simulations run on
+    the simulation service instead.
+    """
+    if API_URL:
+        return build_remote()
+    parser = ParserFactory(config=config)
+    key = ModelCache().key(parser.scene_path, parser.rules_path, config.format, config.replication)
+    worker = SimulationWorker(load_model(key, parser), inference=config.inference,
+                              seed=config.seed, keyframes=config.keyframes)
+    worker.start()
+    st.session_state.results = ResultsFrame(worker.objects)
+    st.session_state.replay = None
+    return worker
+
+
+def reset_engine():
+    """Stop the worker of the session and drop its results."""
+    if st.session_state.engine is not None:
+        st.session_state.engine.close()
+    st.session_state.engine = None
+    st.session_state.results = None
+
+
+def start_run(max_steps):
+    """Run steps in the background, starting the worker if needed."""
+    if st.session_state.engine is None:
+        # Parsear el modelo a partir de la configuración
+        try:
+            st.session_state.engine = build_engine()
+        except Exception:
+            st.error('Verify that all necessary fields are not empty', icon="🚨")
+    if st.session_state.engine:
+        if API_URL:
+            # Every remote run is a new job, starting from the scene
+            st.session_state.results = None
+            st.session_state.replay = None
+        try:
+            st.session_state.engine.run(max_steps)
+        except Exception as e:
+            st.error(f'Error running the model: {str(e)}', icon="🚨")
+
+
+def format_progress(progress) -> str:
+    text = f'{progress["state"].capitalize()} · step {progress["step"]}'
+    if progress['target'] is not None:
+        text += f'/{progress["target"]}'
+    if progress['steps_per_s']:
+        text += f' · {progress["steps_per_s"]:.1f} steps/s'
+    if progress['eta_s'] is not None:
+        text += f' · ETA {progress["eta_s"]:.0f}s'
+    return text
+
 st.markdown("""
 # P-System Simulator
 """)
@@ -49,18 +150,18 @@ with st.sidebar:
     st.write('## Scene')
     scene_file = st.file_uploader(label='Select Scene File',
                                  accept_multiple_files=False,
-                                 type=['xml'])
+                                 type=['xml', 'json'])
     if scene_file is not None:
         stringio = StringIO(scene_file.getvalue().decode('utf-8'))
         file_path = os.path.join(SCENES_PATH, scene_file.name)
-        name, _ = os.path.splitext(scene_file.name)
+        name, extension = os.path.splitext(scene_file.name)
         config.scene = name
+        config.format = extension.lstrip('.')
         if os.path.exists(file_path) and os.path.isfile(file_path) and scene_file.name != st.session_state.scene:
             st.toast(f'File {scene_file.name} already exists in location. Using it instead', icon=":material/info:")
             st.session_state.scene = scene_file.name
             if st.session_state.engine:
-                st.session_state.engine = None
-                st.session_state.results = None
+                reset_engine()
                 st.toast("Scene file changed, reseting engine")
         else:
             with open(file_path, 'w') as f:
@@ -69,7 +170,7 @@ with st.sidebar:
     st.write('## Rules')
     rule_file = st.file_uploader(label='Select Rules File',
                                  accept_multiple_files=False,
-                                 type=['xml'])
+                                 type=['xml', 'json'])
 
     if rule_file is not None:
         stringio = StringIO(rule_file.getvalue().decode('utf-8'))
@@ -80,8 +181,7 @@ with st.sidebar:
             st.toast(f'File {rule_file.name} already exists in location. Using it instead', icon=":material/info:")
             st.session_state.rules = rule_file.name
             if st.session_state.engine:
-                st.session_state.engine = None
-                st.session_state.results = None
+                reset_engine()
                 st.toast("Rule file changed, reseting engine")
         else:
             with open(file_path, 'w') as f:
@@ -112,75 +212,101 @@ with st.container(border=True):
         seed = st.number_input('**Random Seed**', value=None, step=1)
         config.seed = seed
         if config.seed != st.session_state.last_seed:
-            st.session_state.engine = None
-            st.session_state.results = None
+            reset_engine()
             st.session_state.last_seed = config.seed
             st.toast("Seed changed, reseting engine")
 
+    keyframes = st.number_input('**Replay Keyframe Interval**', value=None, step=1, min_value=1,
+                                help='Record the membrane structure of every step, with a full keyframe every N steps')
+    config.keyframes = keyframes
+
 
 st.markdown('# :material/play_arrow: Simulation Controls')
 
 with st.container(border=True):
     st.markdown('**Simulation Controls**')
 
-    play, forward, reset = st.columns(spec=[0.40, 0.40, 0.2])
-    if play.button(":material/play_arrow: Start", use_container_width=True, type="primary"):
-        if st.session_state.engine is None:
-            # Parsear el modelo a partir de la configuración
-            try:
-                parser = ParserFactory(config=config)
-                st.session_state.engine = parser.parse()
-            except:
-                st.error('Verify that all necessary fields are not empty', icon="🚨")
-        if st.session_state.engine:
-            try:
-                with st.spinner("Running Simulation"):
-                    st.session_state.engine.run(config.max_steps)
-                    st.session_state.results = True
-            except Exception as e:
-                st.error(f'Error running the model: {str(e)}', icon="🚨")
-
-    # if middle.button(":material/pause:"):
-    #     pass
-    if forward.button(":material/skip_next: Step Forward", use_container_width=True):
-        if st.session_state.engine is None:
-            # Parsear el modelo a partir de la configuración
-            try:
-                parser = ParserFactory(config=config)
-                st.session_state.engine = parser.parse()
-            except:
-                st.error('Verify that all necessary fields are not empty', icon="🚨")
-        if st.session_state.engine:
-            try:
-                with st.spinner("Running Simulation"):
-                    st.session_state.engine.run(1)
-                    st.session_state.results = True
-            except Exception as e:
-                st.error(f'Error running the model: {str(e)}', icon="🚨")
+    engine = st.session_state.engine
+    busy = engine is not None and engine.busy
+    play, forward, pause, cancel, reset = st.columns(spec=[0.25, 0.25, 0.2, 0.15, 0.15])
+    if play.button(":material/play_arrow: Start", use_container_width=True, type="primary", disabled=busy):
+        start_run(config.max_steps)
+
+    if forward.button(":material/skip_next: Step Forward", use_container_width=True, disabled=busy or bool(API_URL),
+                      help='Not available with the simulation service' if API_URL else None):
+        start_run(1)
+
+    if engine is not None and engine.state == 'paused':
+        if pause.button(":material/resume: Resume", use_container_width=True):
+            engine.resume()
+    elif pause.button(":material/pause: Pause", use_container_width=True, disabled=not busy):
+        engine.pause()
+
+    if cancel.button(":material/stop: Cancel", use_container_width=True, disabled=not busy):
+        engine.cancel()
 
     if reset.button(":material/Replay: Reset", use_container_width=True):
-        st.session_state.engine = None
-        st.session_state.results = None
+        reset_engine()
 
 st.markdown('---')
 
 st.markdown('# :material/insert_chart: Results')
 
-if not st.session_state.results:
-    with st.container(border=True):
-        st.markdown(":gray[Run a simulation to see some results]")
-else:
-    data_path = os.path.join(RUNS_PATH, st.session_state.engine.output_file)
-    df = pd.read_csv(data_path, index_col=False)
-
-    objects = df.object.unique()
+running = st.session_state.engine is not None and st.session_state.engine.busy
+
+
+@st.fragment(run_every=POLL_INTERVAL_S if running else None)
+def show_results():
+    """Collect the steps run in the background and plot the results.
+
+    While a run is in course the fragment polls the worker every
+    POLL_INTERVAL_S seconds without blocking the app, and reruns the whole app
+    when the run ends to enable the controls again.
+    """
+    engine = st.session_state.engine
+    if engine is not None:
+        steps = engine.poll()
+        if st.session_state.results is None and engine.objects:
+            st.session_state.results = ResultsFrame(engine.objects)
+        for step, counts in steps:
+            st.session_state.results.append(step, counts)
+        progress = engine.progress()
+        if engine.state == FAILED:
+            st.error(f'Error running the model: {engine.error}', icon="🚨")
+        elif progress['target']:
+            st.progress(min(progress['step'] / progress['target'], 1.0), text=format_progress(progress))
+        elif engine.state != 'idle':
+            st.caption(format_progress(progress))
+        if running and not engine.busy:
+            st.rerun()
+
+    if not st.session_state.results:
+        with st.container(border=True):
+            st.markdown(":gray[Run a simulation to see some results]")
+        return
+    results = st.session_state.results
+
+    # Trayectorias reducidas en el servidor: el coste de dibujar no crece con los pasos
+    budget_col, method_col = st.columns(2)
+    budget = budget_col.number_input('**Points per object**', value=POINT_BUDGET, min_value=100, step=100,
+                                     help='Maximum points of every trajectory sent to the charts')
+    method = method_col.selectbox('**Downsampling**', options=DOWNSAMPLING_METHODS.keys(),
+                                  format_func=lambda x: DOWNSAMPLING_METHODS[x])
+    last_step = results.last_step
+    window = None
+    if last_step > 0:
+        window = st.slider('**Steps**', min_value=0, max_value=last_step, value=(0, last_step),
+                           help='Narrow the window to zoom in: the same points cover fewer steps, '
+                                'up to full resolution')
+    points = downsample_columns(results, budget, method, window)
+    objects = results.objects
     n_objects = len(objects)
 
     # gráfico global
-    fig_global = px.line(
-        df, x="step", y="count", color="object",
-        title="Evolution of all output objects"
-    )
+    fig_global = go.Figure([go.Scatter(x=steps, y=counts, mode='lines', name=obj)
+                            for obj, (steps, counts) in points.items()])
+    fig_global.update_layout(title_text="Evolution of all output objects", xaxis_title='step',
+                             yaxis_title='count', legend_title_text='object')
     st.plotly_chart(fig_global, use_container_width=True)
 
 
@@ -191,14 +317,12 @@ else:
     fig = sp.make_subplots(rows=n_rows,
                            cols=n_cols,
                            subplot_titles=[f'Evolución objeto "{obj}"' for obj in objects])
-    
-    for i, obj in enumerate(objects):
-        subset = df[df.object == obj]
-        trace = px.line(subset, x='step', y='count').data[0]
 
+    for i, obj in enumerate(objects):
+        steps, counts = points[obj]
         row = i // n_cols + 1
         col = i % n_cols + 1
-        fig.add_trace(trace, row=row, col=col)
+        fig.add_trace(go.Scatter(x=steps, y=counts, mode='lines', name=obj), row=row, col=col)
 
     fig.update_layout(
         height=400 * n_rows,
@@ -208,3 +332,27 @@ else:
     )
 
     st.plotly_chart(fig, use_container_width=True)
+
+    # The replay file is complete once the worker has closed the run
+    replay_path = os.path.join(RUNS_PATH, engine.replay_file or '')
+    if not engine.busy and os.path.isfile(replay_path):
+        st.markdown('# :material/account_tree: Membrane Structure')
+        if st.session_state.replay is None:
+            st.session_state.replay = Replay(replay_path)
+        replay = st.session_state.replay
+        if replay.steps[-1] != engine.step:
+            replay.reload()
+
+        with st.container(border=True):
+            steps = replay.steps
+            if len(steps) > 1:
+                step = st.select_slider('**Step**', options=steps, value=steps[-1])
+            else:
+                step = steps[0]
+            # Identical siblings are collapsed and only the rows in view are drawn
+            root = replay.membranes_at(step)
+            components.html(viewer_html([export_structure(root, step)], title=f'Step {step}'),
+                            height=STRUCTURE_VIEWER_HEIGHT)
+
+
+show_results()
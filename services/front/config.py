@@ -29,6 +29,22 @@ class Config:
     def rules(self, value):
         self._config['rules'] = value
 
+    @property
+    def cache(self):
+        return self._config.get('cache', True)
+
+    @cache.setter
+    def cache(self, value):
+        self._config['cache'] = value
+
+    @property
+    def replication(self):
+        return self._config.get('replication', 'expand')
+
+    @replication.setter
+    def replication(self, value):
+        self._config['replication'] = value
+
     @property
     def inference(self):
         return self._config.get('inference', 'maxpar')
@@ -52,3 +68,11 @@ class Config:
     @seed.setter
     def seed(self, value):
         self._config['seed'] = value
+
+    @property
+    def keyframes(self):
+        return self._config.get('keyframes', None)
+
+    @keyframes.setter
+    def keyframes(self, value):
+        self._config['keyframes'] = value
@@ -0,0 +1,122 @@
+from typing import Dict, List, Tuple, Union
+
+from src.utils.api_client import ApiClient, QUEUED, RUNNING, PAUSED, FAILED
+from src.utils.sim_worker import IDLE
+
+
+class RemoteSimulation:
+    """Simulation run by the simulation service, with the interface of
+    `SimulationWorker`, so the app can use either of them.
+
+    Every run is a new job of the service, which starts from the scene: there
+    is no engine to continue once a job has finished.
+
+    Attributes:
+        state (str): IDLE before the first run, RUNNING (also while the job is
+            queued), PAUSED, DONE, CANCELLED or FAILED.
+        step (int): Last received step.
+        error (Union[str, None]): Error of a failed job.
+        output_file (Union[str, None]): Output CSV of the job, once started.
+        replay_file (Union[str, None]): Replay file of the job, once started.
+        objects (List[str]): Output objects of the job, once started.
+    """
+
+    def __init__(self, client: ApiClient, config: Dict[str, object]):
+        """Initialize a simulation. Jobs are submitted by `run`.
+
+        Args:
+            client (ApiClient): Client of the service.
+            config (Dict[str, object]): Configuration fields of the jobs, keyed
+                by 'Section.Field'.
+        """
+        self._client = client
+        self._config = config
+        self._job = None
+        self._progress = dict()
+        self._target = None
+        self._since = None
+        self.state = IDLE
+        self.step = 0
+        self.error = None
+        self.output_file = None
+        self.replay_file = None
+        self.objects = []
+
+    @property
+    def busy(self) -> bool:
+        return self.state in (RUNNING, PAUSED)
+
+    def start(self):
+        """Check that the service answers."""
+        self._client.health()
+
+    def run(self, max_steps: Union[int, None] = None):
+        """Submit a job of up to ``max_steps`` steps.
+
+        Raises:
+            RuntimeError: If a job is in course.
+        """
+        if self.busy:
+            raise RuntimeError('The simulation is already running')
+        config = dict(self._config)
+        if max_steps is not None:
+            config['Runtime.MaxSteps'] = max_steps
+        self._job = self._client.submit(config.pop('Input.Scene'), config.pop('Input.Rules'), config)['id']
+        self._target = max_steps
+        self._since = None
+        self.state = RUNNING
+        self.step = 0
+        self.error = None
+
+    def pause(self):
+        if self.state == RUNNING:
+            self._client.pause(self._job)
+            self.state = PAUSED
+
+    def resume(self):
+        if self.state == PAUSED:
+            self._client.resume(self._job)
+            self.state = RUNNING
+
+    def cancel(self):
+        if self.busy:
+            self._client.cancel(self._job)
+
+    def poll(self, timeout: float = 0.0) -> List[Tuple[int, List[Tuple[str, int]]]]:
+        """Collect the steps received since the last call.
+
+        Returns:
+            List[Tuple[int, List[Tuple[str, int]]]]: Step and ``(object, count)``
+                pairs of every new step, in order.
+        """
+        if self._job is None:
+            return []
+        result = self._client.result(self._job, since=self._since)
+        self._progress = self._client.job(self._job)
+        self.objects = result['objects'] or self.objects
+        self.output_file = self._progress['output']
+        self.replay_file = self._progress['replay']
+        steps = [(step, [(obj, result['columns'][obj][i]) for obj in result['objects']])
+                 for i, step in enumerate(result['steps'])]
+        if steps:
+            self.step = self._since = steps[-1][0]
+        # The status of the result matches its steps: a finished job has no more
+        status = result['status']
+        if status != QUEUED:
+            self.state = status
+        if status == FAILED:
+            self.error = self._progress['error']
+        return steps
+
+    def progress(self) -> Dict:
+        """Progress of the current or last job, as `SimulationWorker.progress`."""
+        return {'state': self.state, 'step': self.step, 'target': self._target,
+                'steps_per_s': self._progress.get('steps_per_s'),
+                'eta_s': self._progress.get('eta_s') if self.busy else None}
+
+    def close(self):
+        """Cancel the job in course."""
+        try:
+            self.cancel()
+        except Exception:
+            pass
@@ -0,0 +1,32 @@
+import numpy as np
+
+from typing import Dict, Tuple, Union
+
+from src.enums.constants import Downsampling
+from src.utils.downsample import downsample
+from src.utils.results import ResultsFrame
+
+
+def downsample_columns(frame: ResultsFrame, budget: int, method: str = Downsampling.LTTB,
+                       window: Union[Tuple[int, int], None] = None) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Points to plot: at most ``budget`` of every object trajectory.
+
+    Args:
+        frame (ResultsFrame): Results of the run.
+        budget (int): Maximum number of points of every object.
+        method (str, optional): One of the Downsampling values.
+        window (Union[Tuple[int, int], None], optional): First and last step to
+            plot. Narrowing it spends the same budget on fewer steps, up to full
+            resolution.
+
+    Returns:
+        Dict[str, Tuple[np.ndarray, np.ndarray]]: Steps and counts of every object.
+    """
+    rows = frame.window(*window) if window is not None else slice(None)
+    steps = frame.steps[rows]
+    points = dict()
+    for obj, counts in frame.columns().items():
+        counts = counts[rows]
+        kept = downsample(steps, counts, budget, method)
+        points[obj] = steps[kept], counts[kept]
+    return points